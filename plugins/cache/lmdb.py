@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    name: lmdb
+    short_description: Use a local LMDB database for cache
+    description:
+        - This cache stores the facts of all hosts in a single, memory mapped LMDB database file.
+        - Writes are grouped into transactions of up to I(_write_batch) entries. Pending writes are committed
+          before the database is read again and when the controller exits.
+        - Expired entries are found through a second table ordered by write time, so expiry does not need
+          to look at every entry.
+    author: Ansible Project (!UNKNOWN)
+    version_added: 4.4.0
+    requirements:
+      - lmdb (python library https://lmdb.readthedocs.io/en/release/)
+      - msgpack (python lib, for the C(msgpack) serializer)
+      - lz4 (python lib, for C(lz4) compression)
+    options:
+      _uri:
+        required: True
+        description:
+          - Path of the database file. A lock file with the suffix C(-lock) is created next to it.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_CONNECTION
+        ini:
+          - key: fact_caching_connection
+            section: defaults
+      _prefix:
+        description: User defined prefix to use when creating the DB entries.
+        default: ansible_facts
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_PREFIX
+        ini:
+          - key: fact_caching_prefix
+            section: defaults
+      _timeout:
+        default: 86400
+        description: Expiration timeout in seconds for the cache plugin data. Set to 0 to never expire.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_TIMEOUT
+        ini:
+          - key: fact_caching_timeout
+            section: defaults
+        type: integer
+      _serializer:
+        description:
+          - Format used to store the facts of each host.
+          - C(msgpack) requires the C(msgpack) python library.
+        default: compact_json
+        choices: [json, compact_json, msgpack]
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_SERIALIZER
+        ini:
+          - key: fact_caching_serializer
+            section: defaults
+      _compression:
+        description:
+          - Compression applied to serialized entries.
+          - C(lz4) requires the C(lz4) python library.
+        default: none
+        choices: [none, zlib, lz4]
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_COMPRESSION
+        ini:
+          - key: fact_caching_compression
+            section: defaults
+      _map_size:
+        description:
+          - Maximum size of the database in bytes.
+        default: 1073741824
+        type: integer
+        env:
+          - name: ANSIBLE_CACHE_LMDB_MAP_SIZE
+        ini:
+          - key: fact_caching_lmdb_map_size
+            section: defaults
+      _write_batch:
+        description:
+          - Maximum number of writes grouped into one transaction.
+          - Set to C(1) to commit every write immediately.
+        default: 100
+        type: integer
+        env:
+          - name: ANSIBLE_CACHE_LMDB_WRITE_BATCH
+        ini:
+          - key: fact_caching_lmdb_write_batch
+            section: defaults
+'''
+
+import atexit
+import os
+import struct
+import time
+
+from ansible.errors import AnsibleError
+from ansible.module_utils.common.text.converters import to_bytes, to_native, to_text
+from ansible.plugins.cache import BaseCacheModule
+
+from ansible_collections.community.general.plugins.plugin_utils.cache_serializer import CacheSerializer
+
+try:
+    import lmdb
+    HAS_LMDB = True
+except ImportError:
+    HAS_LMDB = False
+
+
+# write times are stored as big endian doubles, which sort like the numbers
+# they represent as long as they are positive
+_TIME = struct.Struct('>d')
+
+# an environment can only be opened once per process, share it between
+# all instances of the plugin
+_ENVIRONMENTS = {}
+
+
+def _open_environment(path, map_size):
+    key = (path, os.getpid())
+    if key not in _ENVIRONMENTS:
+        dirname = os.path.dirname(path)
+        try:
+            if dirname and not os.path.exists(dirname):
+                os.makedirs(dirname)
+            env = lmdb.open(path, subdir=False, map_size=map_size, max_dbs=2)
+        except Exception as e:
+            raise AnsibleError("LMDB can't open database %s: %s" % (path, to_native(e)))
+        _ENVIRONMENTS[key] = (env, env.open_db(b'facts'), env.open_db(b'expiry'))
+    return _ENVIRONMENTS[key]
+
+
+class CacheModule(BaseCacheModule):
+    """
+    A caching module backed by an LMDB database.
+
+    The 'facts' table maps keys to the write time followed by the serialized
+    value, the 'expiry' table maps write time plus key to nothing and is
+    walked in order to remove expired entries.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CacheModule, self).__init__(*args, **kwargs)
+
+        if not HAS_LMDB:
+            raise AnsibleError("The 'lmdb' python module is required for the lmdb fact cache, 'pip install lmdb'")
+
+        self._path = self.get_option('_uri')
+        if not self._path:
+            raise AnsibleError("error, 'lmdb' cache plugin requires the 'fact_caching_connection' config option to be set (to a database file path)")
+        self._path = os.path.expanduser(os.path.expandvars(self._path))
+        self._timeout = float(self.get_option('_timeout'))
+        self._prefix = self.get_option('_prefix') or ''
+        self._map_size = int(self.get_option('_map_size'))
+        self._write_batch = max(1, int(self.get_option('_write_batch')))
+        self._serializer = CacheSerializer(self.get_option('_serializer'), self.get_option('_compression'))
+
+        self._cache = {}
+        self._pending = {}
+        self._env = None
+        self._pid = None
+        atexit.register(self._commit)
+
+    def _open(self):
+        # LMDB environments must not be used across fork(), reopen in child processes
+        if self._env is None or self._pid != os.getpid():
+            self._env, self._facts_db, self._expiry_db = _open_environment(self._path, self._map_size)
+            self._pid = os.getpid()
+        return self._env
+
+    def _make_key(self, key):
+        return to_bytes(self._prefix + key)
+
+    def _from_db_key(self, db_key):
+        return to_text(db_key)[len(self._prefix):]
+
+    def _is_expired(self, mtime):
+        return self._timeout > 0 and time.time() - mtime > self._timeout
+
+    def _commit(self):
+        """ Write all pending entries in a single transaction. """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            with self._open().begin(write=True) as txn:
+                for key, (mtime, value) in pending.items():
+                    db_key = self._make_key(key)
+                    self._remove(txn, db_key)
+                    txn.put(db_key, _TIME.pack(mtime) + value, db=self._facts_db)
+                    txn.put(_TIME.pack(mtime) + db_key, b'', db=self._expiry_db)
+        except lmdb.MapFullError:
+            raise AnsibleError("LMDB database %s is full, increase the '_map_size' cache plugin option" % self._path)
+
+    def _remove(self, txn, db_key):
+        old = txn.get(db_key, db=self._facts_db)
+        if old is not None:
+            txn.delete(old[:_TIME.size] + db_key, db=self._expiry_db)
+            txn.delete(db_key, db=self._facts_db)
+
+    def _expire_keys(self):
+        if self._timeout <= 0:
+            return
+        expiry_age = _TIME.pack(time.time() - self._timeout)
+        with self._open().begin(write=True) as txn:
+            cursor = txn.cursor(db=self._expiry_db)
+            expired = []
+            if cursor.first():
+                for index_key in cursor.iternext(values=False):
+                    if index_key[:_TIME.size] > expiry_age:
+                        break
+                    expired.append(index_key)
+            for index_key in expired:
+                txn.delete(index_key, db=self._expiry_db)
+                txn.delete(index_key[_TIME.size:], db=self._facts_db)
+                self._cache.pop(self._from_db_key(index_key[_TIME.size:]), None)
+
+    def _read(self, txn, key):
+        raw = txn.get(self._make_key(key), db=self._facts_db)
+        if raw is None or self._is_expired(_TIME.unpack(raw[:_TIME.size])[0]):
+            return None
+        return self._serializer.loads(bytes(raw[_TIME.size:]))
+
+    def get(self, key):
+        if key not in self._cache:
+            self._commit()
+            with self._open().begin() as txn:
+                value = self._read(txn, key)
+            if value is None:
+                raise KeyError
+            self._cache[key] = value
+
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._pending[key] = (time.time(), self._serializer.dumps(value))
+        self._cache[key] = value
+        if len(self._pending) >= self._write_batch:
+            self._commit()
+
+    def set_many(self, values):
+        """ Write several keys in a single transaction. """
+        for key, value in values.items():
+            self._pending[key] = (time.time(), self._serializer.dumps(value))
+            self._cache[key] = value
+        self._commit()
+
+    def keys(self):
+        self._commit()
+        self._expire_keys()
+        prefix = to_bytes(self._prefix)
+        with self._open().begin() as txn:
+            cursor = txn.cursor(db=self._facts_db)
+            return [self._from_db_key(k) for k in cursor.iternext(values=False) if k.startswith(prefix)]
+
+    def contains(self, key):
+        if key in self._pending:
+            return True
+        with self._open().begin() as txn:
+            raw = txn.get(self._make_key(key), db=self._facts_db)
+        return raw is not None and not self._is_expired(_TIME.unpack(raw[:_TIME.size])[0])
+
+    def delete(self, key):
+        self._cache.pop(key, None)
+        self._pending.pop(key, None)
+        with self._open().begin(write=True) as txn:
+            self._remove(txn, self._make_key(key))
+
+    def flush(self):
+        self._cache = {}
+        self._pending = {}
+        keys = self.keys()
+        with self._open().begin(write=True) as txn:
+            for key in keys:
+                self._remove(txn, self._make_key(key))
+
+    def copy(self):
+        self._commit()
+        self._expire_keys()
+        prefix = to_bytes(self._prefix)
+        ret = {}
+        with self._open().begin() as txn:
+            for db_key, raw in txn.cursor(db=self._facts_db):
+                if db_key.startswith(prefix):
+                    key = self._from_db_key(db_key)
+                    if key not in self._cache:
+                        self._cache[key] = self._serializer.loads(bytes(raw[_TIME.size:]))
+                    ret[key] = self._cache[key]
+        return ret
+
+    def __getstate__(self):
+        return dict()
+
+    def __setstate__(self, data):
+        self.__init__()
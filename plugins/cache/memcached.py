@@ -14,6 +14,8 @@ DOCUMENTATION = '''
         - This cache uses JSON formatted, per host records saved in memcached.
     requirements:
       - memcache (python lib)
+      - msgpack (python lib, for the C(msgpack) serializer)
+      - lz4 (python lib, for C(lz4) compression)
     options:
       _uri:
         description:
@@ -42,6 +44,35 @@ DOCUMENTATION = '''
           - key: fact_caching_timeout
             section: defaults
         type: integer
+      _serializer:
+        description:
+          - Format used to store the facts of each host.
+          - C(pickle) lets the memcached client pickle the facts, as done by older versions of this plugin.
+          - C(json) writes indented JSON.
+          - C(compact_json) writes JSON without whitespace.
+          - C(msgpack) writes MessagePack and requires the C(msgpack) python library.
+          - Entries are tagged with their format, so changing this does not invalidate an existing cache.
+        default: pickle
+        choices: [pickle, json, compact_json, msgpack]
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_SERIALIZER
+        ini:
+          - key: fact_caching_serializer
+            section: defaults
+        version_added: 4.4.0
+      _compression:
+        description:
+          - Compression applied to serialized entries.
+          - C(lz4) requires the C(lz4) python library.
+          - Compression is ignored for the C(pickle) serializer, which always lets the memcached client compress values.
+        default: none
+        choices: [none, zlib, lz4]
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_COMPRESSION
+        ini:
+          - key: fact_caching_compression
+            section: defaults
+        version_added: 4.4.0
 '''
 
 import collections
@@ -53,10 +84,13 @@ from itertools import chain
 from ansible import constants as C
 from ansible.errors import AnsibleError
 from ansible.module_utils.common._collections_compat import MutableSet
+from ansible.module_utils.six import binary_type, text_type
 from ansible.plugins.cache import BaseCacheModule
 from ansible.release import __version__ as ansible_base_version
 from ansible.utils.display import Display
 
+from ansible_collections.community.general.plugins.plugin_utils.cache_serializer import CacheSerializer
+
 try:
     import memcache
     HAS_MEMCACHE = True
@@ -181,6 +215,8 @@ class CacheModule(BaseCacheModule):
                 connection = self.get_option('_uri')
             self._timeout = self.get_option('_timeout')
             self._prefix = self.get_option('_prefix')
+            serializer = self.get_option('_serializer')
+            compression = self.get_option('_compression')
         except KeyError:
             # TODO: remove once we no longer support Ansible 2.9
             if not ansible_base_version.startswith('2.9.'):
@@ -189,10 +225,16 @@ class CacheModule(BaseCacheModule):
                 connection = C.CACHE_PLUGIN_CONNECTION.split(',')
             self._timeout = C.CACHE_PLUGIN_TIMEOUT
             self._prefix = C.CACHE_PLUGIN_PREFIX
+            serializer = 'pickle'
+            compression = 'none'
 
         if not HAS_MEMCACHE:
             raise AnsibleError("python-memcached is required for the memcached fact cache")
 
+        self._serializer = None
+        if serializer != 'pickle':
+            self._serializer = CacheSerializer(serializer, compression)
+
         self._cache = {}
         self._db = ProxyClientPool(connection, debug=0)
         self._keys = CacheModuleKeys(self._db, self._db.get(CacheModuleKeys.PREFIX) or [])
@@ -214,12 +256,22 @@ class CacheModule(BaseCacheModule):
             if value is None:
                 self.delete(key)
                 raise KeyError
-            self._cache[key] = value
+            self._cache[key] = self._decode(value)
 
         return self._cache.get(key)
 
+    def _decode(self, value):
+        # entries pickled by the client come back as python objects
+        if isinstance(value, (binary_type, text_type)):
+            return self._serializer.loads(value) if self._serializer else CacheSerializer().loads(value)
+        return value
+
     def set(self, key, value):
-        self._db.set(self._make_key(key), value, time=self._timeout, min_compress_len=1)
+        if self._serializer is None:
+            self._db.set(self._make_key(key), value, time=self._timeout, min_compress_len=1)
+        else:
+            # the serializer handles compression, do not let the client compress again
+            self._db.set(self._make_key(key), self._serializer.dumps(value), time=self._timeout, min_compress_len=0)
         self._cache[key] = value
         self._keys.add(key)
 
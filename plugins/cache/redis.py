@@ -13,6 +13,8 @@ DOCUMENTATION = '''
         - This cache uses JSON formatted, per host records saved in Redis.
     requirements:
       - redis>=2.4.5 (python lib)
+      - msgpack (python lib, for the C(msgpack) serializer)
+      - lz4 (python lib, for C(lz4) compression)
     options:
       _uri:
         description:
@@ -60,20 +62,61 @@ DOCUMENTATION = '''
           - key: fact_caching_timeout
             section: defaults
         type: integer
+      _expire_interval:
+        default: 0
+        description:
+          - Minimum number of seconds between two passes removing expired keys from the keyset.
+          - By default expired keys are removed every time the keyset is read.
+          - Raising this saves one round trip on most C(keys) and C(contains) calls; values themselves
+            still expire in redis after I(_timeout).
+        env:
+          - name: ANSIBLE_CACHE_REDIS_EXPIRE_INTERVAL
+        ini:
+          - key: fact_caching_redis_expire_interval
+            section: defaults
+        type: integer
+        version_added: 4.4.0
+      _serializer:
+        description:
+          - Format used to store the facts of each host.
+          - C(json) writes indented JSON, which can be read by older versions of this plugin.
+          - C(compact_json) writes JSON without whitespace.
+          - C(msgpack) writes MessagePack and requires the C(msgpack) python library.
+          - Entries are tagged with their format, so changing this does not invalidate an existing cache.
+        default: json
+        choices: [json, compact_json, msgpack]
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_SERIALIZER
+        ini:
+          - key: fact_caching_serializer
+            section: defaults
+        version_added: 4.4.0
+      _compression:
+        description:
+          - Compression applied to serialized entries.
+          - C(lz4) requires the C(lz4) python library.
+        default: none
+        choices: [none, zlib, lz4]
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_COMPRESSION
+        ini:
+          - key: fact_caching_compression
+            section: defaults
+        version_added: 4.4.0
 '''
 
 import re
 import time
-import json
 
 from ansible import constants as C
 from ansible.errors import AnsibleError
-from ansible.module_utils.common.text.converters import to_native
-from ansible.parsing.ajson import AnsibleJSONEncoder, AnsibleJSONDecoder
+from ansible.module_utils.common.text.converters import to_native, to_text
 from ansible.plugins.cache import BaseCacheModule
 from ansible.release import __version__ as ansible_base_version
 from ansible.utils.display import Display
 
+from ansible_collections.community.general.plugins.plugin_utils.cache_serializer import CacheSerializer
+
 try:
     from redis import StrictRedis, VERSION
     HAS_REDIS = True
@@ -91,8 +134,13 @@ class CacheModule(BaseCacheModule):
     when they are inserted. This allows for the usage of 'zremrangebyscore'
     to expire keys. This mechanism is used or a pattern matched 'scan' for
     performance.
+
+    Writes and deletes are sent as a single MULTI/EXEC pipeline, and bulk
+    reads use MGET in batches of '_mget_batch_size' keys.
     """
     _sentinel_service_name = None
+    _expire_interval = 0
+    _mget_batch_size = 1000
     re_url_conn = re.compile(r'^([^:]+|\[[^]]+\]):(\d+):(\d+)(?::(.*))?$')
     re_sent_conn = re.compile(r'^(.*):(\d+)$')
 
@@ -107,6 +155,8 @@ class CacheModule(BaseCacheModule):
             self._prefix = self.get_option('_prefix')
             self._keys_set = self.get_option('_keyset_name')
             self._sentinel_service_name = self.get_option('_sentinel_service_name')
+            self._expire_interval = float(self.get_option('_expire_interval') or 0)
+            self._serializer = CacheSerializer(self.get_option('_serializer'), self.get_option('_compression'))
         except KeyError:
             # TODO: remove once we no longer support Ansible 2.9
             if not ansible_base_version.startswith('2.9.'):
@@ -116,11 +166,13 @@ class CacheModule(BaseCacheModule):
             self._timeout = float(C.CACHE_PLUGIN_TIMEOUT)
             self._prefix = C.CACHE_PLUGIN_PREFIX
             self._keys_set = 'ansible_cache_keys'
+            self._serializer = CacheSerializer()
 
         if not HAS_REDIS:
             raise AnsibleError("The 'redis' python module (version 2.4.5 or newer) is required for the redis fact cache, 'pip install redis'")
 
         self._cache = {}
+        self._last_expiry = 0
         kw = {}
 
         # tls connection
@@ -180,6 +232,12 @@ class CacheModule(BaseCacheModule):
     def _make_key(self, key):
         return self._prefix + key
 
+    def _decode(self, value):
+        return self._serializer.loads(value)
+
+    def _encode(self, value):
+        return self._serializer.dumps(value)
+
     def get(self, key):
 
         if key not in self._cache:
@@ -190,51 +248,80 @@ class CacheModule(BaseCacheModule):
             if value is None:
                 self.delete(key)
                 raise KeyError
-            self._cache[key] = json.loads(value, cls=AnsibleJSONDecoder)
+            self._cache[key] = self._decode(value)
 
         return self._cache.get(key)
 
+    def get_many(self, keys):
+        """
+        Load several keys with batched MGET calls and return them as a dict.
+
+        Keys whose value is gone are removed from the keyset and left out of the result.
+        """
+        missing = [k for k in keys if k not in self._cache]
+        stale = []
+        for i in range(0, len(missing), self._mget_batch_size):
+            batch = missing[i:i + self._mget_batch_size]
+            values = self._db.mget([self._make_key(k) for k in batch])
+            for key, value in zip(batch, values):
+                if value is None:
+                    stale.append(key)
+                else:
+                    self._cache[key] = self._decode(value)
+        if stale:
+            self._delete_many(stale)
+
+        return dict((k, self._cache[k]) for k in keys if k in self._cache)
+
     def set(self, key, value):
 
-        value2 = json.dumps(value, cls=AnsibleJSONEncoder, sort_keys=True, indent=4)
+        value2 = self._encode(value)
+        pipe = self._db.pipeline(transaction=True)
         if self._timeout > 0:  # a timeout of 0 is handled as meaning 'never expire'
-            self._db.setex(self._make_key(key), int(self._timeout), value2)
+            pipe.setex(self._make_key(key), int(self._timeout), value2)
         else:
-            self._db.set(self._make_key(key), value2)
+            pipe.set(self._make_key(key), value2)
 
         if VERSION[0] == 2:
-            self._db.zadd(self._keys_set, time.time(), key)
+            pipe.zadd(self._keys_set, time.time(), key)
         else:
-            self._db.zadd(self._keys_set, {key: time.time()})
+            pipe.zadd(self._keys_set, {key: time.time()})
+        pipe.execute()
         self._cache[key] = value
 
     def _expire_keys(self):
         if self._timeout > 0:
-            expiry_age = time.time() - self._timeout
+            now = time.time()
+            if self._expire_interval > 0 and now - self._last_expiry < self._expire_interval:
+                return
+            expiry_age = now - self._timeout
             self._db.zremrangebyscore(self._keys_set, 0, expiry_age)
+            self._last_expiry = now
 
     def keys(self):
         self._expire_keys()
-        return self._db.zrange(self._keys_set, 0, -1)
+        return [to_text(k) for k in self._db.zrange(self._keys_set, 0, -1)]
 
     def contains(self, key):
         self._expire_keys()
         return (self._db.zrank(self._keys_set, key) is not None)
 
+    def _delete_many(self, keys):
+        pipe = self._db.pipeline(transaction=True)
+        for key in keys:
+            self._cache.pop(key, None)
+            pipe.delete(self._make_key(key))
+            pipe.zrem(self._keys_set, key)
+        pipe.execute()
+
     def delete(self, key):
-        if key in self._cache:
-            del self._cache[key]
-        self._db.delete(self._make_key(key))
-        self._db.zrem(self._keys_set, key)
+        self._delete_many([key])
 
     def flush(self):
-        for key in list(self.keys()):
-            self.delete(key)
+        self._delete_many(list(self.keys()))
 
     def copy(self):
-        # TODO: there is probably a better way to do this in redis
-        ret = dict([(k, self.get(k)) for k in self.keys()])
-        return ret
+        return self.get_many(self.keys())
 
     def __getstate__(self):
         return dict()
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    name: sharded_file
+    short_description: Sharded, index backed files
+    description:
+        - This cache stores per host files in hashed subdirectories of the cache directory and keeps an
+          index of keys and modification times next to them.
+        - Listing keys, checking expiry and C(contains) only read the index instead of scanning the whole directory,
+          which keeps startup fast with tens of thousands of hosts.
+        - Loading all entries reads the files with a pool of threads.
+        - The index is a journal that is appended to on every write and compacted when it grows too large.
+          If it is removed, it is rebuilt from the shard directories the next time the cache is opened.
+    author: Ansible Project (!UNKNOWN)
+    version_added: 4.4.0
+    requirements:
+      - msgpack (python lib, for the C(msgpack) serializer)
+      - lz4 (python lib, for C(lz4) compression)
+    options:
+      _uri:
+        required: True
+        description:
+          - Path in which the cache plugin will save the files.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_CONNECTION
+        ini:
+          - key: fact_caching_connection
+            section: defaults
+      _prefix:
+        description: User defined prefix to use when creating the files.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_PREFIX
+        ini:
+          - key: fact_caching_prefix
+            section: defaults
+      _timeout:
+        default: 86400
+        description: Expiration timeout in seconds for the cache plugin data. Set to 0 to never expire.
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_TIMEOUT
+        ini:
+          - key: fact_caching_timeout
+            section: defaults
+        type: integer
+      _serializer:
+        description:
+          - Format used to store the facts of each host.
+          - C(msgpack) requires the C(msgpack) python library.
+        default: compact_json
+        choices: [json, compact_json, msgpack]
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_SERIALIZER
+        ini:
+          - key: fact_caching_serializer
+            section: defaults
+      _compression:
+        description:
+          - Compression applied to serialized entries.
+          - C(lz4) requires the C(lz4) python library.
+        default: none
+        choices: [none, zlib, lz4]
+        env:
+          - name: ANSIBLE_CACHE_PLUGIN_COMPRESSION
+        ini:
+          - key: fact_caching_compression
+            section: defaults
+      _shard_count:
+        description:
+          - Number of subdirectories the files are spread over.
+          - Changing this on an existing cache directory makes the old entries unreachable; flush the cache first.
+        default: 256
+        type: integer
+        env:
+          - name: ANSIBLE_CACHE_SHARDED_FILE_SHARD_COUNT
+        ini:
+          - key: fact_caching_shard_count
+            section: defaults
+      _load_workers:
+        description:
+          - Number of threads used to read files when loading many entries at once.
+        default: 8
+        type: integer
+        env:
+          - name: ANSIBLE_CACHE_SHARDED_FILE_LOAD_WORKERS
+        ini:
+          - key: fact_caching_load_workers
+            section: defaults
+'''
+
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import time
+from multiprocessing.pool import ThreadPool
+
+from ansible.errors import AnsibleError
+from ansible.module_utils.common.text.converters import to_bytes, to_native, to_text
+from ansible.plugins.cache import BaseFileCacheModule
+from ansible.utils.display import Display
+
+from ansible_collections.community.general.plugins.plugin_utils.cache_serializer import CacheSerializer
+
+display = Display()
+
+
+class CacheModule(BaseFileCacheModule):
+    """
+    A caching module backed by files in hashed shard directories.
+
+    The index file maps every key to the time it was written. It is an
+    append-only journal of JSON lines, so a write costs a single short
+    append instead of rewriting the whole index.
+    """
+    INDEX_FILE = '.index'
+
+    def __init__(self, *args, **kwargs):
+        super(CacheModule, self).__init__(*args, **kwargs)
+        self._serializer = CacheSerializer(self.get_option('_serializer'), self.get_option('_compression'))
+        self._shard_count = max(1, int(self.get_option('_shard_count')))
+        self._load_workers = max(1, int(self.get_option('_load_workers')))
+        self._index = None
+        self._journal_length = 0
+
+    def _shard(self, key):
+        digest = hashlib.sha1(to_bytes(key)).hexdigest()
+        return '%02x' % (int(digest[:8], 16) % self._shard_count)
+
+    def _get_cache_file_name(self, key):
+        prefix = self.get_option('_prefix') or ''
+        return os.path.join(self._cache_dir, self._shard(key), '%s%s' % (prefix, key))
+
+    def _index_path(self):
+        return os.path.join(self._cache_dir, self.INDEX_FILE)
+
+    def _load(self, filepath):
+        with open(filepath, 'rb') as f:
+            return self._serializer.loads(f.read())
+
+    def _dump(self, value, filepath):
+        with open(filepath, 'wb') as f:
+            f.write(self._serializer.dumps(value))
+
+    @property
+    def index(self):
+        if self._index is None:
+            try:
+                self._read_index()
+            except (OSError, IOError) as e:
+                if e.errno != errno.ENOENT:
+                    display.warning("error in '%s' cache plugin while trying to read the index: %s" % (self.plugin_name, to_native(e)))
+                self._rebuild_index()
+        return self._index
+
+    def _read_index(self):
+        index = {}
+        length = 0
+        with open(self._index_path(), 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(to_text(line))
+                except ValueError:
+                    # a torn trailing line from an interrupted write
+                    continue
+                length += 1
+                if entry.get('d'):
+                    index.pop(entry['k'], None)
+                else:
+                    index[entry['k']] = entry['t']
+        self._index = index
+        self._journal_length = length
+        if length > 2 * len(index) + 1000:
+            self._write_index()
+
+    def _rebuild_index(self):
+        """ Rebuild the index from the files in the shard directories. """
+        prefix = self.get_option('_prefix') or ''
+        index = {}
+        for shard in os.listdir(self._cache_dir):
+            shard_dir = os.path.join(self._cache_dir, shard)
+            if shard.startswith('.') or not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.startswith('.') or not name.startswith(prefix):
+                    continue
+                try:
+                    index[name[len(prefix):]] = os.stat(os.path.join(shard_dir, name)).st_mtime
+                except (OSError, IOError):
+                    pass
+        self._index = index
+        self._write_index()
+
+    def _write_index(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir, prefix='.index')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for key, mtime in self._index.items():
+                    f.write(to_bytes(json.dumps({'k': key, 't': mtime}) + '\n'))
+            os.rename(tmp_path, self._index_path())
+            self._journal_length = len(self._index)
+        except (OSError, IOError) as e:
+            display.warning("error in '%s' cache plugin while trying to write the index: %s" % (self.plugin_name, to_native(e)))
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def _append_index(self, entry):
+        try:
+            with open(self._index_path(), 'ab') as f:
+                f.write(to_bytes(json.dumps(entry) + '\n'))
+            self._journal_length += 1
+        except (OSError, IOError) as e:
+            display.warning("error in '%s' cache plugin while trying to update the index: %s" % (self.plugin_name, to_native(e)))
+
+    def set(self, key, value):
+        shard_dir = os.path.dirname(self._get_cache_file_name(key))
+        if not os.path.isdir(shard_dir):
+            try:
+                os.makedirs(shard_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise AnsibleError("error in '%s' cache plugin while trying to create %s : %s" % (self.plugin_name, shard_dir, to_native(e)))
+
+        index = self.index
+        super(CacheModule, self).set(key, value)
+        index[key] = time.time()
+        self._append_index({'k': key, 't': index[key]})
+
+    def has_expired(self, key):
+        if self._timeout == 0:
+            return False
+
+        mtime = self.index.get(key)
+        if mtime is None or time.time() - mtime <= self._timeout:
+            return False
+
+        self._cache.pop(key, None)
+        return True
+
+    def keys(self):
+        if self._timeout == 0:
+            return list(self.index)
+        expiry_age = time.time() - self._timeout
+        return [k for k, mtime in self.index.items() if mtime >= expiry_age]
+
+    def contains(self, key):
+        if key in self._cache:
+            return True
+        return key in self.index and not self.has_expired(key)
+
+    def delete(self, key):
+        self._cache.pop(key, None)
+        try:
+            os.remove(self._get_cache_file_name(key))
+        except (OSError, IOError):
+            pass
+        if self.index.pop(key, None) is not None:
+            self._append_index({'k': key, 'd': True})
+
+    def flush(self):
+        self._cache = {}
+        for key in list(self.index):
+            try:
+                os.remove(self._get_cache_file_name(key))
+            except (OSError, IOError):
+                pass
+        self._index = {}
+        self._write_index()
+
+    def _load_key(self, key):
+        try:
+            self.get(key)
+        except KeyError:
+            pass
+
+    def get_many(self, keys):
+        """ Load several keys, reading the files that are not in memory yet concurrently. """
+        missing = [k for k in keys if k not in self._cache]
+        if len(missing) > 1 and self._load_workers > 1:
+            # make sure the index is loaded before the threads look at it
+            self.index
+            pool = ThreadPool(min(self._load_workers, len(missing)))
+            try:
+                pool.map(self._load_key, missing)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for key in missing:
+                self._load_key(key)
+        return dict((k, self._cache[k]) for k in keys if k in self._cache)
+
+    def copy(self):
+        return self.get_many(self.keys())
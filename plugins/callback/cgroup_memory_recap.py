@@ -23,7 +23,9 @@ DOCUMENTATION = '''
     options:
       max_mem_file:
         required: True
-        description: Path to cgroups C(memory.max_usage_in_bytes) file. Example C(/sys/fs/cgroup/memory/ansible_profile/memory.max_usage_in_bytes)
+        description:
+          - Path to cgroups C(memory.max_usage_in_bytes) file. Example C(/sys/fs/cgroup/memory/ansible_profile/memory.max_usage_in_bytes)
+          - With cgroup v2, use the C(memory.peak) file. Example C(/sys/fs/cgroup/ansible_profile/memory.peak)
         env:
           - name: CGROUP_MAX_MEM_FILE
         ini:
@@ -31,35 +33,185 @@ DOCUMENTATION = '''
             key: max_mem_file
       cur_mem_file:
         required: True
-        description: Path to C(memory.usage_in_bytes) file. Example C(/sys/fs/cgroup/memory/ansible_profile/memory.usage_in_bytes)
+        description:
+          - Path to C(memory.usage_in_bytes) file. Example C(/sys/fs/cgroup/memory/ansible_profile/memory.usage_in_bytes)
+          - With cgroup v2, use the C(memory.current) file. Example C(/sys/fs/cgroup/ansible_profile/memory.current)
         env:
           - name: CGROUP_CUR_MEM_FILE
         ini:
           - section: callback_cgroupmemrecap
             key: cur_mem_file
+      cpu_stat_file:
+        description:
+          - Path to the cgroup v2 C(cpu.stat) file. Example C(/sys/fs/cgroup/ansible_profile/cpu.stat)
+          - When set, the CPU time used by every task and by the whole execution is added to the recap.
+        type: path
+        env:
+          - name: CGROUP_CPU_STAT_FILE
+        ini:
+          - section: callback_cgroupmemrecap
+            key: cpu_stat_file
+        version_added: 4.4.0
+      io_stat_file:
+        description:
+          - Path to the cgroup v2 C(io.stat) file. Example C(/sys/fs/cgroup/ansible_profile/io.stat)
+          - When set, the bytes read and written by every task and by the whole execution are added to the recap.
+        type: path
+        env:
+          - name: CGROUP_IO_STAT_FILE
+        ini:
+          - section: callback_cgroupmemrecap
+            key: io_stat_file
+        version_added: 4.4.0
+      sample_interval:
+        description:
+          - Seconds to wait between two samples of the memory usage.
+        type: float
+        default: 0.001
+        env:
+          - name: CGROUP_SAMPLE_INTERVAL
+        ini:
+          - section: callback_cgroupmemrecap
+            key: sample_interval
+        version_added: 4.4.0
 '''
 
+import math
+import os
 import time
 import threading
 
+from ansible.module_utils.common.text.converters import to_native, to_text
 from ansible.plugins.callback import CallbackBase
 
 
+class StreamStats(object):
+    """
+    Constant memory summary of a stream of samples.
+
+    Quantiles are estimated from a histogram with logarithmically sized
+    buckets, so they are within ``accuracy`` of the real value relative to
+    it. When the histogram grows beyond ``max_buckets``, the lowest buckets
+    are merged, which only affects the accuracy of the lowest quantiles.
+    """
+
+    def __init__(self, accuracy=0.01, max_buckets=2048):
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._max_buckets = max_buckets
+        self._buckets = {}
+        self._zeros = 0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        if value <= 0:
+            self._zeros += 1
+            return
+        key = int(math.ceil(math.log(value) / self._log_gamma))
+        self._buckets[key] = self._buckets.get(key, 0) + 1
+        if len(self._buckets) > self._max_buckets:
+            lowest, second = sorted(self._buckets)[:2]
+            self._buckets[second] += self._buckets.pop(lowest)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        if rank >= self.count - 1:
+            return self.max
+        seen = self._zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if rank < seen:
+                return min(2 * self._gamma ** key / (self._gamma + 1), self.max)
+        return self.max
+
+
+if hasattr(os, 'pread'):
+    _pread = os.pread
+else:
+    # Python 2
+    _pread_lock = threading.Lock()
+
+    def _pread(fd, size, offset):
+        with _pread_lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            return os.read(fd, size)
+
+
+class CgroupFile(object):
+    """A cgroup file that stays open and is read again from the start on every read"""
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def read(self):
+        chunks = []
+        offset = 0
+        while True:
+            chunk = _pread(self.fd, 4096, offset)
+            chunks.append(chunk)
+            offset += len(chunk)
+            if len(chunk) < 4096:
+                break
+        return to_text(b''.join(chunks))
+
+    def read_int(self):
+        return int(self.read().strip())
+
+    def read_cpu_stat(self):
+        """Return user, system and total CPU seconds from a cpu.stat file"""
+        values = dict(line.split() for line in self.read().splitlines() if line.strip())
+        return dict((key, int(values.get('%s_usec' % key, 0)) / 1000000.0) for key in ('user', 'system', 'usage'))
+
+    def read_io_stat(self):
+        """Return the bytes read and written on all devices from an io.stat file"""
+        totals = {'rbytes': 0, 'wbytes': 0}
+        for line in self.read().splitlines():
+            for field in line.split()[1:]:
+                key, dummy, value = field.partition('=')
+                if key in totals:
+                    totals[key] += int(value)
+        return totals
+
+    def close(self):
+        os.close(self.fd)
+
+
 class MemProf(threading.Thread):
     """Python thread for recording memory usage"""
-    def __init__(self, path, obj=None):
+    def __init__(self, cgroup_file, obj=None, interval=0.001, run_stats=None):
         threading.Thread.__init__(self)
         self.obj = obj
-        self.path = path
-        self.results = []
+        self.cgroup_file = cgroup_file
+        self.interval = interval
+        self.stats = StreamStats()
+        self.run_stats = run_stats
         self.running = True
 
     def run(self):
-        while self.running:
-            with open(self.path) as f:
-                val = f.read()
-            self.results.append(int(val.strip()) / 1024 / 1024)
-            time.sleep(0.001)
+        # always take at least one sample, even for tasks that finish right away
+        while True:
+            value = self.cgroup_file.read_int() / 1024 / 1024
+            self.stats.add(value)
+            if self.run_stats is not None:
+                self.run_stats.add(value)
+            if not self.running:
+                break
+            time.sleep(self.interval)
 
 
 class CallbackModule(CallbackBase):
@@ -72,6 +224,9 @@ class CallbackModule(CallbackBase):
         super(CallbackModule, self).__init__(display)
 
         self._task_memprof = None
+        self._task_counters = None
+        self._run_counters = None
+        self._run_stats = StreamStats()
 
         self.task_results = []
 
@@ -80,26 +235,71 @@ class CallbackModule(CallbackBase):
 
         self.cgroup_max_file = self.get_option('max_mem_file')
         self.cgroup_current_file = self.get_option('cur_mem_file')
+        self.sample_interval = self.get_option('sample_interval')
+
+        try:
+            with open(self.cgroup_max_file, 'w+') as f:
+                f.write('0')
+        except (IOError, OSError) as e:
+            # memory.peak can only be reset on recent kernels
+            self._display.warning('Could not reset %s, the execution maximum includes usage from before this run: %s'
+                                  % (self.cgroup_max_file, to_native(e)))
+
+        self._current_file = CgroupFile(self.cgroup_current_file)
+        self._cpu_file = None
+        self._io_file = None
+        if self.get_option('cpu_stat_file'):
+            self._cpu_file = CgroupFile(self.get_option('cpu_stat_file'))
+        if self.get_option('io_stat_file'):
+            self._io_file = CgroupFile(self.get_option('io_stat_file'))
+        self._run_counters = self._read_counters()
+
+    def _read_counters(self):
+        counters = {}
+        if self._cpu_file:
+            counters.update(self._cpu_file.read_cpu_stat())
+        if self._io_file:
+            counters.update(self._io_file.read_io_stat())
+        return counters
+
+    def _counter_deltas(self, before):
+        after = self._read_counters()
+        return dict((key, after[key] - before[key]) for key in after)
+
+    def _close_files(self):
+        for cgroup_file in (self._current_file, self._cpu_file, self._io_file):
+            if cgroup_file is not None:
+                cgroup_file.close()
+        self._current_file = self._cpu_file = self._io_file = None
 
-        with open(self.cgroup_max_file, 'w+') as f:
-            f.write('0')
+    def _format_counters(self, counters):
+        parts = []
+        if 'usage' in counters:
+            parts.append('cpu %0.2fs (user %0.2fs, system %0.2fs)' % (counters['usage'], counters['user'], counters['system']))
+        if 'rbytes' in counters:
+            parts.append('io read %0.2fMB, written %0.2fMB' % (counters['rbytes'] / 1024 / 1024, counters['wbytes'] / 1024 / 1024))
+        return ', '.join(parts)
 
     def _profile_memory(self, obj=None):
         prev_task = None
-        results = None
+        stats = None
+        counters = None
         try:
             self._task_memprof.running = False
-            results = self._task_memprof.results
+            self._task_memprof.join()
+            stats = self._task_memprof.stats
             prev_task = self._task_memprof.obj
+            counters = self._counter_deltas(self._task_counters)
         except AttributeError:
             pass
 
         if obj is not None:
-            self._task_memprof = MemProf(self.cgroup_current_file, obj=obj)
+            self._task_counters = self._read_counters()
+            self._task_memprof = MemProf(self._current_file, obj=obj, interval=self.sample_interval, run_stats=self._run_stats)
             self._task_memprof.start()
 
-        if results is not None:
-            self.task_results.append((prev_task, max(results)))
+        if stats is not None:
+            self.task_results.append((prev_task, stats, counters))
 
     def v2_playbook_on_task_start(self, task, is_conditional):
         self._profile_memory(task)
@@ -111,7 +311,20 @@ class CallbackModule(CallbackBase):
             max_results = int(f.read().strip()) / 1024 / 1024
 
         self._display.banner('CGROUP MEMORY RECAP')
-        self._display.display('Execution Maximum: %0.2fMB\n\n' % max_results)
+        self._display.display('Execution Maximum: %0.2fMB' % max_results)
+        if self._run_stats.count:
+            self._display.display('Execution Samples: mean %0.2fMB, p50 %0.2fMB, p95 %0.2fMB, p99 %0.2fMB' % (
+                self._run_stats.mean, self._run_stats.quantile(0.5), self._run_stats.quantile(0.95), self._run_stats.quantile(0.99)))
+        counters = self._format_counters(self._counter_deltas(self._run_counters))
+        self._close_files()
+        if counters:
+            self._display.display('Execution Usage: %s' % counters)
+        self._display.display('\n')
 
-        for task, memory in self.task_results:
-            self._display.display('%s (%s): %0.2fMB' % (task.get_name(), task._uuid, memory))
+        for task, memory, counters in self.task_results:
+            line = '%s (%s): %0.2fMB (mean %0.2fMB, p50 %0.2fMB, p95 %0.2fMB, p99 %0.2fMB)' % (
+                task.get_name(), task._uuid, memory.max, memory.mean, memory.quantile(0.5), memory.quantile(0.95), memory.quantile(0.99))
+            counters = self._format_counters(counters)
+            if counters:
+                line = '%s, %s' % (line, counters)
+            self._display.display(line)
@@ -816,6 +816,10 @@ class CallbackModule(Default):
 
     DIY_NS = 'ansible_callback_diy'
 
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self._diy_vars_memo = {}
+
     @contextmanager
     def _suppress_stdout(self, enabled):
         saved_stdout = sys.stdout
@@ -829,6 +833,7 @@ class CallbackModule(Default):
         _calling_method = sys._getframe(1).f_code.co_name
         _callback_type = (_calling_method[3:] if _calling_method[:3] == "v2_" else _calling_method)
         _callback_options = ['msg', 'msg_color']
+        _templar = None
 
         for option in _callback_options:
             _option_name = '%s_%s' % (_callback_type, option)
@@ -836,10 +841,19 @@ class CallbackModule(Default):
                 self.DIY_NS + "_" + _option_name,
                 self.get_option(_option_name)
             )
+
+            # only set up templating for the options that are actually configured
+            if _option_template is None:
+                _ret.update({option: None})
+                continue
+
+            if _templar is None:
+                _templar = Templar(loader=loader, variables=variables)
             _ret.update({option: self._template(
                 loader=loader,
                 template=_option_template,
-                variables=variables
+                variables=variables,
+                templar=_templar
             )})
 
         _ret.update({'vars': variables})
@@ -852,8 +866,8 @@ class CallbackModule(Default):
     def _parent_has_callback(self):
         return hasattr(super(CallbackModule, self), sys._getframe(1).f_code.co_name)
 
-    def _template(self, loader, template, variables):
-        _templar = Templar(loader=loader, variables=variables)
+    def _template(self, loader, template, variables, templar=None):
+        _templar = templar or Templar(loader=loader, variables=variables)
         return _templar.template(
             template,
             preserve_trailing_newlines=True,
@@ -867,7 +881,8 @@ class CallbackModule(Default):
             self._display.display(msg=_msg, color=spec['msg_color'], stderr=stderr)
 
     def _get_vars(self, playbook, play=None, host=None, task=None, included_file=None,
-                  handler=None, result=None, stats=None, remove_attr_ref_loop=True):
+                  handler=None, result=None, stats=None, remove_attr_ref_loop=True,
+                  reuse_vars=False):
         def _get_value(obj, attr=None, method=None):
             if attr:
                 return getattr(obj, attr, getattr(obj, "_" + attr, None))
@@ -892,15 +907,28 @@ class CallbackModule(Default):
 
         _ret = {}
 
-        _variable_manager = VariableManager(loader=playbook.get_loader())
-
-        _all = _variable_manager.get_vars()
-        if play:
+        _host = (host if host else getattr(result, '_host', None))
+        _vars_key = (getattr(play, '_uuid', None), getattr(_host, 'name', None),
+                     getattr(handler if handler else task, '_uuid', None))
+        # Variables only change when a task result is processed. Runner start, item and
+        # retry events pass reuse_vars and share the variables of their host and task,
+        # every other event fetches them again.
+        if not reuse_vars:
+            self._diy_vars_memo.clear()
+
+        if _vars_key in self._diy_vars_memo:
+            _all = self._diy_vars_memo[_vars_key]
+        elif play:
             _all = play.get_variable_manager().get_vars(
                 play=play,
-                host=(host if host else getattr(result, '_host', None)),
+                host=_host,
                 task=(handler if handler else task)
             )
+        else:
+            _all = VariableManager(loader=playbook.get_loader()).get_vars()
+
+        if reuse_vars:
+            self._diy_vars_memo[_vars_key] = _all
         _ret.update(_all)
 
         _ret.update(_ret.get(self.DIY_NS, {self.DIY_NS: CallbackDIYDict()}))
@@ -1122,7 +1150,8 @@ class CallbackModule(Default):
                 play=self._diy_play,
                 task=self._diy_task,
                 result=result,
-                remove_attr_ref_loop=False
+                remove_attr_ref_loop=False,
+                reuse_vars=True
             )
         )
 
@@ -1141,7 +1170,8 @@ class CallbackModule(Default):
                 play=self._diy_play,
                 task=self._diy_task,
                 result=result,
-                remove_attr_ref_loop=False
+                remove_attr_ref_loop=False,
+                reuse_vars=True
             )
         )
 
@@ -1160,7 +1190,8 @@ class CallbackModule(Default):
                 play=self._diy_play,
                 task=self._diy_task,
                 result=result,
-                remove_attr_ref_loop=False
+                remove_attr_ref_loop=False,
+                reuse_vars=True
             )
         )
 
@@ -1178,7 +1209,8 @@ class CallbackModule(Default):
                 playbook=self._diy_playbook,
                 play=self._diy_play,
                 task=self._diy_task,
-                result=result
+                result=result,
+                reuse_vars=True
             )
         )
 
@@ -1199,7 +1231,8 @@ class CallbackModule(Default):
                 playbook=self._diy_playbook,
                 play=self._diy_play,
                 host=self._diy_host,
-                task=self._diy_task
+                task=self._diy_task,
+                reuse_vars=True
             )
         )
 
@@ -25,11 +25,38 @@ DOCUMENTATION = '''
         ini:
           - section: callback_log_plays
             key: log_folder
+      max_open_files:
+        description:
+          - Number of per host log files that are kept open between writes. The least recently used file is closed
+            when the limit is reached.
+          - Writes to open files are buffered and flushed at the end of every play.
+          - The default of C(0) opens and closes the log file for every result.
+        type: int
+        default: 0
+        env:
+          - name: ANSIBLE_LOG_PLAYS_MAX_OPEN_FILES
+        ini:
+          - section: callback_log_plays
+            key: max_open_files
+        version_added: 4.4.0
+      json_lines_file:
+        description:
+          - When set, write every result as a JSON object on its own line to this file instead of writing
+            one file per host. Each object has a C(host) field.
+          - Writes are buffered and flushed at the end of every play.
+        type: path
+        env:
+          - name: ANSIBLE_LOG_PLAYS_JSON_LINES_FILE
+        ini:
+          - section: callback_log_plays
+            key: json_lines_file
+        version_added: 4.4.0
 '''
 
 import os
 import time
 import json
+from collections import OrderedDict
 
 from ansible.utils.path import makedirs_safe
 from ansible.module_utils.common.text.converters import to_bytes
@@ -45,6 +72,39 @@ from ansible.plugins.callback import CallbackBase
 # that want it.
 
 
+class FilePool(object):
+    """
+    Keep up to ``size`` files open for appending, closing the least recently used one first.
+    With a ``size`` of 0, every write opens and closes the file.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._files = OrderedDict()
+
+    def write(self, path, data):
+        if self.size < 1:
+            with open(path, "ab") as fd:
+                fd.write(data)
+            return
+
+        fd = self._files.pop(path, None)
+        if fd is None:
+            if len(self._files) >= self.size:
+                self._files.popitem(last=False)[1].close()
+            fd = open(path, "ab")
+        self._files[path] = fd
+        fd.write(data)
+
+    def flush(self):
+        for fd in self._files.values():
+            fd.flush()
+
+    def close(self):
+        while self._files:
+            self._files.popitem()[1].close()
+
+
 class CallbackModule(CallbackBase):
     """
     logs playbook results, per host, in /var/log/ansible/hosts
@@ -65,11 +125,45 @@ class CallbackModule(CallbackBase):
         super(CallbackModule, self).set_options(task_keys=task_keys, var_options=var_options, direct=direct)
 
         self.log_folder = self.get_option("log_folder")
-
-        if not os.path.exists(self.log_folder):
-            makedirs_safe(self.log_folder)
+        self.json_lines_file = self.get_option("json_lines_file")
+
+        if self.json_lines_file:
+            makedirs_safe(os.path.dirname(self.json_lines_file))
+            # a single file, keep it open for the whole run
+            self.files = FilePool(1)
+        else:
+            if not os.path.exists(self.log_folder):
+                makedirs_safe(self.log_folder)
+            self.files = FilePool(self.get_option("max_open_files"))
+
+    def log_json(self, result, category):
+        data = result._result
+        record = dict(
+            time=time.strftime(self.TIME_FORMAT, time.localtime()),
+            playbook=self.playbook,
+            host=result._host.get_name(),
+            task_name=result._task.name,
+            task_action=result._task.action,
+            category=category,
+        )
+        if isinstance(data, MutableMapping) and '_ansible_verbose_override' in data:
+            # avoid logging extraneous data
+            record['data'] = 'omitted'
+        elif isinstance(data, MutableMapping):
+            data = data.copy()
+            invocation = data.pop('invocation', None)
+            if invocation is not None:
+                record['invocation'] = invocation
+            record['data'] = data
+        else:
+            record['data'] = data
+
+        self.files.write(self.json_lines_file, to_bytes(json.dumps(record, cls=AnsibleJSONEncoder) + "\n"))
 
     def log(self, result, category):
+        if self.json_lines_file:
+            return self.log_json(result, category)
+
         data = result._result
         if isinstance(data, MutableMapping):
             if '_ansible_verbose_override' in data:
@@ -96,8 +190,7 @@ class CallbackModule(CallbackBase):
                 data=data,
             )
         )
-        with open(path, "ab") as fd:
-            fd.write(msg)
+        self.files.write(path, msg)
 
     def v2_runner_on_failed(self, result, ignore_errors=False):
         self.log(result, 'FAILED')
@@ -117,6 +210,13 @@ class CallbackModule(CallbackBase):
     def v2_playbook_on_start(self, playbook):
         self.playbook = playbook._file_name
 
+    def v2_playbook_on_play_start(self, play):
+        # the previous play ended
+        self.files.flush()
+
+    def v2_playbook_on_stats(self, stats):
+        self.files.close()
+
     def v2_playbook_on_import_for_host(self, result, imported_file):
         self.log(result, 'IMPORTED', imported_file)
 
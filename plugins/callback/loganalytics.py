@@ -33,6 +33,90 @@ DOCUMENTATION = '''
         ini:
           - section: callback_loganalytics
             key: shared_key
+      threaded:
+        description:
+          - Send events from a background thread instead of blocking the play for every task result.
+          - Events are sent in batches, see I(flush_size) and I(flush_interval), and the remaining events are
+            sent when the playbook finishes.
+        env:
+          - name: LOGANALYTICS_THREADED
+        ini:
+          - section: callback_loganalytics
+            key: threaded
+        type: bool
+        default: false
+        version_added: 4.4.0
+      queue_size:
+        description:
+          - Maximum number of events waiting to be sent when I(threaded=true).
+          - Further events are dropped and counted until the queue has room again.
+        env:
+          - name: LOGANALYTICS_QUEUE_SIZE
+        ini:
+          - section: callback_loganalytics
+            key: queue_size
+        type: int
+        default: 10000
+        version_added: 4.4.0
+      flush_size:
+        description:
+          - Maximum number of events sent in one request when I(threaded=true).
+        env:
+          - name: LOGANALYTICS_FLUSH_SIZE
+        ini:
+          - section: callback_loganalytics
+            key: flush_size
+        type: int
+        default: 100
+        version_added: 4.4.0
+      flush_interval:
+        description:
+          - Maximum number of seconds an event waits before being sent when I(threaded=true).
+        env:
+          - name: LOGANALYTICS_FLUSH_INTERVAL
+        ini:
+          - section: callback_loganalytics
+            key: flush_interval
+        type: float
+        default: 5
+        version_added: 4.4.0
+      retries:
+        description:
+          - Number of times a failed request is retried when I(threaded=true).
+          - The delay between attempts starts at one second and doubles after every attempt.
+        env:
+          - name: LOGANALYTICS_RETRIES
+        ini:
+          - section: callback_loganalytics
+            key: retries
+        type: int
+        default: 3
+        version_added: 4.4.0
+      spool_path:
+        description:
+          - File in which events are stored when they cannot be sent, instead of dropping them.
+          - Spooled events are sent again in the background at the start of the next playbook run and as soon as
+            the collector accepts requests again. While the collector is failing, new events go straight to the
+            spool so the play is only delayed by a local write.
+          - Setting this implies I(threaded=true). The file must not be shared between concurrent runs.
+        env:
+          - name: LOGANALYTICS_SPOOL_PATH
+        ini:
+          - section: callback_loganalytics
+            key: spool_path
+        type: path
+        version_added: 4.4.0
+      spool_max_size:
+        description:
+          - Maximum size of the spool file in bytes. Events that do not fit anymore are dropped.
+        env:
+          - name: LOGANALYTICS_SPOOL_MAX_SIZE
+        ini:
+          - section: callback_loganalytics
+            key: spool_max_size
+        type: int
+        default: 10485760
+        version_added: 4.4.0
 '''
 
 EXAMPLES = '''
@@ -65,6 +149,8 @@ from ansible.module_utils.urls import open_url
 from ansible.parsing.ajson import AnsibleJSONEncoder
 from ansible.plugins.callback import CallbackBase
 
+from ansible_collections.community.general.plugins.plugin_utils.event_sender import sender_from_options
+
 
 class AzureLogAnalyticsSource(object):
     def __init__(self):
@@ -95,6 +181,9 @@ class AzureLogAnalyticsSource(object):
         return datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
 
     def send_event(self, workspace_id, shared_key, state, result, runtime):
+        self.post_events(workspace_id, shared_key, [self.build_event(state, result, runtime)])
+
+    def build_event(self, state, result, runtime):
         if result._task_fields['args'].get('_ansible_check_mode') is True:
             self.ansible_check_mode = True
 
@@ -132,7 +221,14 @@ class AzureLogAnalyticsSource(object):
         data['extra_vars'] = self.extra_vars
 
         # Preparing the playbook logs as JSON format and send to Azure log analytics
-        jsondata = json.dumps({'event': data}, cls=AnsibleJSONEncoder, sort_keys=True)
+        return json.dumps({'event': data}, cls=AnsibleJSONEncoder, sort_keys=True)
+
+    def post_events(self, workspace_id, shared_key, events):
+        # the data collector API accepts a JSON array of records
+        if len(events) == 1:
+            jsondata = events[0]
+        else:
+            jsondata = '[' + ','.join(events) + ']'
         content_length = len(jsondata)
         rfc1123date = self.__rfc1123date()
         signature = self.__build_signature(rfc1123date, workspace_id, shared_key, content_length)
@@ -162,6 +258,7 @@ class CallbackModule(CallbackBase):
         self.start_datetimes = {}  # Collect task start times
         self.workspace_id = None
         self.shared_key = None
+        self.sender = None
         self.loganalytics = AzureLogAnalyticsSource()
 
     def _seconds_since_start(self, result):
@@ -175,6 +272,23 @@ class CallbackModule(CallbackBase):
         self.workspace_id = self.get_option('workspace_id')
         self.shared_key = self.get_option('shared_key')
 
+        self.sender = sender_from_options(self, self._post_events, self._display)
+
+    def _post_events(self, events):
+        self.loganalytics.post_events(self.workspace_id, self.shared_key, events)
+
+    def _send_event(self, state, result):
+        if self.sender is None:
+            self.loganalytics.send_event(
+                self.workspace_id,
+                self.shared_key,
+                state,
+                result,
+                self._seconds_since_start(result)
+            )
+        else:
+            self.sender.put(self.loganalytics.build_event(state, result, self._seconds_since_start(result)))
+
     def v2_playbook_on_play_start(self, play):
         vm = play.get_variable_manager()
         extra_vars = vm.extra_vars
@@ -190,46 +304,21 @@ class CallbackModule(CallbackBase):
         self.start_datetimes[task._uuid] = datetime.utcnow()
 
     def v2_runner_on_ok(self, result, **kwargs):
-        self.loganalytics.send_event(
-            self.workspace_id,
-            self.shared_key,
-            'OK',
-            result,
-            self._seconds_since_start(result)
-        )
+        self._send_event('OK', result)
 
     def v2_runner_on_skipped(self, result, **kwargs):
-        self.loganalytics.send_event(
-            self.workspace_id,
-            self.shared_key,
-            'SKIPPED',
-            result,
-            self._seconds_since_start(result)
-        )
+        self._send_event('SKIPPED', result)
 
     def v2_runner_on_failed(self, result, **kwargs):
-        self.loganalytics.send_event(
-            self.workspace_id,
-            self.shared_key,
-            'FAILED',
-            result,
-            self._seconds_since_start(result)
-        )
+        self._send_event('FAILED', result)
 
     def runner_on_async_failed(self, result, **kwargs):
-        self.loganalytics.send_event(
-            self.workspace_id,
-            self.shared_key,
-            'FAILED',
-            result,
-            self._seconds_since_start(result)
-        )
+        self._send_event('FAILED', result)
 
     def v2_runner_on_unreachable(self, result, **kwargs):
-        self.loganalytics.send_event(
-            self.workspace_id,
-            self.shared_key,
-            'UNREACHABLE',
-            result,
-            self._seconds_since_start(result)
-        )
+        self._send_event('UNREACHABLE', result)
+
+    def v2_playbook_on_stats(self, stats):
+        if self.sender is not None:
+            self.sender.close()
+            self.sender.report(self._display, 'Azure Log Analytics')
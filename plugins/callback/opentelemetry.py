@@ -49,6 +49,19 @@ DOCUMENTATION = '''
           - The L(W3C Trace Context header traceparent,https://www.w3.org/TR/trace-context-1/#traceparent-header).
         env:
           - name: TRACEPARENT
+      streaming:
+        default: false
+        type: bool
+        description:
+          - Export the span of every host as soon as its task result arrives, instead of building the whole
+            trace when the playbook finishes.
+          - Spans are handed to a batch span processor, so they are sent in the background while the playbook runs
+            and the memory used by this callback does not grow with the number of task results.
+          - Results of several includes of the same task for one host are exported as separate spans.
+          - A task is forgotten once the spans of all hosts it ran on have been exported.
+        env:
+          - name: ANSIBLE_OPENTELEMETRY_STREAMING
+        version_added: 4.4.0
     requirements:
       - opentelemetry-api (Python library)
       - opentelemetry-exporter-otlp (Python library)
@@ -94,6 +107,7 @@ try:
     from opentelemetry.sdk.trace.export import (
         BatchSpanProcessor
     )
+    from opentelemetry.trace import set_span_in_context
     from opentelemetry.util._time import _time_ns
 except ImportError as imp_exc:
     OTEL_LIBRARY_IMPORT_ERROR = imp_exc
@@ -118,6 +132,8 @@ class TaskData:
             self.start = _time_ns()
         self.action = action
         self.args = args
+        self.exported_hosts = set()
+        self.running_hosts = set()
 
     def add_host(self, host):
         if host.uuid in self.host_data:
@@ -130,6 +146,25 @@ class TaskData:
         self.host_data[host.uuid] = host
 
 
+class TrimmedResult:
+    """
+    The parts of a task result that end up in a span.
+    """
+
+    RESULT_KEYS = ('rc', 'msg', 'exception', 'stderr', 'skip_reason')
+    LOOP_RESULT_KEYS = ('failed', 'item', 'msg', 'exception', 'stderr')
+
+    def __init__(self, result):
+        res = result._result
+        self._result = dict((k, res[k]) for k in self.RESULT_KEYS if k in res)
+        if 'results' in res:
+            # only failed items are used to build the error messages
+            self._result['results'] = [
+                dict((k, item[k]) for k in self.LOOP_RESULT_KEYS if k in item)
+                for item in res['results'] if isinstance(item, dict) and item.get('failed', False)
+            ]
+
+
 class HostData:
     """
     Data about an individual host.
@@ -159,6 +194,8 @@ class OpenTelemetrySource(object):
         self.user = getpass.getuser()
 
         self._display = display
+        self.tracer = None
+        self.parent_span = None
 
     def traceparent_context(self, traceparent):
         carrier = dict()
@@ -173,6 +210,11 @@ class OpenTelemetrySource(object):
         if uuid in tasks_data:
             return
 
+        if self.parent_span is not None:
+            # when streaming, only keep the tasks that still run on some host
+            for done in [k for k, v in tasks_data.items() if not v.running_hosts]:
+                del tasks_data[done]
+
         name = task.get_name().strip()
         path = task.get_path()
         action = task.action
@@ -183,6 +225,19 @@ class OpenTelemetrySource(object):
 
         tasks_data[uuid] = TaskData(uuid, name, path, play_name, action, args)
 
+    def start_host(self, tasks_data, hide_task_arguments, play_name, host, task):
+        """ record the start of a task on a single host when streaming """
+
+        self.start_task(tasks_data, hide_task_arguments, play_name, task)
+        tasks_data[task._uuid].running_hosts.add(host._uuid)
+
+    def finish_host(self, tasks_data, result):
+        """ record that a task ended on a single host without a span when streaming """
+
+        task = tasks_data.get(result._task._uuid)
+        if task is not None:
+            task.running_hosts.discard(result._host._uuid)
+
     def finish_task(self, tasks_data, status, result):
         """ record the results of a task for a single host """
 
@@ -195,22 +250,29 @@ class OpenTelemetrySource(object):
             host_uuid = 'include'
             host_name = 'include'
 
-        task = tasks_data[task_uuid]
+        task = tasks_data.get(task_uuid)
+        if task is None:
+            # streaming has exported every span of this task already
+            return
 
         if self.ansible_version is None and result._task_fields['args'].get('_ansible_version'):
             self.ansible_version = result._task_fields['args'].get('_ansible_version')
 
-        task.add_host(HostData(host_uuid, host_name, status, result))
+        if status != 'included':
+            # do not keep the whole result around, only what ends up in the span
+            result = TrimmedResult(result)
+        host_data = HostData(host_uuid, host_name, status, result)
 
-    def generate_distributed_traces(self, otel_service_name, ansible_playbook, tasks_data, status, traceparent):
-        """ generate distributed traces from the collected TaskData and HostData """
+        if self.parent_span is None:
+            task.add_host(host_data)
+        elif status == 'included' or host_uuid not in task.exported_hosts:
+            task.exported_hosts.add(host_uuid)
+            task.running_hosts.discard(host_uuid)
+            span = self.tracer.start_span(task.name, context=set_span_in_context(self.parent_span), start_time=task.start)
+            self.update_span_data(task, host_data, span)
 
-        tasks = []
-        parent_start_time = None
-        for task_uuid, task in tasks_data.items():
-            if parent_start_time is None:
-                parent_start_time = task.start
-            tasks.append(task)
+    def init_tracer(self, otel_service_name):
+        """ set up the tracer provider with a batch span processor and return a tracer """
 
         trace.set_tracer_provider(
             TracerProvider(
@@ -222,19 +284,51 @@ class OpenTelemetrySource(object):
 
         trace.get_tracer_provider().add_span_processor(processor)
 
-        tracer = trace.get_tracer(__name__)
+        return trace.get_tracer(__name__)
+
+    def update_parent_span_data(self, parent, status):
+        """ update the playbook span with the status and trace metadata """
+
+        parent.set_status(status)
+        # Populate trace metadata attributes
+        if self.ansible_version is not None:
+            parent.set_attribute("ansible.version", self.ansible_version)
+        parent.set_attribute("ansible.session", self.session)
+        parent.set_attribute("ansible.host.name", self.host)
+        if self.ip_address is not None:
+            parent.set_attribute("ansible.host.ip", self.ip_address)
+        parent.set_attribute("ansible.host.user", self.user)
+
+    def start_streaming(self, otel_service_name, ansible_playbook, traceparent):
+        """ start the playbook span, host spans are exported from finish_task from now on """
+
+        self.tracer = self.init_tracer(otel_service_name)
+        self.parent_span = self.tracer.start_span(ansible_playbook, context=self.traceparent_context(traceparent),
+                                                  kind=SpanKind.SERVER)
+
+    def finish_streaming(self, status):
+        """ end the playbook span and export what is left """
+
+        self.update_parent_span_data(self.parent_span, status)
+        self.parent_span.end()
+        self.parent_span = None
+        trace.get_tracer_provider().force_flush()
+
+    def generate_distributed_traces(self, otel_service_name, ansible_playbook, tasks_data, status, traceparent):
+        """ generate distributed traces from the collected TaskData and HostData """
+
+        tasks = []
+        parent_start_time = None
+        for task_uuid, task in tasks_data.items():
+            if parent_start_time is None:
+                parent_start_time = task.start
+            tasks.append(task)
+
+        tracer = self.init_tracer(otel_service_name)
 
         with tracer.start_as_current_span(ansible_playbook, context=self.traceparent_context(traceparent),
                                           start_time=parent_start_time, kind=SpanKind.SERVER) as parent:
-            parent.set_status(status)
-            # Populate trace metadata attributes
-            if self.ansible_version is not None:
-                parent.set_attribute("ansible.version", self.ansible_version)
-            parent.set_attribute("ansible.session", self.session)
-            parent.set_attribute("ansible.host.name", self.host)
-            if self.ip_address is not None:
-                parent.set_attribute("ansible.host.ip", self.ip_address)
-            parent.set_attribute("ansible.host.user", self.user)
+            self.update_parent_span_data(parent, status)
             for task in tasks:
                 for host_uuid, host_data in task.host_data.items():
                     with tracer.start_as_current_span(task.name, start_time=task.start, end_on_exit=False) as span:
@@ -395,6 +489,7 @@ class CallbackModule(CallbackBase):
         self.errors = 0
         self.disabled = False
         self.traceparent = False
+        self.streaming = False
 
         if OTEL_LIBRARY_IMPORT_ERROR:
             raise_from(
@@ -426,8 +521,16 @@ class CallbackModule(CallbackBase):
         # See https://github.com/open-telemetry/opentelemetry-specification/issues/740
         self.traceparent = self.get_option('traceparent')
 
+        self.streaming = self.get_option('streaming')
+
     def v2_playbook_on_start(self, playbook):
         self.ansible_playbook = basename(playbook._file_name)
+        if self.streaming:
+            self.opentelemetry.start_streaming(
+                self.otel_service_name,
+                self.ansible_playbook,
+                self.traceparent
+            )
 
     def v2_playbook_on_play_start(self, play):
         self.play_name = play.get_name()
@@ -464,6 +567,23 @@ class CallbackModule(CallbackBase):
             task
         )
 
+    def v2_runner_on_start(self, host, task):
+        if self.streaming:
+            self.opentelemetry.start_host(
+                self.tasks_data,
+                self.hide_task_arguments,
+                self.play_name,
+                host,
+                task
+            )
+
+    def v2_runner_on_unreachable(self, result):
+        if self.streaming:
+            self.opentelemetry.finish_host(
+                self.tasks_data,
+                result
+            )
+
     def v2_runner_on_failed(self, result, ignore_errors=False):
         if ignore_errors:
             status = 'ignored'
@@ -503,6 +623,9 @@ class CallbackModule(CallbackBase):
             status = Status(status_code=StatusCode.OK)
         else:
             status = Status(status_code=StatusCode.ERROR)
+        if self.streaming:
+            self.opentelemetry.finish_streaming(status)
+            return
         self.opentelemetry.generate_distributed_traces(
             self.otel_service_name,
             self.ansible_playbook,
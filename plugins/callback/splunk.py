@@ -78,6 +78,90 @@ DOCUMENTATION = '''
             key: batch
         type: str
         version_added: 3.3.0
+      threaded:
+        description:
+          - Send events from a background thread instead of blocking the play for every task result.
+          - Events are sent in batches, see I(flush_size) and I(flush_interval), and the remaining events are
+            sent when the playbook finishes.
+        env:
+          - name: SPLUNK_THREADED
+        ini:
+          - section: callback_splunk
+            key: threaded
+        type: bool
+        default: false
+        version_added: 4.4.0
+      queue_size:
+        description:
+          - Maximum number of events waiting to be sent when I(threaded=true).
+          - Further events are dropped and counted until the queue has room again.
+        env:
+          - name: SPLUNK_QUEUE_SIZE
+        ini:
+          - section: callback_splunk
+            key: queue_size
+        type: int
+        default: 10000
+        version_added: 4.4.0
+      flush_size:
+        description:
+          - Maximum number of events sent in one request when I(threaded=true).
+        env:
+          - name: SPLUNK_FLUSH_SIZE
+        ini:
+          - section: callback_splunk
+            key: flush_size
+        type: int
+        default: 100
+        version_added: 4.4.0
+      flush_interval:
+        description:
+          - Maximum number of seconds an event waits before being sent when I(threaded=true).
+        env:
+          - name: SPLUNK_FLUSH_INTERVAL
+        ini:
+          - section: callback_splunk
+            key: flush_interval
+        type: float
+        default: 5
+        version_added: 4.4.0
+      retries:
+        description:
+          - Number of times a failed request is retried when I(threaded=true).
+          - The delay between attempts starts at one second and doubles after every attempt.
+        env:
+          - name: SPLUNK_RETRIES
+        ini:
+          - section: callback_splunk
+            key: retries
+        type: int
+        default: 3
+        version_added: 4.4.0
+      spool_path:
+        description:
+          - File in which events are stored when they cannot be sent, instead of dropping them.
+          - Spooled events are sent again in the background at the start of the next playbook run and as soon as
+            the collector accepts requests again. While the collector is failing, new events go straight to the
+            spool so the play is only delayed by a local write.
+          - Setting this implies I(threaded=true). The file must not be shared between concurrent runs.
+        env:
+          - name: SPLUNK_SPOOL_PATH
+        ini:
+          - section: callback_splunk
+            key: spool_path
+        type: path
+        version_added: 4.4.0
+      spool_max_size:
+        description:
+          - Maximum size of the spool file in bytes. Events that do not fit anymore are dropped.
+        env:
+          - name: SPLUNK_SPOOL_MAX_SIZE
+        ini:
+          - section: callback_splunk
+            key: spool_max_size
+        type: int
+        default: 10485760
+        version_added: 4.4.0
 '''
 
 EXAMPLES = '''
@@ -106,6 +190,8 @@ from ansible.module_utils.urls import open_url
 from ansible.parsing.ajson import AnsibleJSONEncoder
 from ansible.plugins.callback import CallbackBase
 
+from ansible_collections.community.general.plugins.plugin_utils.event_sender import sender_from_options
+
 
 class SplunkHTTPCollectorSource(object):
     def __init__(self):
@@ -118,6 +204,9 @@ class SplunkHTTPCollectorSource(object):
         self.user = getpass.getuser()
 
     def send_event(self, url, authtoken, validate_certs, include_milliseconds, batch, state, result, runtime):
+        self.post_events(url, authtoken, validate_certs, [self.build_event(include_milliseconds, batch, state, result, runtime)])
+
+    def build_event(self, include_milliseconds, batch, state, result, runtime):
         if result._task_fields['args'].get('_ansible_check_mode') is True:
             self.ansible_check_mode = True
 
@@ -160,11 +249,13 @@ class SplunkHTTPCollectorSource(object):
 
         # This wraps the json payload in and outer json event needed by Splunk
         jsondata = json.dumps(data, cls=AnsibleJSONEncoder, sort_keys=True)
-        jsondata = '{"event":' + jsondata + "}"
+        return '{"event":' + jsondata + "}"
 
+    def post_events(self, url, authtoken, validate_certs, events):
+        # HEC accepts several events in one request, separated by newlines
         open_url(
             url,
-            jsondata,
+            '\n'.join(events),
             headers={
                 'Content-type': 'application/json',
                 'Authorization': 'Splunk ' + authtoken
@@ -188,6 +279,7 @@ class CallbackModule(CallbackBase):
         self.validate_certs = None
         self.include_milliseconds = None
         self.batch = None
+        self.sender = None
         self.splunk = SplunkHTTPCollectorSource()
 
     def _runtime(self, result):
@@ -227,6 +319,26 @@ class CallbackModule(CallbackBase):
 
         self.batch = self.get_option('batch')
 
+        self.sender = sender_from_options(self, self._post_events, self._display)
+
+    def _post_events(self, events):
+        self.splunk.post_events(self.url, self.authtoken, self.validate_certs, events)
+
+    def _send_event(self, state, result):
+        if self.sender is None:
+            self.splunk.send_event(
+                self.url,
+                self.authtoken,
+                self.validate_certs,
+                self.include_milliseconds,
+                self.batch,
+                state,
+                result,
+                self._runtime(result)
+            )
+        else:
+            self.sender.put(self.splunk.build_event(self.include_milliseconds, self.batch, state, result, self._runtime(result)))
+
     def v2_playbook_on_start(self, playbook):
         self.splunk.ansible_playbook = basename(playbook._file_name)
 
@@ -237,61 +349,21 @@ class CallbackModule(CallbackBase):
         self.start_datetimes[task._uuid] = datetime.utcnow()
 
     def v2_runner_on_ok(self, result, **kwargs):
-        self.splunk.send_event(
-            self.url,
-            self.authtoken,
-            self.validate_certs,
-            self.include_milliseconds,
-            self.batch,
-            'OK',
-            result,
-            self._runtime(result)
-        )
+        self._send_event('OK', result)
 
     def v2_runner_on_skipped(self, result, **kwargs):
-        self.splunk.send_event(
-            self.url,
-            self.authtoken,
-            self.validate_certs,
-            self.include_milliseconds,
-            self.batch,
-            'SKIPPED',
-            result,
-            self._runtime(result)
-        )
+        self._send_event('SKIPPED', result)
 
     def v2_runner_on_failed(self, result, **kwargs):
-        self.splunk.send_event(
-            self.url,
-            self.authtoken,
-            self.validate_certs,
-            self.include_milliseconds,
-            self.batch,
-            'FAILED',
-            result,
-            self._runtime(result)
-        )
+        self._send_event('FAILED', result)
 
     def runner_on_async_failed(self, result, **kwargs):
-        self.splunk.send_event(
-            self.url,
-            self.authtoken,
-            self.validate_certs,
-            self.include_milliseconds,
-            self.batch,
-            'FAILED',
-            result,
-            self._runtime(result)
-        )
+        self._send_event('FAILED', result)
 
     def v2_runner_on_unreachable(self, result, **kwargs):
-        self.splunk.send_event(
-            self.url,
-            self.authtoken,
-            self.validate_certs,
-            self.include_milliseconds,
-            self.batch,
-            'UNREACHABLE',
-            result,
-            self._runtime(result)
-        )
+        self._send_event('UNREACHABLE', result)
+
+    def v2_playbook_on_stats(self, stats):
+        if self.sender is not None:
+            self.sender.close()
+            self.sender.report(self._display, 'Splunk HTTP collector')
@@ -36,6 +36,90 @@ options:
     ini:
       - section: callback_sumologic
         key: url
+  threaded:
+    description:
+      - Send events from a background thread instead of blocking the play for every task result.
+      - Events are sent in batches, see I(flush_size) and I(flush_interval), and the remaining events are
+        sent when the playbook finishes.
+    env:
+      - name: SUMOLOGIC_THREADED
+    ini:
+      - section: callback_sumologic
+        key: threaded
+    type: bool
+    default: false
+    version_added: 4.4.0
+  queue_size:
+    description:
+      - Maximum number of events waiting to be sent when I(threaded=true).
+      - Further events are dropped and counted until the queue has room again.
+    env:
+      - name: SUMOLOGIC_QUEUE_SIZE
+    ini:
+      - section: callback_sumologic
+        key: queue_size
+    type: int
+    default: 10000
+    version_added: 4.4.0
+  flush_size:
+    description:
+      - Maximum number of events sent in one request when I(threaded=true).
+    env:
+      - name: SUMOLOGIC_FLUSH_SIZE
+    ini:
+      - section: callback_sumologic
+        key: flush_size
+    type: int
+    default: 100
+    version_added: 4.4.0
+  flush_interval:
+    description:
+      - Maximum number of seconds an event waits before being sent when I(threaded=true).
+    env:
+      - name: SUMOLOGIC_FLUSH_INTERVAL
+    ini:
+      - section: callback_sumologic
+        key: flush_interval
+    type: float
+    default: 5
+    version_added: 4.4.0
+  retries:
+    description:
+      - Number of times a failed request is retried when I(threaded=true).
+      - The delay between attempts starts at one second and doubles after every attempt.
+    env:
+      - name: SUMOLOGIC_RETRIES
+    ini:
+      - section: callback_sumologic
+        key: retries
+    type: int
+    default: 3
+    version_added: 4.4.0
+  spool_path:
+    description:
+      - File in which events are stored when they cannot be sent, instead of dropping them.
+      - Spooled events are sent again in the background at the start of the next playbook run and as soon as
+        the collector accepts requests again. While the collector is failing, new events go straight to the
+        spool so the play is only delayed by a local write.
+      - Setting this implies I(threaded=true). The file must not be shared between concurrent runs.
+    env:
+      - name: SUMOLOGIC_SPOOL_PATH
+    ini:
+      - section: callback_sumologic
+        key: spool_path
+    type: path
+    version_added: 4.4.0
+  spool_max_size:
+    description:
+      - Maximum size of the spool file in bytes. Events that do not fit anymore are dropped.
+    env:
+      - name: SUMOLOGIC_SPOOL_MAX_SIZE
+    ini:
+      - section: callback_sumologic
+        key: spool_max_size
+    type: int
+    default: 10485760
+    version_added: 4.4.0
 '''
 
 EXAMPLES = '''
@@ -57,13 +141,17 @@ import uuid
 import socket
 import getpass
 
+from collections import OrderedDict
 from datetime import datetime
 from os.path import basename
 
+from ansible.module_utils.common.text.converters import to_native
 from ansible.module_utils.urls import open_url
 from ansible.parsing.ajson import AnsibleJSONEncoder
 from ansible.plugins.callback import CallbackBase
 
+from ansible_collections.community.general.plugins.plugin_utils.event_sender import PartialSendError, sender_from_options
+
 
 class SumologicHTTPCollectorSource(object):
     def __init__(self):
@@ -76,6 +164,9 @@ class SumologicHTTPCollectorSource(object):
         self.user = getpass.getuser()
 
     def send_event(self, url, state, result, runtime):
+        self.post_events(url, [self.build_event(state, result, runtime)])
+
+    def build_event(self, state, result, runtime):
         if result._task_fields['args'].get('_ansible_check_mode') is True:
             self.ansible_check_mode = True
 
@@ -109,15 +200,33 @@ class SumologicHTTPCollectorSource(object):
         data['ansible_task'] = result._task_fields
         data['ansible_result'] = result._result
 
-        open_url(
-            url,
-            data=json.dumps(data, cls=AnsibleJSONEncoder, sort_keys=True),
-            headers={
-                'Content-type': 'application/json',
-                'X-Sumo-Host': data['ansible_host']
-            },
-            method='POST'
-        )
+        return data['ansible_host'], json.dumps(data, cls=AnsibleJSONEncoder, sort_keys=True)
+
+    def post_events(self, url, events):
+        # events are (host, payload) pairs; the collector takes newline separated
+        # messages, one request per host keeps the X-Sumo-Host header correct
+        by_host = OrderedDict()
+        for host, payload in events:
+            by_host.setdefault(host, []).append(payload)
+
+        posted = set()
+        for host, payloads in by_host.items():
+            try:
+                open_url(
+                    url,
+                    data='\n'.join(payloads),
+                    headers={
+                        'Content-type': 'application/json',
+                        'X-Sumo-Host': host
+                    },
+                    method='POST'
+                )
+            except Exception as e:
+                if not posted:
+                    raise
+                # only retry the hosts that have not been posted yet
+                raise PartialSendError(to_native(e), [event for event in events if event[0] not in posted])
+            posted.add(host)
 
 
 class CallbackModule(CallbackBase):
@@ -130,6 +239,7 @@ class CallbackModule(CallbackBase):
         super(CallbackModule, self).__init__(display=display)
         self.start_datetimes = {}  # Collect task start times
         self.url = None
+        self.sender = None
         self.sumologic = SumologicHTTPCollectorSource()
 
     def _runtime(self, result):
@@ -151,6 +261,22 @@ class CallbackModule(CallbackBase):
                                   '`SUMOLOGIC_URL` environment variable or '
                                   'in the ansible.cfg file.')
 
+        self.sender = sender_from_options(self, self._post_events, self._display)
+
+    def _post_events(self, events):
+        self.sumologic.post_events(self.url, events)
+
+    def _send_event(self, state, result):
+        if self.sender is None:
+            self.sumologic.send_event(
+                self.url,
+                state,
+                result,
+                self._runtime(result)
+            )
+        else:
+            self.sender.put(self.sumologic.build_event(state, result, self._runtime(result)))
+
     def v2_playbook_on_start(self, playbook):
         self.sumologic.ansible_playbook = basename(playbook._file_name)
 
@@ -161,41 +287,21 @@ class CallbackModule(CallbackBase):
         self.start_datetimes[task._uuid] = datetime.utcnow()
 
     def v2_runner_on_ok(self, result, **kwargs):
-        self.sumologic.send_event(
-            self.url,
-            'OK',
-            result,
-            self._runtime(result)
-        )
+        self._send_event('OK', result)
 
     def v2_runner_on_skipped(self, result, **kwargs):
-        self.sumologic.send_event(
-            self.url,
-            'SKIPPED',
-            result,
-            self._runtime(result)
-        )
+        self._send_event('SKIPPED', result)
 
     def v2_runner_on_failed(self, result, **kwargs):
-        self.sumologic.send_event(
-            self.url,
-            'FAILED',
-            result,
-            self._runtime(result)
-        )
+        self._send_event('FAILED', result)
 
     def runner_on_async_failed(self, result, **kwargs):
-        self.sumologic.send_event(
-            self.url,
-            'FAILED',
-            result,
-            self._runtime(result)
-        )
+        self._send_event('FAILED', result)
 
     def v2_runner_on_unreachable(self, result, **kwargs):
-        self.sumologic.send_event(
-            self.url,
-            'UNREACHABLE',
-            result,
-            self._runtime(result)
-        )
+        self._send_event('UNREACHABLE', result)
+
+    def v2_playbook_on_stats(self, stats):
+        if self.sender is not None:
+            self.sender.close()
+            self.sender.report(self._display, 'Sumologic HTTP collector')
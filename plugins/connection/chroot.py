@@ -44,11 +44,32 @@ DOCUMENTATION = '''
         vars:
           - name: ansible_chroot_exe
         default: chroot
+      direct_transfer:
+        description:
+            - Copy files directly between the controller and the chroot directory instead of running C(dd) inside the chroot.
+            - Paths are resolved inside the chroot one directory at a time without following symlinks, so a
+              transfer cannot end up outside of the chroot. Paths that contain symlinks, and files that are not
+              regular files, are transferred with C(dd) instead.
+            - Files are cloned when the filesystem supports it, and copied in the kernel with C(copy_file_range) or C(sendfile) otherwise.
+        type: bool
+        default: false
+        ini:
+          - section: chroot_connection
+            key: direct_transfer
+        env:
+          - name: ANSIBLE_CHROOT_DIRECT_TRANSFER
+        vars:
+          - name: ansible_chroot_direct_transfer
+        version_added: 4.4.0
 '''
 
+import errno
+import fcntl
 import os
 import os.path
+import stat
 import subprocess
+import sys
 import traceback
 
 from ansible.errors import AnsibleError
@@ -61,6 +82,81 @@ from ansible.utils.display import Display
 
 display = Display()
 
+# ioctl to share the extents of a file with another file on btrfs, xfs and others
+FICLONE = 0x40049409
+
+# size of the ranges copied by a single copy_file_range or sendfile call
+COPY_SIZE = 1 << 24
+
+# errors that mean a way of copying is not supported for these files
+UNSUPPORTED_COPY_ERRORS = (errno.EINVAL, errno.ENOSYS, errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF)
+
+CAN_RESOLVE = os.open in getattr(os, 'supports_dir_fd', ())
+
+
+def _copy_fd(in_fd, out_fd):
+    """ copy the rest of in_fd to out_fd, cloning the file or copying in the kernel if possible """
+    if sys.platform.startswith('linux') and os.lseek(in_fd, 0, os.SEEK_CUR) == 0:
+        try:
+            fcntl.ioctl(out_fd, FICLONE, in_fd)
+            return
+        except (IOError, OSError):
+            pass
+
+    copy_functions = []
+    if hasattr(os, 'copy_file_range'):
+        copy_functions.append(lambda count: os.copy_file_range(in_fd, out_fd, count))
+    if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        copy_functions.append(lambda count: os.sendfile(out_fd, in_fd, None, count))
+    for copy in copy_functions:
+        copied = 0
+        try:
+            while True:
+                count = copy(COPY_SIZE)
+                if not count:
+                    return
+                copied += count
+        except OSError as e:
+            # only try the next way if nothing has been copied yet
+            if copied or e.errno not in UNSUPPORTED_COPY_ERRORS:
+                raise
+
+    while True:
+        chunk = os.read(in_fd, BUFSIZE)
+        if not chunk:
+            return
+        while chunk:
+            chunk = chunk[os.write(out_fd, chunk):]
+
+
+def _open_beneath(root, path, flags, mode=0o666):
+    """ open an absolute path inside root without following symlinks
+
+    Every directory is opened relative to its parent, so neither symlinks
+    nor renames can make the path point outside of root. Returns the file
+    descriptor of a regular file or raises OSError.
+    """
+    names = [name for name in path.split(os.path.sep) if name]
+    if not names:
+        raise OSError(errno.EISDIR, os.strerror(errno.EISDIR), path)
+
+    dir_flags = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+    dir_fd = os.open(to_bytes(root, errors='surrogate_or_strict'), dir_flags)
+    try:
+        for name in names[:-1]:
+            fd = os.open(to_bytes(name, errors='surrogate_or_strict'), dir_flags | os.O_NOFOLLOW, dir_fd=dir_fd)
+            os.close(dir_fd)
+            dir_fd = fd
+        # O_NONBLOCK keeps fifos from blocking, it has no effect on regular files
+        fd = os.open(to_bytes(names[-1], errors='surrogate_or_strict'), flags | os.O_NOFOLLOW | os.O_NONBLOCK, mode, dir_fd=dir_fd)
+    finally:
+        os.close(dir_fd)
+
+    if not stat.S_ISREG(os.fstat(fd).st_mode):
+        os.close(fd)
+        raise OSError(errno.EINVAL, 'not a regular file', path)
+    return fd
+
 
 class Connection(ConnectionBase):
     """ Local chroot based connections """
@@ -152,11 +248,40 @@ class Connection(ConnectionBase):
             remote_path = os.path.join(os.path.sep, remote_path)
         return os.path.normpath(remote_path)
 
+    def _open_direct(self, path, flags):
+        """ open a path of the chroot for a direct transfer, None if dd has to be used """
+        if not (CAN_RESOLVE and self.get_option('direct_transfer')):
+            return None
+        try:
+            return _open_beneath(self.chroot, self._prefix_login_path(path), flags)
+        except OSError as e:
+            display.vvv("cannot access %s directly (%s), using dd" % (path, to_native(e.strerror)), host=self.chroot)
+            return None
+
+    def _direct_transfer(self, in_fd, out_fd, in_path, out_path):
+        try:
+            _copy_fd(in_fd, out_fd)
+        except OSError as e:
+            raise AnsibleError("failed to transfer file %s to %s: %s" % (in_path, out_path, to_native(e)))
+        finally:
+            os.close(in_fd)
+            os.close(out_fd)
+
     def put_file(self, in_path, out_path):
         """ transfer a file from local to chroot """
         super(Connection, self).put_file(in_path, out_path)
         display.vvv("PUT %s TO %s" % (in_path, out_path), host=self.chroot)
 
+        if CAN_RESOLVE and self.get_option('direct_transfer'):
+            try:
+                in_fd = os.open(to_bytes(in_path, errors='surrogate_or_strict'), os.O_RDONLY)
+            except OSError:
+                raise AnsibleError("file or module does not exist at: %s" % in_path)
+            out_fd = self._open_direct(out_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+            if out_fd is not None:
+                return self._direct_transfer(in_fd, out_fd, in_path, out_path)
+            os.close(in_fd)
+
         out_path = shlex_quote(self._prefix_login_path(out_path))
         try:
             with open(to_bytes(in_path, errors='surrogate_or_strict'), 'rb') as in_file:
@@ -183,6 +308,15 @@ class Connection(ConnectionBase):
         super(Connection, self).fetch_file(in_path, out_path)
         display.vvv("FETCH %s TO %s" % (in_path, out_path), host=self.chroot)
 
+        in_fd = self._open_direct(in_path, os.O_RDONLY)
+        if in_fd is not None:
+            try:
+                out_fd = os.open(to_bytes(out_path, errors='surrogate_or_strict'), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+            except OSError as e:
+                os.close(in_fd)
+                raise AnsibleError("failed to transfer file %s to %s: %s" % (in_path, out_path, to_native(e)))
+            return self._direct_transfer(in_fd, out_fd, in_path, out_path)
+
         in_path = shlex_quote(self._prefix_login_path(in_path))
         try:
             p = self._buffered_exec_command('dd if=%s bs=%s' % (in_path, BUFSIZE))
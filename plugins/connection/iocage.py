@@ -28,6 +28,18 @@ DOCUMENTATION = '''
         vars:
             - name: ansible_user
             - name: ansible_iocage_user
+      multiplex:
+        description:
+            - Run the commands and file transfers of a task through one helper process inside the jail instead of
+              starting C(jexec) for each of them. The helper is started again for every task.
+            - The helper needs a python interpreter inside the jail. If none is found, C(jexec) is used for every action.
+        type: bool
+        default: false
+        env:
+          - name: ANSIBLE_IOCAGE_MULTIPLEX
+        vars:
+          - name: ansible_iocage_multiplex
+        version_added: 4.4.0
 '''
 
 import subprocess
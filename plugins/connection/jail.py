@@ -29,6 +29,18 @@ DOCUMENTATION = '''
         vars:
             - name: ansible_user
             - name: ansible_jail_user
+      multiplex:
+        description:
+            - Run the commands and file transfers of a task through one helper process inside the jail instead of
+              starting C(jexec) for each of them. The helper is started again for every task.
+            - The helper needs a python interpreter inside the jail. If none is found, C(jexec) is used for every action.
+        type: bool
+        default: false
+        env:
+          - name: ANSIBLE_JAIL_MULTIPLEX
+        vars:
+          - name: ansible_jail_multiplex
+        version_added: 4.4.0
 '''
 
 import os
@@ -42,6 +54,7 @@ from ansible.module_utils.common.process import get_bin_path
 from ansible.module_utils.common.text.converters import to_bytes, to_native, to_text
 from ansible.plugins.connection import ConnectionBase, BUFSIZE
 from ansible.utils.display import Display
+from ansible_collections.community.general.plugins.plugin_utils.exec_channel import ExecChannel, ExecChannelError, helper_command
 
 display = Display()
 
@@ -69,6 +82,7 @@ class Connection(ConnectionBase):
 
         self.jls_cmd = self._search_executable('jls')
         self.jexec_cmd = self._search_executable('jexec')
+        self._channel = None
 
         if self.jail not in self.list_jails():
             raise AnsibleError("incorrect jail name %s" % self.jail)
@@ -90,12 +104,36 @@ class Connection(ConnectionBase):
         return to_text(stdout, errors='surrogate_or_strict').split()
 
     def _connect(self):
-        """ connect to the jail; nothing to do here """
+        """ connect to the jail, starting the helper process in multiplex mode """
         super(Connection, self)._connect()
         if not self._connected:
             display.vvv(u"ESTABLISH JAIL CONNECTION FOR USER: {0}".format(self._play_context.remote_user), host=self.jail)
+            if self.get_option('multiplex'):
+                self._channel = self._open_channel()
             self._connected = True
 
+    def _open_channel(self):
+        local_cmd = self._jexec_command() + ['/bin/sh', '-c', helper_command()]
+        display.vvv("START HELPER %s" % (local_cmd[:-1],), host=self.jail)
+        try:
+            return ExecChannel(local_cmd)
+        except ExecChannelError as e:
+            display.vvv("cannot use multiplex mode (%s), running jexec for every action" % to_native(e), host=self.jail)
+            return None
+
+    def _jexec_command(self):
+        local_cmd = [self.jexec_cmd]
+        if self._play_context.remote_user is not None:
+            local_cmd += ['-U', self._play_context.remote_user]
+        return local_cmd + [self.jail]
+
+    def _shell_command(self, cmd):
+        set_env = ''
+        if self._play_context.remote_user is not None:
+            # update HOME since -U does not update the jail environment
+            set_env = 'HOME=~' + self._play_context.remote_user + ' '
+        return [self._play_context.executable, '-c', set_env + cmd]
+
     def _buffered_exec_command(self, cmd, stdin=subprocess.PIPE):
         """ run a command on the jail.  This is only needed for implementing
         put_file() get_file() so that we don't have to read the whole file
@@ -105,15 +143,7 @@ class Connection(ConnectionBase):
         return the process's exit code immediately.
         """
 
-        local_cmd = [self.jexec_cmd]
-        set_env = ''
-
-        if self._play_context.remote_user is not None:
-            local_cmd += ['-U', self._play_context.remote_user]
-            # update HOME since -U does not update the jail environment
-            set_env = 'HOME=~' + self._play_context.remote_user + ' '
-
-        local_cmd += [self.jail, self._play_context.executable, '-c', set_env + cmd]
+        local_cmd = self._jexec_command() + self._shell_command(cmd)
 
         display.vvv("EXEC %s" % (local_cmd,), host=self.jail)
         local_cmd = [to_bytes(i, errors='surrogate_or_strict') for i in local_cmd]
@@ -126,6 +156,10 @@ class Connection(ConnectionBase):
         """ run a command on the jail """
         super(Connection, self).exec_command(cmd, in_data=in_data, sudoable=sudoable)
 
+        if self._channel is not None:
+            display.vvv("EXEC %s" % (self._shell_command(cmd),), host=self.jail)
+            return self._channel.exec_command(self._shell_command(cmd), in_data)
+
         p = self._buffered_exec_command(cmd)
 
         stdout, stderr = p.communicate(in_data)
@@ -151,6 +185,16 @@ class Connection(ConnectionBase):
         super(Connection, self).put_file(in_path, out_path)
         display.vvv("PUT %s TO %s" % (in_path, out_path), host=self.jail)
 
+        if self._channel is not None:
+            try:
+                with open(to_bytes(in_path, errors='surrogate_or_strict'), 'rb') as in_file:
+                    error = self._channel.put_file(in_file, self._prefix_login_path(out_path))
+            except IOError:
+                raise AnsibleError("file or module does not exist at: %s" % in_path)
+            if error:
+                raise AnsibleError("failed to transfer file %s to %s:\n%s" % (in_path, out_path, to_native(error)))
+            return
+
         out_path = shlex_quote(self._prefix_login_path(out_path))
         try:
             with open(to_bytes(in_path, errors='surrogate_or_strict'), 'rb') as in_file:
@@ -177,6 +221,13 @@ class Connection(ConnectionBase):
         super(Connection, self).fetch_file(in_path, out_path)
         display.vvv("FETCH %s TO %s" % (in_path, out_path), host=self.jail)
 
+        if self._channel is not None:
+            with open(to_bytes(out_path, errors='surrogate_or_strict'), 'wb+') as out_file:
+                error = self._channel.fetch_file(self._prefix_login_path(in_path), out_file)
+            if error:
+                raise AnsibleError("failed to transfer file %s to %s:\n%s" % (in_path, out_path, to_native(error)))
+            return
+
         in_path = shlex_quote(self._prefix_login_path(in_path))
         try:
             p = self._buffered_exec_command('dd if=%s bs=%s' % (in_path, BUFSIZE))
@@ -197,6 +248,9 @@ class Connection(ConnectionBase):
                 raise AnsibleError("failed to transfer file %s to %s:\n%s\n%s" % (in_path, out_path, to_native(stdout), to_native(stderr)))
 
     def close(self):
-        """ terminate the connection; nothing to do here """
+        """ terminate the connection and the helper process """
         super(Connection, self).close()
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
         self._connected = False
@@ -11,7 +11,8 @@ DOCUMENTATION = '''
     name: lxd
     short_description: Run tasks in lxc containers via lxc CLI
     description:
-        - Run commands or put/fetch files to an existing lxc container using lxc CLI
+        - Run commands or put/fetch files to an existing lxc container using lxc CLI.
+        - With I(use_api=true) the LXD REST API is used over the unix socket instead.
     options:
       remote_addr:
         description:
@@ -40,16 +41,180 @@ DOCUMENTATION = '''
         vars:
             - name: ansible_lxd_project
         version_added: 2.0.0
+      use_api:
+        description:
+            - Talk to the LXD daemon through its unix socket instead of running the C(lxc) CLI for every
+              command and file transfer.
+            - Commands are run through the exec websocket API and files are streamed through the files API.
+              Requests share one socket connection for the lifetime of the connection.
+            - Only the C(local) remote can be used this way. For other remotes, or when the socket cannot be
+              reached, the C(lxc) CLI is used.
+        type: bool
+        default: false
+        env:
+            - name: ANSIBLE_LXD_USE_API
+        vars:
+            - name: ansible_lxd_use_api
+        version_added: 4.4.0
+      url:
+        description:
+            - The unix domain socket of the LXD daemon used when I(use_api=true), starting with C(unix:).
+            - When not set, C(unix:/var/snap/lxd/common/lxd/unix.socket) and C(unix:/var/lib/lxd/unix.socket) are tried.
+        type: str
+        env:
+            - name: ANSIBLE_LXD_URL
+        vars:
+            - name: ansible_lxd_url
+        version_added: 4.4.0
 '''
 
+import base64
+import json
 import os
+import socket
+import stat
+import struct
+import threading
 from subprocess import Popen, PIPE
 
 from ansible.errors import AnsibleError, AnsibleConnectionFailure, AnsibleFileNotFound
 from ansible.module_utils.common.process import get_bin_path
-from ansible.module_utils.common.text.converters import to_bytes, to_text
+from ansible.module_utils.common.text.converters import to_bytes, to_native, to_text
+from ansible.module_utils.six import PY3
+from ansible.module_utils.six.moves.urllib.parse import quote, urlencode
 from ansible.plugins.connection import ConnectionBase
 
+from ansible_collections.community.general.plugins.module_utils.lxd import LXDClient, LXDClientException
+
+SOCKET_URLS = ('unix:/var/snap/lxd/common/lxd/unix.socket', 'unix:/var/lib/lxd/unix.socket')
+
+BUFSIZE = 65536
+
+
+def _mask(key, data):
+    """ apply a websocket masking key to data """
+    length = len(data)
+    if not length:
+        return b''
+    key = (key * (length // 4 + 1))[:length]
+    if PY3:
+        # xor the whole payload at once instead of byte by byte
+        return (int.from_bytes(data, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+    return b''.join(chr(ord(a) ^ ord(b)) for a, b in zip(data, key))
+
+
+class WebSocket(object):
+    """ minimal client side websocket, enough for the LXD exec API """
+
+    OP_CONTINUATION = 0x0
+    OP_TEXT = 0x1
+    OP_BINARY = 0x2
+    OP_CLOSE = 0x8
+    OP_PING = 0x9
+    OP_PONG = 0xa
+
+    def __init__(self, sock, buffered=b''):
+        self._sock = sock
+        self._buffer = bytearray(buffered)
+        self._send_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path, url):
+        """ connect to the unix socket at path and upgrade a request for url to a websocket """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            key = base64.b64encode(os.urandom(16))
+            sock.sendall(b'GET ' + to_bytes(url) + b' HTTP/1.1\r\n'
+                         b'Host: localhost\r\n'
+                         b'Upgrade: websocket\r\n'
+                         b'Connection: Upgrade\r\n'
+                         b'Sec-WebSocket-Key: ' + key + b'\r\n'
+                         b'Sec-WebSocket-Version: 13\r\n\r\n')
+            response = b''
+            while b'\r\n\r\n' not in response:
+                data = sock.recv(BUFSIZE)
+                if not data:
+                    break
+                response += data
+        except socket.error as e:
+            sock.close()
+            raise LXDClientException('cannot connect to the LXD server', err=e)
+        header, dummy, rest = response.partition(b'\r\n\r\n')
+        status = header.split(b'\r\n', 1)[0].split()
+        if len(status) < 2 or status[1] != b'101':
+            sock.close()
+            raise LXDClientException('websocket handshake failed: %s' % to_native(header.split(b'\r\n', 1)[0]))
+        return cls(sock, rest)
+
+    def _read(self, size):
+        while len(self._buffer) < size:
+            data = self._sock.recv(BUFSIZE)
+            if not data:
+                raise EOFError()
+            self._buffer.extend(data)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def send(self, data, opcode=OP_BINARY):
+        length = len(data)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+        key = os.urandom(4)
+        with self._send_lock:
+            self._sock.sendall(header + key + _mask(key, data))
+
+    def recv(self):
+        """ return the next binary message, None once the stream has ended
+
+        LXD ends a stream with an empty text message or by closing the websocket.
+        """
+        message = []
+        message_opcode = None
+        try:
+            while True:
+                first, second = struct.unpack('!BB', self._read(2))
+                opcode = first & 0x0f
+                length = second & 0x7f
+                if length == 126:
+                    length = struct.unpack('!H', self._read(2))[0]
+                elif length == 127:
+                    length = struct.unpack('!Q', self._read(8))[0]
+                key = self._read(4) if second & 0x80 else None
+                payload = self._read(length)
+                if key is not None:
+                    payload = _mask(key, payload)
+
+                if opcode == self.OP_CLOSE:
+                    return None
+                elif opcode == self.OP_PING:
+                    self.send(payload, self.OP_PONG)
+                    continue
+                elif opcode == self.OP_PONG:
+                    continue
+
+                if opcode != self.OP_CONTINUATION:
+                    message_opcode = opcode
+                message.append(payload)
+                if first & 0x80:
+                    if message_opcode == self.OP_TEXT:
+                        return None
+                    return b''.join(message)
+        except (EOFError, socket.error):
+            return None
+
+    def close(self):
+        try:
+            self.send(struct.pack('!H', 1000), self.OP_CLOSE)
+        except socket.error:
+            pass
+        self._sock.close()
+
 
 class Connection(ConnectionBase):
     """ lxd based connections """
@@ -62,10 +227,11 @@ class Connection(ConnectionBase):
         super(Connection, self).__init__(play_context, new_stdin, *args, **kwargs)
 
         self._host = self._play_context.remote_addr
+        self._client = None
         try:
             self._lxc_cmd = get_bin_path("lxc")
         except ValueError:
-            raise AnsibleError("lxc command not found in PATH")
+            self._lxc_cmd = None
 
         if self._play_context.remote_user is not None and self._play_context.remote_user != 'root':
             self._display.warning('lxd does not support remote_user, using container default: root')
@@ -76,14 +242,163 @@ class Connection(ConnectionBase):
 
         if not self._connected:
             self._display.vvv(u"ESTABLISH LXD CONNECTION FOR USER: root", host=self._host)
+            if self.get_option("use_api"):
+                self._client = self._api_connect()
+            if self._client is None and self._lxc_cmd is None:
+                raise AnsibleError("lxc command not found in PATH")
             self._connected = True
 
+    def _api_connect(self):
+        """ return a client for the LXD socket, or None if the CLI has to be used """
+        if self.get_option("remote") != "local":
+            self._display.vvv(u"LXD API IS ONLY USED FOR THE LOCAL REMOTE, USING THE CLI", host=self._host)
+            return None
+
+        errors = []
+        for url in [self.get_option("url")] if self.get_option("url") else SOCKET_URLS:
+            if not url.startswith("unix:"):
+                errors.append("%s: only unix sockets are supported" % url)
+                continue
+            try:
+                client = LXDClient(url)
+                client.do("GET", "/1.0")
+            except LXDClientException as e:
+                errors.append("%s: %s" % (url, to_native(e.kwargs.get("err", e.msg))))
+                continue
+            self._display.vvv(u"USING LXD API AT {0}".format(url), host=self._host)
+            return client
+
+        self._display.vvv(u"LXD API NOT AVAILABLE ({0}), USING THE CLI".format(", ".join(errors)), host=self._host)
+        return None
+
+    def _api_url(self, endpoint, **params):
+        if self.get_option("project"):
+            params["project"] = self.get_option("project")
+        url = "/1.0/instances/%s/%s" % (quote(self.get_option("remote_addr"), safe=""), endpoint)
+        if params:
+            url += "?" + urlencode(params)
+        return url
+
+    def _api_error(self, e):
+        """ turn an error of the LXD API into the errors raised by the CLI code """
+        msg = to_native(e.msg)
+        if "not running" in msg:
+            return AnsibleConnectionFailure("container not running: %s" % self._host)
+        if "not found" in msg.lower():
+            return AnsibleConnectionFailure("container not found: %s" % self._host)
+        return AnsibleConnectionFailure("LXD API error for %s: %s" % (self._host, msg))
+
+    @staticmethod
+    def _api_read(websocket, chunks):
+        while True:
+            data = websocket.recv()
+            if data is None:
+                return
+            chunks.append(data)
+
+    def _api_exec_command(self, cmd, in_data):
+        body = {
+            "command": [self.get_option("executable"), "-c", to_text(cmd, errors="surrogate_or_strict")],
+            "interactive": False,
+            "wait-for-websocket": True,
+        }
+        try:
+            response = self._client.do("POST", self._api_url("exec"), body, wait_for_operation=False)
+        except LXDClientException as e:
+            raise self._api_error(e)
+
+        # the command starts once stdin, stdout, stderr and the control channel are connected
+        operation = response["operation"]
+        websockets = {}
+        try:
+            for fd, secret in response["metadata"]["metadata"]["fds"].items():
+                url = "%s/websocket?%s" % (operation, urlencode({"secret": secret}))
+                websockets[fd] = WebSocket.open(self._client.connection.path, url)
+
+            output = {"1": [], "2": []}
+            readers = []
+            for fd, chunks in output.items():
+                reader = threading.Thread(target=self._api_read, args=(websockets[fd], chunks))
+                reader.daemon = True
+                reader.start()
+                readers.append(reader)
+
+            stdin = websockets["0"]
+            if in_data:
+                for offset in range(0, len(in_data), BUFSIZE):
+                    stdin.send(in_data[offset:offset + BUFSIZE])
+            stdin.send(b"", WebSocket.OP_TEXT)
+
+            for reader in readers:
+                reader.join()
+            result = self._client.do("GET", "%s/wait" % operation)["metadata"]
+        except LXDClientException as e:
+            raise self._api_error(e)
+        except socket.error as e:
+            raise AnsibleConnectionFailure("LXD API connection for %s failed: %s" % (self._host, to_native(e)))
+        finally:
+            for websocket in websockets.values():
+                websocket.close()
+
+        if result["status"] != "Success":
+            raise AnsibleConnectionFailure("failed to execute command on %s: %s" % (self._host, to_native(result.get("err"))))
+
+        return result["metadata"]["return"], to_text(b"".join(output["1"])), to_text(b"".join(output["2"]))
+
+    def _api_file_error(self, response, path):
+        try:
+            msg = json.loads(to_text(response.read())).get("error")
+        except ValueError:
+            msg = None
+        return AnsibleError("failed to transfer file %s on %s: %s" % (path, self._host, to_native(msg or response.reason)))
+
+    def _api_put_file(self, in_path, out_path):
+        with open(to_bytes(in_path, errors="surrogate_or_strict"), "rb") as in_file:
+            file_stat = os.fstat(in_file.fileno())
+            headers = {
+                "Content-Type": "application/octet-stream",
+                "Content-Length": str(file_stat.st_size),
+                "X-LXD-type": "file",
+                "X-LXD-mode": "%04o" % stat.S_IMODE(file_stat.st_mode),
+                "X-LXD-write": "overwrite",
+            }
+            try:
+                response = self._client.request("POST", self._api_url("files", path=out_path), body=in_file, headers=headers)
+            except LXDClientException as e:
+                raise self._api_error(e)
+
+        if response.status != 200:
+            raise self._api_file_error(response, out_path)
+        response.read()
+
+    def _api_fetch_file(self, in_path, out_path):
+        try:
+            response = self._client.request("GET", self._api_url("files", path=in_path))
+        except LXDClientException as e:
+            raise self._api_error(e)
+
+        if response.status != 200:
+            raise self._api_file_error(response, in_path)
+        if response.getheader("X-LXD-type", "file") != "file":
+            response.read()
+            raise AnsibleError("failed to transfer file %s on %s: not a regular file" % (in_path, self._host))
+
+        with open(to_bytes(out_path, errors="surrogate_or_strict"), "wb") as out_file:
+            while True:
+                data = response.read(BUFSIZE)
+                if not data:
+                    break
+                out_file.write(data)
+
     def exec_command(self, cmd, in_data=None, sudoable=True):
         """ execute a command on the lxd host """
         super(Connection, self).exec_command(cmd, in_data=in_data, sudoable=sudoable)
 
         self._display.vvv(u"EXEC {0}".format(cmd), host=self._host)
 
+        if self._client is not None:
+            return self._api_exec_command(cmd, to_bytes(in_data, errors='surrogate_or_strict', nonstring='passthru'))
+
         local_cmd = [self._lxc_cmd]
         if self.get_option("project"):
             local_cmd.extend(["--project", self.get_option("project")])
@@ -120,6 +435,9 @@ class Connection(ConnectionBase):
         if not os.path.isfile(to_bytes(in_path, errors='surrogate_or_strict')):
             raise AnsibleFileNotFound("input path is not a file: %s" % in_path)
 
+        if self._client is not None:
+            return self._api_put_file(in_path, out_path)
+
         local_cmd = [self._lxc_cmd]
         if self.get_option("project"):
             local_cmd.extend(["--project", self.get_option("project")])
@@ -140,6 +458,9 @@ class Connection(ConnectionBase):
 
         self._display.vvv(u"FETCH {0} TO {1}".format(in_path, out_path), host=self._host)
 
+        if self._client is not None:
+            return self._api_fetch_file(in_path, out_path)
+
         local_cmd = [self._lxc_cmd]
         if self.get_option("project"):
             local_cmd.extend(["--project", self.get_option("project")])
@@ -158,4 +479,7 @@ class Connection(ConnectionBase):
         """ close the connection (nothing to do here) """
         super(Connection, self).close()
 
+        if self._client is not None:
+            self._client.connection.close()
+            self._client = None
         self._connected = False
@@ -17,6 +17,7 @@ DOCUMENTATION = '''
 
     description:
         - Run commands or put/fetch files to an existing Qubes AppVM using qubes tools.
+        - Files are streamed and verified with their SHA-256 checksum when C(sha256sum) is available in the VM.
 
     author: Kushal Das (@kushaldas)
 
@@ -38,10 +39,13 @@ DOCUMENTATION = '''
 #            - name: hosts
 '''
 
+import hashlib
+import os
 import subprocess
+from functools import partial
 
-from ansible.module_utils.common.text.converters import to_bytes
-from ansible.plugins.connection import ConnectionBase, ensure_connect
+from ansible.module_utils.common.text.converters import to_bytes, to_native, to_text
+from ansible.plugins.connection import ConnectionBase, ensure_connect, BUFSIZE
 from ansible.errors import AnsibleConnectionFailure
 from ansible.utils.display import Display
 
@@ -76,6 +80,16 @@ class Connection(ConnectionBase):
         display.vvvv("CMD: ", cmd)
         if not cmd.endswith("\n"):
             cmd = cmd + "\n"
+
+        p = self._qubes_process(shell, subprocess.PIPE)
+
+        # Here we are writing the actual command to the remote bash
+        p.stdin.write(to_bytes(cmd, errors='surrogate_or_strict'))
+        stdout, stderr = p.communicate(input=in_data)
+        return p.returncode, stdout, stderr
+
+    def _qubes_process(self, shell, output):
+        """start qvm-run for a service, stdout and stderr are sent to output"""
         local_cmd = []
 
         # For dom0
@@ -93,13 +107,38 @@ class Connection(ConnectionBase):
         display.vvvv("Local cmd: ", local_cmd)
 
         display.vvv("RUN %s" % (local_cmd,), host=self._remote_vmname)
-        p = subprocess.Popen(local_cmd, shell=False, stdin=subprocess.PIPE,
-                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return subprocess.Popen(local_cmd, shell=False, stdin=subprocess.PIPE,
+                                stdout=output, stderr=output)
 
-        # Here we are writing the actual command to the remote bash
-        p.stdin.write(to_bytes(cmd, errors='surrogate_or_strict'))
-        stdout, stderr = p.communicate(input=in_data)
-        return p.returncode, stdout, stderr
+    def _put_stream(self, in_file, out_path, shell):
+        """stream in_file to out_path in fixed size chunks
+
+        :return: return code, sha256 of the data sent
+        """
+        in_file.seek(0)
+        digest = hashlib.sha256()
+        with open(os.devnull, "wb") as devnull:
+            p = self._qubes_process(shell, devnull)
+            try:
+                p.stdin.write(to_bytes('cat > "{0}"\n'.format(out_path), errors='surrogate_or_strict'))
+                for chunk in iter(partial(in_file.read, BUFSIZE), b""):
+                    p.stdin.write(chunk)
+                    digest.update(chunk)
+                p.stdin.close()
+            except (IOError, OSError):
+                # the service exited without reading everything, its return code tells why
+                pass
+            return p.wait(), digest.hexdigest()
+
+    def _verify_checksum(self, path, checksum, shell="qubes.VMShell"):
+        """compare the sha256 of path in the VM with checksum, if sha256sum is available there"""
+        retcode, stdout, stderr = self._qubes('sha256sum "{0}"'.format(path), shell=shell)
+        fields = to_text(stdout, errors='surrogate_or_strict').split()
+        if retcode != 0 or not fields:
+            display.vvv("Cannot verify checksum of {0}: {1}".format(path, to_native(stderr).strip()), host=self._remote_vmname)
+            return
+        if fields[0] != checksum:
+            raise AnsibleConnectionFailure('Checksum mismatch for {0}'.format(path))
 
     def _connect(self):
         """No persistent connection is being maintained."""
@@ -123,17 +162,18 @@ class Connection(ConnectionBase):
         super(Connection, self).put_file(in_path, out_path)
         display.vvv("PUT %s TO %s" % (in_path, out_path), host=self._remote_vmname)
 
+        shell = "qubes.VMRootShell"
         with open(in_path, "rb") as fobj:
-            source_data = fobj.read()
-
-        retcode, dummy, dummy = self._qubes('cat > "{0}"\n'.format(out_path), source_data, "qubes.VMRootShell")
-        # if qubes.VMRootShell service not supported, fallback to qubes.VMShell and
-        # hope it will have appropriate permissions
-        if retcode == 127:
-            retcode, dummy, dummy = self._qubes('cat > "{0}"\n'.format(out_path), source_data)
+            retcode, checksum = self._put_stream(fobj, out_path, shell)
+            # if qubes.VMRootShell service not supported, fallback to qubes.VMShell and
+            # hope it will have appropriate permissions
+            if retcode == 127:
+                shell = "qubes.VMShell"
+                retcode, checksum = self._put_stream(fobj, out_path, shell)
 
         if retcode != 0:
             raise AnsibleConnectionFailure('Failed to put_file to {0}'.format(out_path))
+        self._verify_checksum(out_path, checksum, shell)
 
     def fetch_file(self, in_path, out_path):
         """Obtain file specified via 'in_path' from the container and place it at 'out_path' """
@@ -142,11 +182,16 @@ class Connection(ConnectionBase):
 
         # We are running in dom0
         cmd_args_list = ["qvm-run", "--pass-io", self._remote_vmname, "cat {0}".format(in_path)]
+        digest = hashlib.sha256()
         with open(out_path, "wb") as fobj:
-            p = subprocess.Popen(cmd_args_list, shell=False, stdout=fobj)
+            p = subprocess.Popen(cmd_args_list, shell=False, stdout=subprocess.PIPE)
+            for chunk in iter(partial(p.stdout.read, BUFSIZE), b""):
+                fobj.write(chunk)
+                digest.update(chunk)
             p.communicate()
             if p.returncode != 0:
                 raise AnsibleConnectionFailure('Failed to fetch file to {0}'.format(out_path))
+        self._verify_checksum(in_path, digest.hexdigest())
 
     def close(self):
         """ Closing the connection """
@@ -15,12 +15,19 @@ DOCUMENTATION = '''
     short_description: Allow ansible to piggyback on salt minions
     description:
         - This allows you to use existing Saltstack infrastructure to connect to targets.
+        - Files are transferred base64 encoded in chunks of 1 MiB and verified with their SHA-256 checksum.
+          This runs C(base64) and C(dd) on the minion.
 '''
 
-import os
 import base64
+import hashlib
+import os
+import re
+from functools import partial
 
 from ansible import errors
+from ansible.module_utils.common.text.converters import to_native
+from ansible.module_utils.six.moves import shlex_quote
 from ansible.plugins.connection import ConnectionBase
 
 HAVE_SALTSTACK = False
@@ -30,6 +37,8 @@ try:
 except ImportError:
     pass
 
+CHUNK_SIZE = 1024 * 1024
+
 
 class Connection(ConnectionBase):
     """ Salt-based connections """
@@ -60,12 +69,26 @@ class Connection(ConnectionBase):
 
         self._display.vvv("EXEC %s" % cmd, host=self.host)
         # need to add 'true;' to work around https://github.com/saltstack/salt/issues/28077
-        res = self.client.cmd(self.host, 'cmd.exec_code_all', ['bash', 'true;' + cmd])
+        p = self._call('cmd.exec_code_all', ['bash', 'true;' + cmd])
+        return p['retcode'], p['stdout'], p['stderr']
+
+    def _call(self, function, args):
+        res = self.client.cmd(self.host, function, args)
         if self.host not in res:
             raise errors.AnsibleError("Minion %s didn't answer, check if salt-minion is running and the name is correct" % self.host)
+        return res[self.host]
 
-        p = res[self.host]
-        return p['retcode'], p['stdout'], p['stderr']
+    def _get_hash(self, path):
+        checksum = self._call('file.get_hash', [path, 'sha256'])
+        if not re.match(r'^[0-9a-f]{64}$', to_native(checksum)):
+            raise errors.AnsibleError("failed to get the checksum of %s: %s" % (path, to_native(checksum)))
+        return to_native(checksum)
+
+    def _run_script(self, script, path):
+        p = self._call('cmd.exec_code_all', ['bash', 'set -o pipefail; ' + script])
+        if p['retcode'] != 0:
+            raise errors.AnsibleError("failed to transfer file %s: %s" % (path, to_native(p['stderr'])))
+        return p['stdout']
 
     @staticmethod
     def _normalize_path(path, prefix):
@@ -81,11 +104,18 @@ class Connection(ConnectionBase):
 
         out_path = self._normalize_path(out_path, '/')
         self._display.vvv("PUT %s TO %s" % (in_path, out_path), host=self.host)
+
+        # create or truncate the file, then append it one base64 encoded chunk at a time
+        self._call('hashutil.base64_decodefile', ['', out_path])
+        digest = hashlib.sha256()
         with open(in_path, 'rb') as in_fh:
-            content = in_fh.read()
-        self.client.cmd(self.host, 'hashutil.base64_decodefile', [base64.b64encode(content), out_path])
+            for chunk in iter(partial(in_fh.read, CHUNK_SIZE), b''):
+                self._run_script("base64 -d >> %s <<'EOF'\n%s\nEOF\n" % (shlex_quote(out_path), to_native(base64.b64encode(chunk))), out_path)
+                digest.update(chunk)
+
+        if self._get_hash(out_path) != digest.hexdigest():
+            raise errors.AnsibleError("failed to transfer file %s to %s: checksum mismatch" % (in_path, out_path))
 
-    # TODO test it
     def fetch_file(self, in_path, out_path):
         """ fetch a file from remote to local """
 
@@ -93,8 +123,23 @@ class Connection(ConnectionBase):
 
         in_path = self._normalize_path(in_path, '/')
         self._display.vvv("FETCH %s TO %s" % (in_path, out_path), host=self.host)
-        content = self.client.cmd(self.host, 'cp.get_file_str', [in_path])[self.host]
-        open(out_path, 'wb').write(content)
+
+        checksum = self._get_hash(in_path)
+        digest = hashlib.sha256()
+        block = 0
+        with open(out_path, 'wb') as out_fh:
+            while True:
+                data = self._run_script("dd if=%s bs=%d skip=%d count=1 2>/dev/null | base64" % (shlex_quote(in_path), CHUNK_SIZE, block), in_path)
+                chunk = base64.b64decode(data)
+                out_fh.write(chunk)
+                digest.update(chunk)
+                # a short read is the end of the file
+                if len(chunk) < CHUNK_SIZE:
+                    break
+                block += 1
+
+        if digest.hexdigest() != checksum:
+            raise errors.AnsibleError("failed to transfer file %s to %s: checksum mismatch" % (in_path, out_path))
 
     def close(self):
         """ terminate the connection; nothing to do here """
@@ -24,6 +24,18 @@ DOCUMENTATION = '''
         vars:
             - name: ansible_host
             - name: ansible_zone_host
+      multiplex:
+        description:
+            - Run the commands and file transfers of a task through one helper process inside the zone instead of
+              starting C(zlogin) for each of them. The helper is started again for every task.
+            - The helper needs a python interpreter inside the zone. If none is found, C(zlogin) is used for every action.
+        type: bool
+        default: false
+        env:
+          - name: ANSIBLE_ZONE_MULTIPLEX
+        vars:
+          - name: ansible_zone_multiplex
+        version_added: 4.4.0
 '''
 
 import os
@@ -34,9 +46,10 @@ import traceback
 from ansible.errors import AnsibleError
 from ansible.module_utils.six.moves import shlex_quote
 from ansible.module_utils.common.process import get_bin_path
-from ansible.module_utils.common.text.converters import to_bytes
+from ansible.module_utils.common.text.converters import to_bytes, to_native
 from ansible.plugins.connection import ConnectionBase, BUFSIZE
 from ansible.utils.display import Display
+from ansible_collections.community.general.plugins.plugin_utils.exec_channel import ExecChannel, ExecChannelError, helper_command
 
 display = Display()
 
@@ -58,6 +71,7 @@ class Connection(ConnectionBase):
 
         self.zoneadm_cmd = to_bytes(self._search_executable('zoneadm'))
         self.zlogin_cmd = to_bytes(self._search_executable('zlogin'))
+        self._channel = None
 
         if self.zone not in self.list_zones():
             raise AnsibleError("incorrect zone name %s" % self.zone)
@@ -95,12 +109,22 @@ class Connection(ConnectionBase):
         return path + '/root'
 
     def _connect(self):
-        """ connect to the zone; nothing to do here """
+        """ connect to the zone, starting the helper process in multiplex mode """
         super(Connection, self)._connect()
         if not self._connected:
             display.vvv("THIS IS A LOCAL ZONE DIR", host=self.zone)
+            if self.get_option('multiplex'):
+                self._channel = self._open_channel()
             self._connected = True
 
+    def _open_channel(self):
+        display.vvv("START HELPER %s" % ([self.zlogin_cmd, self.zone],), host=self.zone)
+        try:
+            return ExecChannel([self.zlogin_cmd, self.zone, helper_command()])
+        except ExecChannelError as e:
+            display.vvv("cannot use multiplex mode (%s), running zlogin for every action" % to_native(e), host=self.zone)
+            return None
+
     def _buffered_exec_command(self, cmd, stdin=subprocess.PIPE):
         """ run a command on the zone.  This is only needed for implementing
         put_file() get_file() so that we don't have to read the whole file
@@ -125,6 +149,10 @@ class Connection(ConnectionBase):
         """ run a command on the zone """
         super(Connection, self).exec_command(cmd, in_data=in_data, sudoable=sudoable)
 
+        if self._channel is not None:
+            display.vvv("EXEC %s" % (cmd,), host=self.zone)
+            return self._channel.exec_command(['/bin/sh', '-c', cmd], in_data)
+
         p = self._buffered_exec_command(cmd)
 
         stdout, stderr = p.communicate(in_data)
@@ -149,6 +177,16 @@ class Connection(ConnectionBase):
         super(Connection, self).put_file(in_path, out_path)
         display.vvv("PUT %s TO %s" % (in_path, out_path), host=self.zone)
 
+        if self._channel is not None:
+            try:
+                with open(in_path, 'rb') as in_file:
+                    error = self._channel.put_file(in_file, self._prefix_login_path(out_path))
+            except IOError:
+                raise AnsibleError("file or module does not exist at: %s" % in_path)
+            if error:
+                raise AnsibleError("failed to transfer file %s to %s:\n%s" % (in_path, out_path, to_native(error)))
+            return
+
         out_path = shlex_quote(self._prefix_login_path(out_path))
         try:
             with open(in_path, 'rb') as in_file:
@@ -175,6 +213,13 @@ class Connection(ConnectionBase):
         super(Connection, self).fetch_file(in_path, out_path)
         display.vvv("FETCH %s TO %s" % (in_path, out_path), host=self.zone)
 
+        if self._channel is not None:
+            with open(out_path, 'wb+') as out_file:
+                error = self._channel.fetch_file(self._prefix_login_path(in_path), out_file)
+            if error:
+                raise AnsibleError("failed to transfer file %s to %s:\n%s" % (in_path, out_path, to_native(error)))
+            return
+
         in_path = shlex_quote(self._prefix_login_path(in_path))
         try:
             p = self._buffered_exec_command('dd if=%s bs=%s' % (in_path, BUFSIZE))
@@ -195,6 +240,9 @@ class Connection(ConnectionBase):
                 raise AnsibleError("failed to transfer file %s to %s:\n%s\n%s" % (in_path, out_path, stdout, stderr))
 
     def close(self):
-        """ terminate the connection; nothing to do here """
+        """ terminate the connection and the helper process """
         super(Connection, self).close()
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
         self._connected = False
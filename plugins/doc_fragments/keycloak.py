@@ -61,4 +61,15 @@ options:
             - Verify TLS certificates (do not disable this in production).
         type: bool
         default: yes
+
+    auth_token_cache:
+        description:
+            - Directory in which the access and refresh tokens obtained with I(auth_username) and I(auth_password) are cached.
+            - The tokens are cached per I(auth_keycloak_url), I(auth_realm), I(auth_client_id) and I(auth_username).
+              A cached access token is used until it is about to expire, then it is renewed with the refresh token.
+            - The cache files are only readable by the user running the module. Note that the password is not
+              checked again while a cached token is valid.
+            - When not set, a new token is requested for every module run.
+        type: path
+        version_added: 4.4.0
 '''
@@ -19,7 +19,11 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+from collections import OrderedDict
+
 from ansible.errors import AnsibleError, AnsibleFilterError
+from ansible.module_utils.common._collections_compat import Sequence
+from ansible.module_utils.six import string_types
 
 try:
     import jmespath
@@ -28,26 +32,69 @@ except ImportError:
     HAS_LIB = False
 
 
-def json_query(data, expr):
-    '''Query data using jmespath query language ( http://jmespath.org ). Example:
-    - ansible.builtin.debug: msg="{{ instance | json_query(tagged_instances[*].block_device_mapping.*.volume_id') }}"
-    '''
-    if not HAS_LIB:
-        raise AnsibleError('You need to install "jmespath" prior to running '
-                           'json_query filter')
+# Number of compiled expressions kept around, least recently used ones are dropped first
+COMPILED_CACHE_SIZE = 256
 
+_compiled = OrderedDict()
+
+
+def _register_ansible_types():
     # Hack to handle Ansible Unsafe text, AnsibleMapping and AnsibleSequence
     # See issue: https://github.com/ansible-collections/community.general/issues/320
-    jmespath.functions.REVERSE_TYPES_MAP['string'] = jmespath.functions.REVERSE_TYPES_MAP['string'] + ('AnsibleUnicode', 'AnsibleUnsafeText', )
-    jmespath.functions.REVERSE_TYPES_MAP['array'] = jmespath.functions.REVERSE_TYPES_MAP['array'] + ('AnsibleSequence', )
-    jmespath.functions.REVERSE_TYPES_MAP['object'] = jmespath.functions.REVERSE_TYPES_MAP['object'] + ('AnsibleMapping', )
+    ansible_types = {
+        'string': ('AnsibleUnicode', 'AnsibleUnsafeText', ),
+        'array': ('AnsibleSequence', ),
+        'object': ('AnsibleMapping', ),
+    }
+    for jmespath_type, type_names in ansible_types.items():
+        known = jmespath.functions.REVERSE_TYPES_MAP[jmespath_type]
+        jmespath.functions.REVERSE_TYPES_MAP[jmespath_type] = known + tuple(name for name in type_names if name not in known)
+
+
+if HAS_LIB:
+    _register_ansible_types()
+
+
+def _compile(expr):
+    try:
+        parsed = _compiled.pop(expr)
+    except KeyError:
+        parsed = jmespath.compile(expr)
+        if len(_compiled) >= COMPILED_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    _compiled[expr] = parsed
+    return parsed
+
+
+def _query(filter_name, documents, expr):
+    if not HAS_LIB:
+        raise AnsibleError('You need to install "jmespath" prior to running '
+                           '%s filter' % filter_name)
+
     try:
-        return jmespath.search(expr, data)
+        parsed = _compile(expr)
+        return [parsed.search(data) for data in documents]
     except jmespath.exceptions.JMESPathError as e:
-        raise AnsibleFilterError('JMESPathError in json_query filter plugin:\n%s' % e)
+        raise AnsibleFilterError('JMESPathError in %s filter plugin:\n%s' % (filter_name, e))
     except Exception as e:
         # For older jmespath, we can get ValueError and TypeError without much info.
-        raise AnsibleFilterError('Error in jmespath.search in json_query filter plugin:\n%s' % e)
+        raise AnsibleFilterError('Error in jmespath.search in %s filter plugin:\n%s' % (filter_name, e))
+
+
+def json_query(data, expr):
+    '''Query data using jmespath query language ( http://jmespath.org ). Example:
+    - ansible.builtin.debug: msg="{{ instance | json_query(tagged_instances[*].block_device_mapping.*.volume_id') }}"
+    '''
+    return _query('json_query', [data], expr)[0]
+
+
+def json_query_map(data, expr):
+    '''Apply the same jmespath query to every element of a list and return the list of results. Example:
+    - ansible.builtin.debug: msg="{{ instances | json_query_map('block_device_mapping.*.volume_id') }}"
+    '''
+    if isinstance(data, string_types) or not isinstance(data, Sequence):
+        raise AnsibleFilterError('json_query_map requires a list, got %s' % type(data).__name__)
+    return _query('json_query_map', data, expr)
 
 
 class FilterModule(object):
@@ -55,5 +102,6 @@ class FilterModule(object):
 
     def filters(self):
         return {
-            'json_query': json_query
+            'json_query': json_query,
+            'json_query_map': json_query_map,
         }
@@ -377,6 +377,40 @@ class InventoryModule(BaseInventoryPlugin):
                 instance_config['instances'] = self._get_config(branch, name)
                 self.data = dict_merge(instance_config, self.data)
 
+    def get_instance_data_recursive(self):
+        """Create Inventory of all instances with a single request
+
+        Get the config and the state of every instance at once instead of two requests per instance.
+
+        Args:
+            None
+        Kwargs:
+            None
+        Source:
+            https://github.com/lxc/lxd/blob/master/doc/rest-api.md
+        Raises:
+            None
+        Returns:
+            bool: False if the server did not return the state of the instances"""
+        # e.g. /1.0/instances?recursion=2 returns the instance configs including 'state',
+        # 'snapshots' and 'backups'. They are stored like the responses of
+        # /1.0/instances/<name> and /1.0/instances/<name>/state.
+        instances = self.socket.do('GET', '/1.0/instances?recursion=2')
+        instance_config = {'instances': {}}
+        for instance in instances['metadata']:
+            if not isinstance(instance, dict) or not isinstance(instance.get('state'), dict):
+                return False
+            instance = dict(instance)
+            state = instance.pop('state')
+            instance.pop('snapshots', None)
+            instance.pop('backups', None)
+            instance_config['instances'][instance['name']] = {
+                'instances': dict(instances, metadata=instance),
+                'state': dict(instances, metadata=state),
+            }
+        self.data = dict_merge(instance_config, self.data)
+        return True
+
     def get_network_data(self, names):
         """Create Inventory of the instance
 
@@ -983,7 +1017,8 @@ class InventoryModule(BaseInventoryPlugin):
 
         if len(self.data) == 0:  # If no data is injected by unittests open socket
             self.socket = self._connect_to_socket()
-            self.get_instance_data(self._get_instances())
+            if not self.get_instance_data_recursive():
+                self.get_instance_data(self._get_instances())
             self.get_network_data(self._get_networks())
 
         # The first version of the inventory only supported containers.
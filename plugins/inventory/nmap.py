@@ -16,6 +16,7 @@ DOCUMENTATION = '''
       - inventory_cache
     requirements:
       - nmap CLI installed
+      - ipaddress (for I(split_prefix))
     options:
         plugin:
             description: token that ensures this is a source file for the 'nmap' plugin.
@@ -39,6 +40,19 @@ DOCUMENTATION = '''
             description: use IPv6 type addresses
             type: boolean
             default: True
+        split_prefix:
+            description:
+                - Split an I(address) in CIDR notation into networks with this prefix length and scan them with
+                  concurrent nmap processes.
+                - Addresses that are not in CIDR notation, or whose prefix is not shorter, are scanned with a single process.
+            type: int
+            version_added: 4.4.0
+        scan_workers:
+            description:
+                - Maximum number of nmap processes running at the same time when I(split_prefix) is used.
+                - Defaults to the number of CPUs.
+            type: int
+            version_added: 4.4.0
     notes:
         - At least one of ipv4 or ipv6 is required to be True, both can be True, but they cannot both be False.
         - 'TODO: add OS fingerprinting'
@@ -48,25 +62,43 @@ EXAMPLES = '''
 plugin: community.general.nmap
 strict: False
 address: 192.168.0.0/24
+
+# scan a large network with 8 concurrent nmap processes, one per /24
+plugin: community.general.nmap
+address: 10.10.0.0/16
+split_prefix: 24
+scan_workers: 8
 '''
 
+import multiprocessing
 import os
-import re
+import threading
 
+from multiprocessing.pool import ThreadPool
 from subprocess import Popen, PIPE
+from tempfile import TemporaryFile
+from xml.etree import ElementTree
 
 from ansible import constants as C
 from ansible.errors import AnsibleParserError
 from ansible.module_utils.common.text.converters import to_native, to_text
+from ansible.module_utils.six.moves import queue
 from ansible.plugins.inventory import BaseInventoryPlugin, Constructable, Cacheable
 from ansible.module_utils.common.process import get_bin_path
 
+try:
+    import ipaddress
+except ImportError as exc:
+    IPADDRESS_IMPORT_ERROR = exc
+else:
+    IPADDRESS_IMPORT_ERROR = None
+
+_DONE = object()
+
 
 class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
 
     NAME = 'community.general.nmap'
-    find_host = re.compile(r'^Nmap scan report for ([\w,.,-]+)(?: \(([\w,.,:,\[,\]]+)\))?')
-    find_port = re.compile(r'^(\d+)/(\w+)\s+(\w+)\s+(\w+)')
 
     def __init__(self):
         self._nmap = None
@@ -91,6 +123,139 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
             # Create groups based on variable values and add the corresponding hosts to it
             self._add_host_to_keyed_groups(self.get_option('keyed_groups'), host, hostname, strict=strict)
 
+    @staticmethod
+    def _parse_host(element):
+        ''' turn a <host> element of nmap's XML output into a host, None for hosts that are not up '''
+        status = element.find('status')
+        if status is not None and status.get('state') != 'up':
+            return None
+
+        ip = None
+        for address in element.findall('address'):
+            if address.get('addrtype') in ('ipv4', 'ipv6'):
+                ip = address.get('addr')
+                break
+        if ip is None:
+            return None
+
+        # if no reverse dns exists or dns only shows arpa, just use ip instead as hostname
+        host = ip
+        hostname = element.find('hostnames/hostname')
+        if hostname is not None and hostname.get('name') and not hostname.get('name').endswith('.in-addr.arpa'):
+            host = hostname.get('name')
+
+        result = {'name': host, 'ip': ip}
+        ports = []
+        for port in element.findall('ports/port'):
+            state = port.find('state')
+            service = port.find('service')
+            ports.append({'port': port.get('portid'),
+                          'protocol': port.get('protocol'),
+                          'state': state.get('state') if state is not None else 'unknown',
+                          'service': service.get('name') if service is not None else 'unknown'})
+        if ports:
+            result['ports'] = ports
+        return result
+
+    def _run_nmap(self, cmd, started=None):
+        ''' run nmap and yield the hosts it reports while it is still scanning '''
+        with TemporaryFile() as stderr:
+            p = Popen(cmd, stdout=PIPE, stderr=stderr)
+            if started is not None:
+                started(p)
+            try:
+                root = None
+                for event, element in ElementTree.iterparse(p.stdout, events=('start', 'end')):
+                    if root is None:
+                        root = element
+                    elif event == 'end' and element.tag == 'host':
+                        host = self._parse_host(element)
+                        # drop the hosts parsed so far, a large scan must not be kept in memory
+                        root.clear()
+                        if host is not None:
+                            yield host
+            except ElementTree.ParseError as e:
+                p.wait()
+                if p.returncode == 0:
+                    raise AnsibleParserError('Invalid XML returned by nmap: %s' % to_native(e))
+            finally:
+                p.stdout.close()
+                p.wait()
+
+            if p.returncode != 0:
+                stderr.seek(0)
+                raise AnsibleParserError('Failed to run nmap, rc=%s: %s' % (p.returncode, to_native(stderr.read())))
+
+    def _targets(self):
+        ''' split the address into the targets of concurrent nmap processes '''
+        address = self._options['address']
+        split_prefix = self.get_option('split_prefix')
+        if not split_prefix:
+            return [address]
+        if IPADDRESS_IMPORT_ERROR:
+            raise AnsibleParserError('ipaddress is required for split_prefix: %s' % to_native(IPADDRESS_IMPORT_ERROR))
+
+        try:
+            network = ipaddress.ip_network(to_text(address), strict=False)
+        except ValueError:
+            return [address]
+        if network.prefixlen >= split_prefix:
+            return [address]
+        if split_prefix > network.max_prefixlen:
+            raise AnsibleParserError('split_prefix %d is too long for %s' % (split_prefix, address))
+        return [to_native(subnet) for subnet in network.subnets(new_prefix=split_prefix)]
+
+    def _scan(self, cmd, targets):
+        ''' yield the hosts found in the targets, scanning up to scan_workers of them at the same time '''
+        if len(targets) == 1:
+            for host in self._run_nmap(cmd + targets):
+                yield host
+            return
+
+        found = queue.Queue()
+        stop = threading.Event()
+        lock = threading.Lock()
+        processes = []
+
+        def started(p):
+            with lock:
+                processes.append(p)
+                if stop.is_set():
+                    p.terminate()
+
+        def scan(target):
+            try:
+                if not stop.is_set():
+                    for host in self._run_nmap(cmd + [target], started):
+                        found.put(host)
+            except Exception as e:
+                found.put(e)
+            found.put(_DONE)
+
+        workers = self.get_option('scan_workers') or multiprocessing.cpu_count()
+        pool = ThreadPool(max(1, min(workers, len(targets))))
+        try:
+            pool.map_async(scan, targets)
+            pending = len(targets)
+            while pending:
+                item = found.get()
+                if item is _DONE:
+                    pending -= 1
+                elif isinstance(item, Exception):
+                    stop.set()
+                    raise item
+                else:
+                    yield item
+        finally:
+            # do not leave scans running when a target failed or the caller stopped early
+            with lock:
+                stop.set()
+                for p in processes:
+                    if p.poll() is None:
+                        p.terminate()
+            pool.close()
+            pool.join()
+
     def verify_file(self, path):
 
         valid = False
@@ -148,67 +313,18 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
                 cmd.append('--exclude')
                 cmd.append(','.join(self._options['exclude']))
 
-            cmd.append(self._options['address'])
-            try:
-                # execute
-                p = Popen(cmd, stdout=PIPE, stderr=PIPE)
-                stdout, stderr = p.communicate()
-                if p.returncode != 0:
-                    raise AnsibleParserError('Failed to run nmap, rc=%s: %s' % (p.returncode, to_native(stderr)))
-
-                # parse results
-                host = None
-                ip = None
-                ports = []
-                results = []
-
-                try:
-                    t_stdout = to_text(stdout, errors='surrogate_or_strict')
-                except UnicodeError as e:
-                    raise AnsibleParserError('Invalid (non unicode) input returned: %s' % to_native(e))
-
-                for line in t_stdout.splitlines():
-                    hits = self.find_host.match(line)
-                    if hits:
-                        if host is not None and ports:
-                            results[-1]['ports'] = ports
-
-                        # if dns only shows arpa, just use ip instead as hostname
-                        if hits.group(1).endswith('.in-addr.arpa'):
-                            host = hits.group(2)
-                        else:
-                            host = hits.group(1)
-
-                        # if no reverse dns exists, just use ip instead as hostname
-                        if hits.group(2) is not None:
-                            ip = hits.group(2)
-                        else:
-                            ip = hits.group(1)
-
-                        if host is not None:
-                            # update inventory
-                            results.append(dict())
-                            results[-1]['name'] = host
-                            results[-1]['ip'] = ip
-                            ports = []
-                        continue
-
-                    host_ports = self.find_port.match(line)
-                    if host is not None and host_ports:
-                        ports.append({'port': host_ports.group(1),
-                                      'protocol': host_ports.group(2),
-                                      'state': host_ports.group(3),
-                                      'service': host_ports.group(4)})
-                        continue
-
-                # if any leftovers
-                if host and ports:
-                    results[-1]['ports'] = ports
+            cmd.extend(['-oX', '-'])
 
+            # hosts are added to the inventory while nmap is still scanning
+            results = []
+            try:
+                for host in self._scan(cmd, self._targets()):
+                    results.append(host)
+                    self._populate([host])
             except Exception as e:
                 raise AnsibleParserError("failed to parse %s: %s " % (to_native(path), to_native(e)))
+        else:
+            self._populate(results)
 
         if cache_needs_update:
             self._cache[cache_key] = results
-
-        self._populate(results)
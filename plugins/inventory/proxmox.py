@@ -77,6 +77,32 @@ DOCUMENTATION = '''
           - When set to C(true) (default), will use the first available interface. This can be different from what you expect.
         default: true
         type: bool
+      fetch_workers:
+        description:
+          - Number of threads used to query the API for the details of every guest.
+          - With more than one worker, the status, configuration, snapshots and agent network interfaces of all guests
+            are fetched concurrently before the hosts are added to the inventory.
+        default: 1
+        type: int
+        version_added: 4.4.0
+      use_cluster_resources:
+        description:
+          - Get the status of every guest from a single request to the C(/cluster/resources) endpoint
+            instead of one request per guest.
+        default: false
+        type: bool
+        version_added: 4.4.0
+      incremental_refresh:
+        description:
+          - When the inventory cache is used, only request the node, guest and pool listings and the node networks
+            again and reuse the cached status, configuration, snapshots and agent network interfaces of guests whose listing entry
+            did not change.
+          - A guest counts as changed when its status or lock changed, or when its uptime shows it was restarted.
+          - Cached guest details older than I(cache_timeout) are always requested again.
+          - Has no effect unless I(cache) is enabled.
+        default: false
+        type: bool
+        version_added: 4.4.0
       strict:
         version_added: 2.5.0
       compose:
@@ -114,9 +140,21 @@ groups:
   mailservers: "'mail' in (proxmox_tags_parsed|list)"
 compose:
   ansible_port: 2222
+
+# Using concurrent requests and the cluster resources endpoint to speed up large clusters
+# my.proxmox.yml
+plugin: community.general.proxmox
+url: http://pve.domain.com:8006
+user: ansible@pve
+password: secure
+want_facts: true
+fetch_workers: 16
+use_cluster_resources: true
 '''
 
 import re
+import time
+from multiprocessing.pool import ThreadPool
 
 from ansible.module_utils.common._collections_compat import MutableMapping
 
@@ -141,6 +179,13 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
 
     NAME = 'community.general.proxmox'
 
+    # guest listings and the per guest endpoints, relative to the API base URL
+    GUEST_LISTING_URL = re.compile(r'^/api2/json/nodes/([^/]+)/(lxc|qemu)$')
+    GUEST_URL = re.compile(r'^/api2/json/nodes/([^/]+)/(lxc|qemu)/([^/]+)/')
+
+    # seconds the boot time derived from the uptime may drift before a guest counts as restarted
+    BOOT_TIME_TOLERANCE = 10
+
     def __init__(self):
 
         super(InventoryModule, self).__init__()
@@ -151,6 +196,10 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         self.session = None
         self.cache_key = None
         self.use_cache = None
+        self.incremental_refresh = None
+        self._fetched = set()
+        self._changed_guests = set()
+        self._vm_resources = None
 
     def verify_file(self, path):
 
@@ -166,6 +215,12 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         if not self.session:
             self.session = requests.session()
             self.session.verify = self.get_option('validate_certs')
+            workers = self.get_option('fetch_workers')
+            if workers > 1:
+                # keep one connection per worker instead of reconnecting all the time
+                adapter = requests.adapters.HTTPAdapter(pool_maxsize=workers)
+                self.session.mount('http://', adapter)
+                self.session.mount('https://', adapter)
         return self.session
 
     def _get_auth(self):
@@ -183,7 +238,7 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
 
     def _get_json(self, url, ignore_errors=None):
 
-        if not self.use_cache or url not in self._cache.get(self.cache_key, {}):
+        if self._needs_fetch(url):
 
             if self.cache_key not in self._cache:
                 self._cache[self.cache_key] = {'url': ''}
@@ -214,10 +269,59 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
                     data = data + json['data']
                     break
 
+            if self.incremental_refresh:
+                fetched_at = time.time()
+                self._find_changed_guests(url, data, fetched_at)
+                self._cache[self.cache_key].setdefault('timestamps', {})[url] = fetched_at
             self._cache[self.cache_key][url] = data
+            self._fetched.add(url)
 
         return self._cache[self.cache_key][url]
 
+    def _needs_fetch(self, url):
+        cache = self._cache.get(self.cache_key, {})
+        if url not in cache:
+            return True
+        if url in self._fetched:
+            return False
+        if self.incremental_refresh:
+            return not self._is_fresh_guest_data(url)
+        return not self.use_cache
+
+    def _is_fresh_guest_data(self, url):
+        '''Whether the cached reply of a per guest endpoint can be reused, listings are always fetched again'''
+        match = self.GUEST_URL.match(url[len(self.proxmox_url):])
+        if not match or match.groups() in self._changed_guests:
+            return False
+        fetched_at = self._cache[self.cache_key].get('timestamps', {}).get(url)
+        return fetched_at is not None and time.time() - fetched_at < self.get_option('cache_timeout')
+
+    def _find_changed_guests(self, url, data, fetched_at):
+        '''Compare a fresh guest listing with the cached one and remember the guests that changed'''
+        match = self.GUEST_LISTING_URL.match(url[len(self.proxmox_url):])
+        if not match:
+            return
+        node, vmtype = match.groups()
+        cache = self._cache[self.cache_key]
+        previous_at = cache.get('timestamps', {}).get(url)
+        previous = dict((str(guest.get('vmid')), guest) for guest in cache.get(url) or [])
+
+        for guest in data:
+            vmid = str(guest.get('vmid'))
+            old = previous.get(vmid)
+            if old is None or previous_at is None or self._guest_changed(old, previous_at, guest, fetched_at):
+                self._changed_guests.add((node, vmtype, vmid))
+
+    def _guest_changed(self, old, old_at, new, new_at):
+        if old.get('status') != new.get('status') or old.get('lock', '') != new.get('lock', ''):
+            return True
+        if new.get('status') != 'running':
+            return False
+        # a running guest keeps its boot time, a restart moves it forward
+        old_boot = old_at - (old.get('uptime') or 0)
+        new_boot = new_at - (new.get('uptime') or 0)
+        return abs(new_boot - old_boot) > self.BOOT_TIME_TOLERANCE
+
     def _get_nodes(self):
         return self._get_json("%s/api2/json/nodes" % self.proxmox_url)
 
@@ -230,6 +334,9 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
     def _get_qemu_per_node(self, node):
         return self._get_json("%s/api2/json/nodes/%s/qemu" % (self.proxmox_url, node))
 
+    def _get_cluster_resources(self):
+        return self._get_json("%s/api2/json/cluster/resources?type=vm" % self.proxmox_url)
+
     def _get_members_per_pool(self, pool):
         ret = self._get_json("%s/api2/json/pools/%s" % (self.proxmox_url, pool))
         return ret['members']
@@ -330,9 +437,13 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
                 return None
 
     def _get_vm_status(self, node, vmid, vmtype, name):
-        ret = self._get_json("%s/api2/json/nodes/%s/%s/%s/status/current" % (self.proxmox_url, node, vmtype, vmid))
+        resource = (self._vm_resources or {}).get((vmtype, str(vmid)))
+        if resource is not None and 'status' in resource:
+            status = resource['status']
+        else:
+            ret = self._get_json("%s/api2/json/nodes/%s/%s/%s/status/current" % (self.proxmox_url, node, vmtype, vmid))
+            status = ret['status']
 
-        status = ret['status']
         status_key = 'status'
         status_key = self.to_safe('%s%s' % (self.get_option('facts_prefix'), status_key.lower()))
         self.inventory.set_variable(name, status_key, status)
@@ -346,6 +457,77 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         snapshots = [snapshot['name'] for snapshot in ret if snapshot['name'] != 'current']
         self.inventory.set_variable(name, snapshots_key, snapshots)
 
+    def _prefetch(self, urls):
+        '''Fetch the given URLs concurrently so that populating the inventory afterwards is served from the cache'''
+        urls = [url for url in urls if url not in self._fetched]
+        workers = min(self.get_option('fetch_workers'), len(urls))
+        if workers <= 1:
+            return
+
+        pool = ThreadPool(workers)
+        try:
+            pool.map(self._prefetch_url, urls)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _prefetch_url(self, url):
+        try:
+            self._get_json(url)
+        except (requests.RequestException, ValueError):
+            # the request is made again, and the error handled, when the inventory is populated
+            pass
+
+    def _agent_enabled(self, node, vmid, vmtype):
+        config = self._get_json("%s/api2/json/nodes/%s/%s/%s/config" % (self.proxmox_url, node, vmtype, vmid))
+        try:
+            return bool(int(str(config.get('agent', 0)).split(',')[0]))
+        except (AttributeError, ValueError):
+            return False
+
+    def _prefetch_guests(self, nodes):
+        '''Fetch everything _populate needs for the guests of the given nodes'''
+        want_facts = self.get_option('want_facts')
+        base = self.proxmox_url + '/api2/json'
+
+        urls = ['%s/pools' % base]
+        if self.get_option('use_cluster_resources'):
+            urls.append('%s/cluster/resources?type=vm' % base)
+        for node in nodes:
+            urls.extend(['%s/nodes/%s/lxc' % (base, node), '%s/nodes/%s/qemu' % (base, node)])
+            if self.get_option('want_proxmox_nodes_ansible_host'):
+                urls.append('%s/nodes/%s/network' % (base, node))
+        self._prefetch(urls)
+
+        self._load_vm_resources()
+
+        guests = []
+        for node in nodes:
+            guests.extend((node, lxc['vmid'], 'lxc') for lxc in self._get_lxc_per_node(node))
+            guests.extend((node, qemu['vmid'], 'qemu') for qemu in self._get_qemu_per_node(node) if not qemu.get('template'))
+
+        urls = ['%s/pools/%s' % (base, pool['poolid']) for pool in self._get_pools() if pool.get('poolid')]
+        for node, vmid, vmtype in guests:
+            guest = '%s/nodes/%s/%s/%s' % (base, node, vmtype, vmid)
+            if (vmtype == 'qemu' or want_facts) and (vmtype, str(vmid)) not in self._vm_resources:
+                urls.append('%s/status/current' % guest)
+            if want_facts:
+                urls.extend(['%s/config' % guest, '%s/snapshot' % guest])
+        self._prefetch(urls)
+
+        if want_facts:
+            self._prefetch([
+                '%s/nodes/%s/%s/%s/agent/network-get-interfaces' % (base, node, vmtype, vmid)
+                for node, vmid, vmtype in guests if self._agent_enabled(node, vmid, vmtype)
+            ])
+
+    def _load_vm_resources(self):
+        self._vm_resources = {}
+        if self.get_option('use_cluster_resources'):
+            for resource in self._get_cluster_resources():
+                if resource.get('type') in ('lxc', 'qemu') and 'vmid' in resource:
+                    self._vm_resources[(resource['type'], str(resource['vmid']))] = resource
+
     def to_safe(self, word):
         '''Converts 'bad' characters in a string to underscores so they can be used as Ansible groups
         #> ProxmoxInventory.to_safe("foo-bar baz")
@@ -364,8 +546,14 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
 
         self._get_auth()
 
+        nodes = self._get_nodes()
+        if self.get_option('fetch_workers') > 1:
+            self._prefetch_guests([node['node'] for node in nodes if node.get('node') and node['status'] != 'offline'])
+        else:
+            self._load_vm_resources()
+
         # gather vm's on nodes
-        for node in self._get_nodes():
+        for node in nodes:
             # FIXME: this can probably be cleaner
             # create groups
             lxc_group = 'all_lxc'
@@ -474,6 +662,12 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         self.proxmox_password = self.get_option('password')
         self.cache_key = self.get_cache_key(path)
         self.use_cache = cache and self.get_option('cache')
+        self.incremental_refresh = self.use_cache and self.get_option('incremental_refresh')
+
+        cached = self._cache.get(self.cache_key) if self.incremental_refresh else None
+        if cached:
+            # work on a copy so that changes are noticed and written back to the cache
+            self._cache[self.cache_key] = dict(cached, timestamps=dict(cached.get('timestamps', {})))
 
         # actually populate inventory
         self._populate()
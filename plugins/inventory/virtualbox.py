@@ -34,6 +34,22 @@ DOCUMENTATION = '''
             description: create vars from virtualbox properties
             type: dictionary
             default: {}
+        enumerate_properties:
+            description:
+                - Read all guest properties of a VM with a single C(VBoxManage guestproperty enumerate) instead of
+                  running C(VBoxManage guestproperty get) for I(network_info_path) and every property in I(query).
+                - With I(cache) enabled, the properties of a VM are kept in the inventory cache and are reused when the
+                  inventory is refreshed, for example with C(--flush-cache) or with C(refresh_inventory), as long as the
+                  state of that VM has not changed. Properties of running VMs are only cached once I(network_info_path)
+                  has been reported.
+            type: boolean
+            default: False
+            version_added: 4.4.0
+        enumerate_workers:
+            description: number of C(VBoxManage guestproperty enumerate) processes run at the same time
+            type: int
+            default: 8
+            version_added: 4.4.0
 '''
 
 EXAMPLES = '''
@@ -46,6 +62,12 @@ simple_config_file:
     compose:
       ansible_connection: ('indows' in vbox_Guest_OS)|ternary('winrm', 'ssh')
 
+# query the properties of many vms at once
+plugin: community.general.virtualbox
+enumerate_properties: true
+enumerate_workers: 16
+cache: true
+
 # add hosts (all match with minishift vm) to the group container if any of the vms are in ansible_inventory'
 plugin: community.general.virtualbox
 groups:
@@ -53,7 +75,9 @@ groups:
 '''
 
 import os
+import re
 
+from multiprocessing.pool import ThreadPool
 from subprocess import Popen, PIPE
 
 from ansible.errors import AnsibleParserError
@@ -69,18 +93,29 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
     NAME = 'community.general.virtualbox'
     VBOX = "VBoxManage"
 
+    # 'guestproperty enumerate' output of VirtualBox 6 and earlier, and of VirtualBox 7
+    PROPERTY_LINES = (
+        re.compile(r'^Name: (?P<name>[^,]*), value: (?P<value>.*), timestamp: \d+, flags: ?.*$'),
+        re.compile(r"^\s*(?P<name>/\S*) = '(?P<value>.*)' @ \S+(?: \[.*\])?$"),
+    )
+
     def __init__(self):
         self._vbox_path = None
+        self._properties = None
+        self._properties_cache_key = None
         super(InventoryModule, self).__init__()
 
     def _query_vbox_data(self, host, property_path):
+        if self._properties is not None:
+            return self._properties.get(host, {}).get(property_path)
+
         ret = None
         try:
             cmd = [self._vbox_path, b'guestproperty', b'get',
                    to_bytes(host, errors='surrogate_or_strict'),
                    to_bytes(property_path, errors='surrogate_or_strict')]
             x = Popen(cmd, stdout=PIPE)
-            ipinfo = to_text(x.stdout.read(), errors='surrogate_or_strict')
+            ipinfo = to_text(x.communicate()[0], errors='surrogate_or_strict')
             if 'Value' in ipinfo:
                 a, ip = ipinfo.split(':', 1)
                 ret = ip.strip()
@@ -88,6 +123,59 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
             pass
         return ret
 
+    def _enumerate_vbox_data(self, host):
+        properties = {}
+        try:
+            cmd = [self._vbox_path, b'guestproperty', b'enumerate', to_bytes(host, errors='surrogate_or_strict')]
+            x = Popen(cmd, stdout=PIPE)
+            output = to_text(x.communicate()[0], errors='surrogate_or_strict')
+        except Exception:
+            return properties
+
+        for line in output.splitlines():
+            for regex in self.PROPERTY_LINES:
+                match = regex.match(line)
+                if match:
+                    properties[match.group('name')] = match.group('value')
+                    break
+        return properties
+
+    def _load_vbox_properties(self, hostvars):
+        ''' enumerate the properties of all hosts, reusing cached ones for hosts with an unchanged state '''
+        cached = {}
+        if self._properties_cache_key:
+            cached = self._cache.get(self._properties_cache_key) or {}
+
+        netinfo = self.get_option('network_info_path')
+        entries = {}
+        outdated = []
+        for host in hostvars:
+            state = hostvars[host].get('vbox_State')
+            entry = cached.get(host)
+            if entry and entry.get('state') == state:
+                entries[host] = entry
+            else:
+                outdated.append(host)
+
+        if outdated:
+            pool = ThreadPool(max(1, min(self.get_option('enumerate_workers'), len(outdated))))
+            try:
+                results = pool.map(self._enumerate_vbox_data, outdated)
+            finally:
+                pool.close()
+                pool.join()
+            for host, properties in zip(outdated, results):
+                entries[host] = {'state': hostvars[host].get('vbox_State'), 'properties': properties}
+
+        self._properties = dict((host, entry['properties']) for host, entry in entries.items())
+
+        if self._properties_cache_key:
+            # the properties of a booting vm are not complete until the guest additions report the network
+            self._cache[self._properties_cache_key] = dict(
+                (host, entry) for host, entry in entries.items()
+                if netinfo in entry['properties'] or not (entry['state'] or '').startswith('running')
+            )
+
     def _set_variables(self, hostvars):
 
         # set vars in inventory from hostvars
@@ -166,10 +254,11 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
                     hostvars[current_host] = {}
                     self.inventory.add_host(current_host)
 
-                # try to get network info
-                netdata = self._query_vbox_data(current_host, netinfo)
-                if netdata:
-                    self.inventory.set_variable(current_host, 'ansible_host', netdata)
+                # try to get network info, with enumerate_properties this is done for all hosts at once
+                if not self.get_option('enumerate_properties'):
+                    netdata = self._query_vbox_data(current_host, netinfo)
+                    if netdata:
+                        self.inventory.set_variable(current_host, 'ansible_host', netdata)
 
             # found groups
             elif k == 'Groups':
@@ -199,6 +288,13 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
 
                 prevkey = pref_k
 
+        if self.get_option('enumerate_properties'):
+            self._load_vbox_properties(hostvars)
+            for host in hostvars:
+                netdata = self._query_vbox_data(host, netinfo)
+                if netdata:
+                    self.inventory.set_variable(host, 'ansible_host', netdata)
+
         self._set_variables(hostvars)
         for host in hostvars:
             h = self.inventory.get_host(host)
@@ -244,10 +340,12 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         self._consume_options(config_data)
 
         source_data = None
+        user_cache_setting = self.get_option('cache')
         if cache:
-            cache = self.get_option('cache')
+            cache = user_cache_setting
 
-        update_cache = False
+        # a refresh (cache=False) rebuilds the cache when it is enabled
+        update_cache = user_cache_setting and not cache
         if cache:
             try:
                 source_data = self._cache[cache_key]
@@ -274,7 +372,10 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
             except Exception as e:
                 raise AnsibleParserError(to_native(e))
 
-            source_data = p.stdout.read().splitlines()
+            source_data = p.communicate()[0].splitlines()
+
+        if user_cache_setting:
+            self._properties_cache_key = cache_key + '_properties'
 
         using_current_cache = cache and not update_cache
         cacheable_results = self._populate_from_source(source_data, using_current_cache)
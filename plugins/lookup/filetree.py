@@ -18,6 +18,14 @@ options:
   _terms:
     description: path(s) of files to read
     required: True
+  workers:
+    description:
+    - Number of threads used to collect the file properties (C(lstat) and SELinux context) of the entries.
+    - The default of C(1) collects them while walking the tree, without extra threads.
+    - Higher values help with large trees on network or slow file systems.
+    type: int
+    default: 1
+    version_added: 4.4.0
 '''
 
 EXAMPLES = r"""
@@ -117,6 +125,8 @@ import pwd
 import grp
 import stat
 
+from multiprocessing.pool import ThreadPool
+
 HAVE_SELINUX = False
 try:
     import selinux
@@ -148,9 +158,44 @@ def selinux_context(path):
     return context
 
 
-def file_props(root, path):
+class NameCache(object):
+    ''' Caches the user and group names of uids and gids, most files in a tree share a few owners '''
+
+    def __init__(self):
+        self.owners = {}
+        self.groups = {}
+        self.selinux = HAVE_SELINUX and selinux.is_selinux_enabled() == 1
+
+    def owner(self, uid):
+        try:
+            return self.owners[uid]
+        except KeyError:
+            pass
+        try:
+            name = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            name = uid
+        self.owners[uid] = name
+        return name
+
+    def group(self, gid):
+        try:
+            return self.groups[gid]
+        except KeyError:
+            pass
+        try:
+            name = to_text(grp.getgrgid(gid).gr_name)
+        except KeyError:
+            name = gid
+        self.groups[gid] = name
+        return name
+
+
+def file_props(root, path, names=None):
     ''' Returns dictionary with file properties, or return None on failure '''
     abspath = os.path.join(root, path)
+    if names is None:
+        names = NameCache()
 
     try:
         st = os.lstat(abspath)
@@ -174,20 +219,14 @@ def file_props(root, path):
 
     ret['uid'] = st.st_uid
     ret['gid'] = st.st_gid
-    try:
-        ret['owner'] = pwd.getpwuid(st.st_uid).pw_name
-    except KeyError:
-        ret['owner'] = st.st_uid
-    try:
-        ret['group'] = to_text(grp.getgrgid(st.st_gid).gr_name)
-    except KeyError:
-        ret['group'] = st.st_gid
+    ret['owner'] = names.owner(st.st_uid)
+    ret['group'] = names.group(st.st_gid)
     ret['mode'] = '0%03o' % (stat.S_IMODE(st.st_mode))
     ret['size'] = st.st_size
     ret['mtime'] = st.st_mtime
     ret['ctime'] = st.st_ctime
 
-    if HAVE_SELINUX and selinux.is_selinux_enabled() == 1:
+    if names.selinux:
         context = selinux_context(abspath)
         ret['seuser'] = context[0]
         ret['serole'] = context[1]
@@ -197,26 +236,98 @@ def file_props(root, path):
     return ret
 
 
+def walk_tree(path):
+    ''' Yields the paths relative to path of all entries below it, in the same order as os.walk(topdown=True) '''
+    if not hasattr(os, 'scandir'):
+        for root, dirs, files in os.walk(path, topdown=True):
+            for entry in dirs + files:
+                yield os.path.relpath(os.path.join(root, entry), path)
+        return
+
+    pending = [(path, '')]
+    while pending:
+        top, prefix = pending.pop()
+        dirs = []
+        files = []
+        subdirs = []
+        try:
+            entries = list(os.scandir(top))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                files.append(entry.name)
+                continue
+            dirs.append(entry.name)
+            try:
+                is_link = entry.is_symlink()
+            except OSError:
+                is_link = False
+            # like os.walk, do not descend into symlinked directories
+            if not is_link:
+                subdirs.append((entry.path, prefix + entry.name + os.sep))
+        for name in dirs + files:
+            yield prefix + name
+        pending.extend(reversed(subdirs))
+
+
+def iter_filetree(paths, workers=1):
+    '''
+    Yields the file properties of all entries below paths as they are found.
+    Entries with a path already returned from a previous root are skipped.
+    '''
+    names = NameCache()
+    seen = set()
+
+    def unseen():
+        for path in paths:
+            display.debug("Walking '{0}'".format(path))
+            for relpath in walk_tree(path):
+                # Skip if relpath was already processed (from another root)
+                if relpath not in seen:
+                    yield path, relpath
+
+    def props(item):
+        return file_props(item[0], item[1], names)
+
+    if workers > 1:
+        pool = ThreadPool(workers)
+        # imap keeps the order of the walk
+        results = pool.imap(props, unseen(), 64)
+    else:
+        pool = None
+        results = (props(item) for item in unseen())
+
+    try:
+        for ret in results:
+            # the walk can be ahead of the results when using threads, check again
+            if ret is not None and ret['path'] not in seen:
+                seen.add(ret['path'])
+                yield ret
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
 class LookupModule(LookupBase):
 
     def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
         basedir = self.get_basedir(variables)
 
-        ret = []
+        paths = []
         for term in terms:
             term_file = os.path.basename(term)
             dwimmed_path = self._loader.path_dwim_relative(basedir, 'files', os.path.dirname(term))
-            path = os.path.join(dwimmed_path, term_file)
-            display.debug("Walking '{0}'".format(path))
-            for root, dirs, files in os.walk(path, topdown=True):
-                for entry in dirs + files:
-                    relpath = os.path.relpath(os.path.join(root, entry), path)
-
-                    # Skip if relpath was already processed (from another root)
-                    if relpath not in [entry['path'] for entry in ret]:
-                        props = file_props(path, relpath)
-                        if props is not None:
-                            display.debug("  found '{0}'".format(os.path.join(path, relpath)))
-                            ret.append(props)
+            paths.append(os.path.join(dwimmed_path, term_file))
 
+        ret = []
+        for props in iter_filetree(paths, self.get_option('workers')):
+            display.debug("  found '{0}'".format(os.path.join(props['root'], props['path'])))
+            ret.append(props)
         return ret
@@ -30,13 +30,18 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import hashlib
 import json
+import os
+import stat
+import tempfile
+import time
 import traceback
 
 from ansible.module_utils.urls import open_url
 from ansible.module_utils.six.moves.urllib.parse import urlencode, quote
 from ansible.module_utils.six.moves.urllib.error import HTTPError
-from ansible.module_utils.common.text.converters import to_native, to_text
+from ansible.module_utils.common.text.converters import to_bytes, to_native, to_text
 
 URL_REALM_INFO = "{url}/realms/{realm}"
 URL_REALMS = "{url}/admin/realms"
@@ -87,6 +92,12 @@ URL_IDENTITY_PROVIDER_MAPPER = "{url}/admin/realms/{realm}/identity-provider/ins
 URL_COMPONENTS = "{url}/admin/realms/{realm}/components"
 URL_COMPONENT = "{url}/admin/realms/{realm}/components/{id}"
 
+# cached tokens are renewed when they expire in less than this many seconds
+TOKEN_EXPIRY_MARGIN = 30
+
+# number of groups requested at once when searching groups by name
+GROUP_SEARCH_PAGE_SIZE = 100
+
 
 def keycloak_argument_spec():
     """
@@ -103,6 +114,7 @@ def keycloak_argument_spec():
         auth_password=dict(type='str', aliases=['password'], no_log=True),
         validate_certs=dict(type='bool', default=True),
         token=dict(type='str', no_log=True),
+        auth_token_cache=dict(type='path'),
     )
 
 
@@ -114,6 +126,63 @@ class KeycloakError(Exception):
     pass
 
 
+def _token_cache_path(module_params):
+    """ Path of the token cache file for the URL, realm, client and user of the module """
+    key = json.dumps([module_params.get('auth_keycloak_url'), module_params.get('auth_realm'),
+                      module_params.get('auth_client_id'), module_params.get('auth_username')])
+    return os.path.join(module_params['auth_token_cache'],
+                        'keycloak-token-%s.json' % hashlib.sha256(to_bytes(key)).hexdigest())
+
+
+def _read_token_cache(path):
+    """ Returns the cached tokens, or None if there are none or the file is not private to the user """
+    try:
+        with open(path) as f:
+            st = os.fstat(f.fileno())
+            if st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+                return None
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _write_token_cache(path, cached):
+    """ Atomically replaces the token cache file, errors are ignored as the cache is optional """
+    cache_dir = os.path.dirname(path)
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+        # mkstemp creates the file readable and writable only by the user
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.keycloak-token-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cached, f)
+            os.rename(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    except (IOError, OSError):
+        pass
+
+
+def _request_token(auth_url, payload, validate_certs):
+    """ POSTs payload to the token endpoint and returns the decoded response """
+    # Remove empty items, for instance missing client_secret
+    payload = dict(
+        (k, v) for k, v in payload.items() if v is not None)
+    try:
+        return json.loads(to_native(open_url(auth_url, method='POST',
+                                             validate_certs=validate_certs,
+                                             data=urlencode(payload)).read()))
+    except ValueError as e:
+        raise KeycloakError(
+            'API returned invalid JSON when trying to obtain access token from %s: %s'
+            % (auth_url, str(e)))
+    except Exception as e:
+        raise KeycloakError('Could not obtain access token from %s: %s'
+                            % (auth_url, str(e)))
+
+
 def get_token(module_params):
     """ Obtains connection header with token for the authentication,
         token already given or obtained from credentials
@@ -135,33 +204,59 @@ def get_token(module_params):
         auth_password = module_params.get('auth_password')
         client_secret = module_params.get('auth_client_secret')
         auth_url = URL_TOKEN.format(url=base_url, realm=auth_realm)
-        temp_payload = {
-            'grant_type': 'password',
-            'client_id': client_id,
-            'client_secret': client_secret,
-            'username': auth_username,
-            'password': auth_password,
-        }
-        # Remove empty items, for instance missing client_secret
-        payload = dict(
-            (k, v) for k, v in temp_payload.items() if v is not None)
-        try:
-            r = json.loads(to_native(open_url(auth_url, method='POST',
-                                              validate_certs=validate_certs,
-                                              data=urlencode(payload)).read()))
-        except ValueError as e:
-            raise KeycloakError(
-                'API returned invalid JSON when trying to obtain access token from %s: %s'
-                % (auth_url, str(e)))
-        except Exception as e:
-            raise KeycloakError('Could not obtain access token from %s: %s'
-                                % (auth_url, str(e)))
+
+        cache_path = None
+        cached = None
+        now = time.time()
+        if module_params.get('auth_token_cache'):
+            cache_path = _token_cache_path(module_params)
+            cached = _read_token_cache(cache_path)
+
+        if cached and cached.get('expires_at', 0) - now > TOKEN_EXPIRY_MARGIN:
+            return {
+                'Authorization': 'Bearer ' + cached['access_token'],
+                'Content-Type': 'application/json'
+            }
+
+        r = None
+        if cached and cached.get('refresh_token') and (cached.get('refresh_expires_at') is None
+                                                       or cached['refresh_expires_at'] - now > TOKEN_EXPIRY_MARGIN):
+            try:
+                r = _request_token(auth_url, {
+                    'grant_type': 'refresh_token',
+                    'client_id': client_id,
+                    'client_secret': client_secret,
+                    'refresh_token': cached['refresh_token'],
+                }, validate_certs)
+            except KeycloakError:
+                # the refresh token may have been revoked, log in again
+                r = None
+            if r is not None and 'access_token' not in r:
+                r = None
+        if r is None:
+            r = _request_token(auth_url, {
+                'grant_type': 'password',
+                'client_id': client_id,
+                'client_secret': client_secret,
+                'username': auth_username,
+                'password': auth_password,
+            }, validate_certs)
 
         try:
             token = r['access_token']
         except KeyError:
             raise KeycloakError(
                 'Could not obtain access token from %s' % auth_url)
+
+        if cache_path and r.get('expires_in'):
+            refresh_expires_in = r.get('refresh_expires_in')
+            _write_token_cache(cache_path, {
+                'access_token': token,
+                'expires_at': now + r['expires_in'],
+                'refresh_token': r.get('refresh_token'),
+                # offline tokens do not expire, Keycloak reports 0 for them
+                'refresh_expires_at': now + refresh_expires_in if refresh_expires_in else None,
+            })
     return {
         'Authorization': 'Bearer ' + token,
         'Content-Type': 'application/json'
@@ -230,6 +325,65 @@ class KeycloakAPI(object):
         self.baseurl = self.module.params.get('auth_keycloak_url')
         self.validate_certs = self.module.params.get('validate_certs')
         self.restheaders = connection_header
+        # listings by URL, with an index of their items by name, for the duration of the module run
+        self._listings = {}
+        # groups found by searching for their name, by groups URL and name
+        self._group_searches = {}
+
+    def _get_listing(self, url):
+        """ Fetch a listing once per module run, or get it from the cache
+
+        :param url: URL of the listing
+        :return: tuple of the list of items and a dict of the items by name
+        """
+        if url not in self._listings:
+            items = json.loads(to_native(open_url(url, method="GET", headers=self.restheaders,
+                                                  validate_certs=self.validate_certs).read()))
+            # the first item of a name wins, like the linear search did before
+            index = dict((item['name'], item) for item in reversed(items) if 'name' in item)
+            self._listings[url] = (items, index)
+        return self._listings[url]
+
+    def _invalidate_listing(self, url):
+        """ Forget the cached listing of url after one of its items was created, updated or deleted """
+        self._listings.pop(url, None)
+        self._group_searches.pop(url, None)
+
+    def _search_group(self, name, realm):
+        """ Search the top level group with the given name using the search, first and max
+        parameters of the groups resource, instead of fetching all groups of the realm.
+
+        :param name: Name of the group
+        :param realm: Realm in which the group resides
+        :return: the group from the listing (name and ID) or None
+        """
+        groups_url = URL_GROUPS.format(url=self.baseurl, realm=realm)
+        if groups_url in self._listings:
+            return self._listings[groups_url][1].get(name)
+        searches = self._group_searches.setdefault(groups_url, {})
+        if name in searches:
+            return searches[name]
+
+        found = None
+        seen = set()
+        first = 0
+        while found is None:
+            page_url = groups_url + '?' + urlencode([('search', name), ('first', first), ('max', GROUP_SEARCH_PAGE_SIZE)])
+            page = json.loads(to_native(open_url(page_url, method="GET", headers=self.restheaders,
+                                                 validate_certs=self.validate_certs).read()))
+            # the search also matches groups with a subgroup of that name, and
+            # servers that do not support the parameters return all groups
+            new = [group for group in page if group['id'] not in seen]
+            for group in new:
+                seen.add(group['id'])
+                if group['name'] == name:
+                    found = group
+                    break
+            if len(page) < GROUP_SEARCH_PAGE_SIZE or not new:
+                break
+            first += len(page)
+        searches[name] = found
+        return found
 
     def get_realm_info_by_id(self, realm='master'):
         """ Obtain realm public info by id
@@ -568,8 +722,7 @@ class KeycloakAPI(object):
         url = URL_CLIENTTEMPLATES.format(url=self.baseurl, realm=realm)
 
         try:
-            return json.loads(to_native(open_url(url, method='GET', headers=self.restheaders,
-                                                 validate_certs=self.validate_certs).read()))
+            return self._get_listing(url)[0]
         except ValueError as e:
             self.module.fail_json(msg='API returned incorrect JSON when trying to obtain list of client templates for realm %s: %s'
                                       % (realm, str(e)))
@@ -603,11 +756,8 @@ class KeycloakAPI(object):
         :param realm: client template from this realm
         :return: dict of client template representation or None if none matching exist
         """
-        result = self.get_client_templates(realm)
-        if isinstance(result, list):
-            result = [x for x in result if x['name'] == name]
-            if len(result) > 0:
-                return result[0]
+        if isinstance(self.get_client_templates(realm), list):
+            return self._listings[URL_CLIENTTEMPLATES.format(url=self.baseurl, realm=realm)][1].get(name)
         return None
 
     def get_client_template_id(self, name, realm='master'):
@@ -631,6 +781,7 @@ class KeycloakAPI(object):
         :return: HTTPResponse object on success
         """
         url = URL_CLIENTTEMPLATE.format(url=self.baseurl, realm=realm, id=id)
+        self._invalidate_listing(URL_CLIENTTEMPLATES.format(url=self.baseurl, realm=realm))
 
         try:
             return open_url(url, method='PUT', headers=self.restheaders,
@@ -646,6 +797,7 @@ class KeycloakAPI(object):
         :return: HTTPResponse object on success
         """
         url = URL_CLIENTTEMPLATES.format(url=self.baseurl, realm=realm)
+        self._invalidate_listing(URL_CLIENTTEMPLATES.format(url=self.baseurl, realm=realm))
 
         try:
             return open_url(url, method='POST', headers=self.restheaders,
@@ -662,6 +814,7 @@ class KeycloakAPI(object):
         :return: HTTPResponse object on success
         """
         url = URL_CLIENTTEMPLATE.format(url=self.baseurl, realm=realm, id=id)
+        self._invalidate_listing(URL_CLIENTTEMPLATES.format(url=self.baseurl, realm=realm))
 
         try:
             return open_url(url, method='DELETE', headers=self.restheaders,
@@ -681,8 +834,7 @@ class KeycloakAPI(object):
         """
         clientscopes_url = URL_CLIENTSCOPES.format(url=self.baseurl, realm=realm)
         try:
-            return json.loads(to_native(open_url(clientscopes_url, method="GET", headers=self.restheaders,
-                                                 validate_certs=self.validate_certs).read()))
+            return self._get_listing(clientscopes_url)[0]
         except Exception as e:
             self.module.fail_json(msg="Could not fetch list of clientscopes in realm %s: %s"
                                       % (realm, str(e)))
@@ -716,18 +868,17 @@ class KeycloakAPI(object):
 
         The Keycloak API does not allow filtering of the clientscopes resource by name.
         As a result, this method first retrieves the entire list of clientscopes - name and ID -
-        then performs a second query to fetch the group.
+        then performs a second query to fetch the group. The list is fetched once per module run.
 
         If the clientscope does not exist, None is returned.
         :param name: Name of the clientscope to fetch.
         :param realm: Realm in which the clientscope resides; default 'master'
         """
         try:
-            all_clientscopes = self.get_clientscopes(realm=realm)
-
-            for clientscope in all_clientscopes:
-                if clientscope['name'] == name:
-                    return self.get_clientscope_by_clientscopeid(clientscope['id'], realm=realm)
+            self.get_clientscopes(realm=realm)
+            clientscope = self._listings[URL_CLIENTSCOPES.format(url=self.baseurl, realm=realm)][1].get(name)
+            if clientscope is not None:
+                return self.get_clientscope_by_clientscopeid(clientscope['id'], realm=realm)
 
             return None
 
@@ -742,6 +893,7 @@ class KeycloakAPI(object):
         :return: HTTPResponse object on success
         """
         clientscopes_url = URL_CLIENTSCOPES.format(url=self.baseurl, realm=realm)
+        self._invalidate_listing(clientscopes_url)
         try:
             return open_url(clientscopes_url, method='POST', headers=self.restheaders,
                             data=json.dumps(clientscoperep), validate_certs=self.validate_certs)
@@ -756,6 +908,7 @@ class KeycloakAPI(object):
         :return HTTPResponse object on success
         """
         clientscope_url = URL_CLIENTSCOPE.format(url=self.baseurl, realm=realm, id=clientscoperep['id'])
+        self._invalidate_listing(URL_CLIENTSCOPES.format(url=self.baseurl, realm=realm))
 
         try:
             return open_url(clientscope_url, method='PUT', headers=self.restheaders,
@@ -784,10 +937,10 @@ class KeycloakAPI(object):
         # in the case that both are provided, prefer the ID, since it's one
         # less lookup.
         if cid is None and name is not None:
-            for clientscope in self.get_clientscopes(realm=realm):
-                if clientscope['name'] == name:
-                    cid = clientscope['id']
-                    break
+            self.get_clientscopes(realm=realm)
+            clientscope = self._listings[URL_CLIENTSCOPES.format(url=self.baseurl, realm=realm)][1].get(name)
+            if clientscope is not None:
+                cid = clientscope['id']
 
         # if the group doesn't exist - no problem, nothing to delete.
         if cid is None:
@@ -795,6 +948,7 @@ class KeycloakAPI(object):
 
         # should have a good cid by here.
         clientscope_url = URL_CLIENTSCOPE.format(realm=realm, id=cid, url=self.baseurl)
+        self._invalidate_listing(URL_CLIENTSCOPES.format(url=self.baseurl, realm=realm))
         try:
             return open_url(clientscope_url, method='DELETE', headers=self.restheaders,
                             validate_certs=self.validate_certs)
@@ -814,8 +968,7 @@ class KeycloakAPI(object):
         """
         protocolmappers_url = URL_CLIENTSCOPE_PROTOCOLMAPPERS.format(id=cid, url=self.baseurl, realm=realm)
         try:
-            return json.loads(to_native(open_url(protocolmappers_url, method="GET", headers=self.restheaders,
-                                                 validate_certs=self.validate_certs).read()))
+            return self._get_listing(protocolmappers_url)[0]
         except Exception as e:
             self.module.fail_json(msg="Could not fetch list of protocolmappers in realm %s: %s"
                                       % (realm, str(e)))
@@ -859,11 +1012,11 @@ class KeycloakAPI(object):
         :param realm: Realm in which the clientscope resides; default 'master'
         """
         try:
-            all_protocolmappers = self.get_clientscope_protocolmappers(cid, realm=realm)
-
-            for protocolmapper in all_protocolmappers:
-                if protocolmapper['name'] == name:
-                    return self.get_clientscope_protocolmapper_by_protocolmapperid(protocolmapper['id'], cid, realm=realm)
+            self.get_clientscope_protocolmappers(cid, realm=realm)
+            protocolmappers_url = URL_CLIENTSCOPE_PROTOCOLMAPPERS.format(id=cid, url=self.baseurl, realm=realm)
+            protocolmapper = self._listings[protocolmappers_url][1].get(name)
+            if protocolmapper is not None:
+                return self.get_clientscope_protocolmapper_by_protocolmapperid(protocolmapper['id'], cid, realm=realm)
 
             return None
 
@@ -879,6 +1032,7 @@ class KeycloakAPI(object):
         :return: HTTPResponse object on success
         """
         protocolmappers_url = URL_CLIENTSCOPE_PROTOCOLMAPPERS.format(url=self.baseurl, id=cid, realm=realm)
+        self._invalidate_listing(protocolmappers_url)
         try:
             return open_url(protocolmappers_url, method='POST', headers=self.restheaders,
                             data=json.dumps(mapper_rep), validate_certs=self.validate_certs)
@@ -894,6 +1048,7 @@ class KeycloakAPI(object):
         :return HTTPResponse object on success
         """
         protocolmapper_url = URL_CLIENTSCOPE_PROTOCOLMAPPER.format(url=self.baseurl, realm=realm, id=cid, mapper_id=mapper_rep['id'])
+        self._invalidate_listing(URL_CLIENTSCOPE_PROTOCOLMAPPERS.format(url=self.baseurl, id=cid, realm=realm))
 
         try:
             return open_url(protocolmapper_url, method='PUT', headers=self.restheaders,
@@ -913,8 +1068,7 @@ class KeycloakAPI(object):
         """
         groups_url = URL_GROUPS.format(url=self.baseurl, realm=realm)
         try:
-            return json.loads(to_native(open_url(groups_url, method="GET", headers=self.restheaders,
-                                                 validate_certs=self.validate_certs).read()))
+            return self._get_listing(groups_url)[0]
         except Exception as e:
             self.module.fail_json(msg="Could not fetch list of groups in realm %s: %s"
                                       % (realm, str(e)))
@@ -946,21 +1100,18 @@ class KeycloakAPI(object):
     def get_group_by_name(self, name, realm="master"):
         """ Fetch a keycloak group within a realm based on its name.
 
-        The Keycloak API does not allow filtering of the Groups resource by name.
-        As a result, this method first retrieves the entire list of groups - name and ID -
+        The Keycloak API does not allow filtering of the Groups resource by exact name.
+        As a result, this method first searches the groups for the name - name and ID -
         then performs a second query to fetch the group.
 
         If the group does not exist, None is returned.
         :param name: Name of the group to fetch.
         :param realm: Realm in which the group resides; default 'master'
         """
-        groups_url = URL_GROUPS.format(url=self.baseurl, realm=realm)
         try:
-            all_groups = self.get_groups(realm=realm)
-
-            for group in all_groups:
-                if group['name'] == name:
-                    return self.get_group_by_groupid(group['id'], realm=realm)
+            group = self._search_group(name, realm)
+            if group is not None:
+                return self.get_group_by_groupid(group['id'], realm=realm)
 
             return None
 
@@ -975,6 +1126,7 @@ class KeycloakAPI(object):
         :return: HTTPResponse object on success
         """
         groups_url = URL_GROUPS.format(url=self.baseurl, realm=realm)
+        self._invalidate_listing(groups_url)
         try:
             return open_url(groups_url, method='POST', headers=self.restheaders,
                             data=json.dumps(grouprep), validate_certs=self.validate_certs)
@@ -989,6 +1141,7 @@ class KeycloakAPI(object):
         :return HTTPResponse object on success
         """
         group_url = URL_GROUP.format(url=self.baseurl, realm=realm, groupid=grouprep['id'])
+        self._invalidate_listing(URL_GROUPS.format(url=self.baseurl, realm=realm))
 
         try:
             return open_url(group_url, method='PUT', headers=self.restheaders,
@@ -1016,10 +1169,13 @@ class KeycloakAPI(object):
         # in the case that both are provided, prefer the ID, since it's one
         # less lookup.
         if groupid is None and name is not None:
-            for group in self.get_groups(realm=realm):
-                if group['name'] == name:
-                    groupid = group['id']
-                    break
+            try:
+                group = self._search_group(name, realm)
+            except Exception as e:
+                self.module.fail_json(msg="Could not fetch group %s in realm %s: %s"
+                                          % (name, realm, str(e)))
+            if group is not None:
+                groupid = group['id']
 
         # if the group doesn't exist - no problem, nothing to delete.
         if groupid is None:
@@ -1027,6 +1183,7 @@ class KeycloakAPI(object):
 
         # should have a good groupid by here.
         group_url = URL_GROUP.format(realm=realm, groupid=groupid, url=self.baseurl)
+        self._invalidate_listing(URL_GROUPS.format(url=self.baseurl, realm=realm))
         try:
             return open_url(group_url, method='DELETE', headers=self.restheaders,
                             validate_certs=self.validate_certs)
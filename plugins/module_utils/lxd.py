@@ -75,9 +75,9 @@ class LXDClient(object):
         else:
             raise LXDClientException('URL scheme must be unix: or https:')
 
-    def do(self, method, url, body_json=None, ok_error_codes=None, timeout=None):
+    def do(self, method, url, body_json=None, ok_error_codes=None, timeout=None, wait_for_operation=True):
         resp_json = self._send_request(method, url, body_json=body_json, ok_error_codes=ok_error_codes, timeout=timeout)
-        if resp_json['type'] == 'async':
+        if resp_json['type'] == 'async' and wait_for_operation:
             url = '{0}/wait'.format(resp_json['operation'])
             resp_json = self._send_request('GET', url)
             if resp_json['metadata']['status'] != 'Success':
@@ -88,6 +88,18 @@ class LXDClient(object):
         body_json = {'type': 'client', 'password': trust_password}
         return self._send_request('POST', '/1.0/certificates', body_json=body_json)
 
+    def request(self, method, url, body=None, headers=None):
+        """Send a request with a raw body, like the file API uses.
+
+        The response is returned unread, so large files can be streamed. It must be read
+        completely before the next request is sent over the same connection.
+        """
+        try:
+            self.connection.request(method, url, body=body, headers=headers or {})
+            return self.connection.getresponse()
+        except socket.error as e:
+            raise LXDClientException('cannot connect to the LXD server', err=e)
+
     def _send_request(self, method, url, body_json=None, ok_error_codes=None, timeout=None):
         try:
             body = json.dumps(body_json)
@@ -5,13 +5,21 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
+import base64
 import json
+import socket
+import ssl
+import threading
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
 from ansible.module_utils.urls import open_url
+from ansible.module_utils.common.text.converters import to_bytes
 from ansible.module_utils.common.text.converters import to_native
 from ansible.module_utils.common.text.converters import to_text
 from ansible.module_utils.six.moves import http_client
 from ansible.module_utils.six.moves.urllib.error import URLError, HTTPError
 from ansible.module_utils.six.moves.urllib.parse import urlparse
+from ansible.module_utils.six.moves.urllib.request import getproxies, proxy_bypass
 
 GET_HEADERS = {'accept': 'application/json', 'OData-Version': '4.0'}
 POST_HEADERS = {'content-type': 'application/json', 'accept': 'application/json',
@@ -20,12 +28,119 @@ PATCH_HEADERS = {'content-type': 'application/json', 'accept': 'application/json
                  'OData-Version': '4.0'}
 DELETE_HEADERS = {'accept': 'application/json', 'OData-Version': '4.0'}
 
+# number of threads used to GET the members of a collection
+MAX_WORKERS = 4
+
 FAIL_MSG = 'Issuing a data modification command without specifying the '\
            'ID of the target %(resource)s resource when there is more '\
            'than one %(resource)s is no longer allowed. Use the `resource_id` '\
            'option to specify the target %(resource)s ID.'
 
 
+class KeepAliveSession(object):
+    """
+    Sends GET requests over persistent HTTP(S) connections, one per thread,
+    instead of opening a new connection (and TLS handshake) for every request.
+    Every connection is recorded so that close() can close the connections of
+    threads that have ended.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._ssl_context = None
+
+    @staticmethod
+    def usable(uri):
+        """ requests that go through a proxy are left to open_url """
+        parsed = urlparse(uri)
+        if parsed.scheme not in ('http', 'https'):
+            return False
+        return parsed.scheme not in getproxies() or proxy_bypass(parsed.hostname)
+
+    def _connection(self, parsed):
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        key = (parsed.scheme, parsed.netloc)
+        if key not in connections:
+            if parsed.scheme == 'https':
+                conn = http_client.HTTPSConnection(parsed.netloc, timeout=self.timeout,
+                                                   context=self._unverified_context())
+            else:
+                conn = http_client.HTTPConnection(parsed.netloc, timeout=self.timeout)
+            conn.reused = False
+            conn.owner = threading.current_thread()
+            connections[key] = conn
+            with self._lock:
+                self._connections.append(conn)
+        return connections[key]
+
+    def _unverified_context(self):
+        # same as validate_certs=False for open_url
+        if self._ssl_context is None:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            self._ssl_context = context
+        return self._ssl_context
+
+    def _drop(self, parsed):
+        conn = self._local.connections.pop((parsed.scheme, parsed.netloc))
+        with self._lock:
+            self._connections.remove(conn)
+        conn.close()
+
+    def close(self, keep_current=False):
+        """
+        Close the connections of all threads, or with keep_current those of
+        every thread but the calling one.
+        """
+        current = threading.current_thread()
+        with self._lock:
+            closing = [conn for conn in self._connections if not keep_current or conn.owner is not current]
+            self._connections = [conn for conn in self._connections if conn not in closing]
+            if not keep_current:
+                self._local = threading.local()
+        for conn in closing:
+            conn.close()
+
+    def get(self, uri, headers):
+        """
+        GET uri and return the response and its body, raise HTTPError and
+        URLError like open_url. Redirects return None to be handled by open_url.
+        """
+        parsed = urlparse(uri)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        while True:
+            conn = self._connection(parsed)
+            try:
+                conn.request('GET', path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (http_client.HTTPException, socket.error) as e:
+                reused = conn.reused
+                self._drop(parsed)
+                # the server may have closed an idle connection, retry once on a new one
+                if reused and not isinstance(e, socket.timeout):
+                    continue
+                raise URLError(e)
+            break
+        if resp.will_close:
+            self._drop(parsed)
+        else:
+            conn.reused = True
+        if 300 <= resp.status < 400:
+            return None
+        if resp.status >= 400:
+            raise HTTPError(uri, resp.status, resp.reason, resp.msg, BytesIO(body))
+        return resp, body
+
+
 class RedfishUtils(object):
 
     def __init__(self, creds, root_uri, timeout, module, resource_id=None,
@@ -38,6 +153,11 @@ class RedfishUtils(object):
         self.resource_id = resource_id
         self.data_modification = data_modification
         self.strip_etag_quotes = strip_etag_quotes
+        self.workers = MAX_WORKERS
+        # GET responses by URI, cleared by every POST, PATCH and DELETE request
+        self._cache = {}
+        self._http_session = KeepAliveSession(timeout)
+        self._query_support = None
         self._init_session()
 
     def _auth_params(self, headers):
@@ -60,18 +180,34 @@ class RedfishUtils(object):
             force_basic_auth = True
         return username, password, force_basic_auth
 
-    # The following functions are to send GET/POST/PATCH/DELETE requests
-    def get_request(self, uri):
+    def _get(self, uri):
         req_headers = dict(GET_HEADERS)
         username, password, basic_auth = self._auth_params(req_headers)
+        if KeepAliveSession.usable(uri):
+            if basic_auth:
+                credentials = to_bytes('%s:%s' % (username, password), errors='surrogate_or_strict')
+                req_headers['Authorization'] = 'Basic %s' % to_native(base64.b64encode(credentials))
+            response = self._http_session.get(uri, req_headers)
+            if response is not None:
+                resp, body = response
+                return body, dict((k.lower(), v) for (k, v) in resp.getheaders())
+            # redirected, let open_url follow it
+            req_headers.pop('Authorization', None)
+        resp = open_url(uri, method="GET", headers=req_headers,
+                        url_username=username, url_password=password,
+                        force_basic_auth=basic_auth, validate_certs=False,
+                        follow_redirects='all',
+                        use_proxy=True, timeout=self.timeout)
+        return resp.read(), dict((k.lower(), v) for (k, v) in resp.info().items())
+
+    # The following functions are to send GET/POST/PATCH/DELETE requests
+    def get_request(self, uri, use_cache=True):
         try:
-            resp = open_url(uri, method="GET", headers=req_headers,
-                            url_username=username, url_password=password,
-                            force_basic_auth=basic_auth, validate_certs=False,
-                            follow_redirects='all',
-                            use_proxy=True, timeout=self.timeout)
-            data = json.loads(to_native(resp.read()))
-            headers = dict((k.lower(), v) for (k, v) in resp.info().items())
+            if use_cache and uri in self._cache:
+                body, headers = self._cache[uri]
+            else:
+                body, headers = self._get(uri)
+            data = json.loads(to_native(body))
         except HTTPError as e:
             msg = self._get_extended_message(e)
             return {'ret': False,
@@ -85,9 +221,83 @@ class RedfishUtils(object):
         except Exception as e:
             return {'ret': False,
                     'msg': "Failed GET request to '%s': '%s'" % (uri, to_text(e))}
+        # the body is cached instead of data, every caller gets its own copy
+        self._cache[uri] = (body, headers)
         return {'ret': True, 'data': data, 'headers': headers}
 
+    def get_requests(self, uris):
+        """
+        GET all uris, in parallel if more than one of them is not cached yet.
+        :param uris: list of URIs
+        :return: list of the responses, in the same order as uris
+        """
+        missing = []
+        for uri in uris:
+            if uri not in self._cache and uri not in missing:
+                missing.append(uri)
+        responses = {}
+        if len(missing) > 1 and self.workers > 1:
+            pool = ThreadPool(min(self.workers, len(missing)))
+            try:
+                responses = dict(zip(missing, pool.map(self.get_request, missing)))
+            finally:
+                pool.close()
+                pool.join()
+                # the worker threads have ended, their connections cannot be reused
+                self._http_session.close(keep_current=True)
+        return [responses[uri] if uri in responses else self.get_request(uri) for uri in uris]
+
+    def _get_query_support(self):
+        """
+        Find out from the service root if the service supports $expand of
+        the subordinate resources and $select.
+        :return: tuple of booleans expand and select
+        """
+        if self._query_support is None:
+            expand = select = False
+            response = self.get_request(self.root_uri + self.service_root)
+            if response['ret']:
+                features = response['data'].get('ProtocolFeaturesSupported') or {}
+                expand_query = features.get('ExpandQuery') or {}
+                expand = bool(expand_query.get('NoLinks') and expand_query.get('Levels'))
+                select = bool(features.get('SelectQuery'))
+            self._query_support = (expand, select)
+        return self._query_support
+
+    def get_collection_request(self, uri, properties=None):
+        """
+        GET a collection with its members expanded when the service supports
+        $expand, limited to properties when it also supports $select. Use
+        get_member_requests() to get the members of the returned collection.
+        :param uri: URI of the collection
+        :param properties: list of the member properties that are needed
+        :return: the response of the collection
+        """
+        expand, select = self._get_query_support()
+        if expand:
+            query = '$expand=.($levels=1)'
+            if select and properties:
+                query += '&$select=%s' % ','.join(properties)
+            response = self.get_request(uri + ('&' if '?' in uri else '?') + query)
+            # fall back to the plain collection if the service fails the query
+            if response['ret'] and isinstance(response['data'].get('Members'), list):
+                return response
+        return self.get_request(uri)
+
+    def get_member_requests(self, members):
+        """
+        Get the members of a collection, members expanded by
+        get_collection_request() do not need another request.
+        :param members: the Members of a collection
+        :return: list of the responses of the members
+        """
+        uris = [self.root_uri + m[u'@odata.id'] for m in members if len(m) == 1]
+        responses = dict(zip(uris, self.get_requests(uris)))
+        return [responses[self.root_uri + m[u'@odata.id']] if len(m) == 1 else {'ret': True, 'data': m, 'headers': {}}
+                for m in members]
+
     def post_request(self, uri, pyld):
+        self._cache.clear()
         req_headers = dict(POST_HEADERS)
         username, password, basic_auth = self._auth_params(req_headers)
         try:
@@ -115,7 +325,7 @@ class RedfishUtils(object):
 
     def patch_request(self, uri, pyld):
         req_headers = dict(PATCH_HEADERS)
-        r = self.get_request(uri)
+        r = self.get_request(uri, use_cache=False)
         if r['ret']:
             # Get etag from etag header or @odata.etag property
             etag = r['headers'].get('etag')
@@ -125,6 +335,7 @@ class RedfishUtils(object):
                 if self.strip_etag_quotes:
                     etag = etag.strip('"')
                 req_headers['If-Match'] = etag
+        self._cache.clear()
         username, password, basic_auth = self._auth_params(req_headers)
         try:
             resp = open_url(uri, data=json.dumps(pyld),
@@ -149,6 +360,7 @@ class RedfishUtils(object):
         return {'ret': True, 'resp': resp}
 
     def delete_request(self, uri, pyld=None):
+        self._cache.clear()
         req_headers = dict(DELETE_HEADERS)
         username, password, basic_auth = self._auth_params(req_headers)
         try:
@@ -196,6 +408,10 @@ class RedfishUtils(object):
     def _init_session(self):
         pass
 
+    def close(self):
+        """ close the connections kept open for GET requests """
+        self._http_session.close()
+
     def _find_accountservice_resource(self):
         response = self.get_request(self.root_uri + self.service_root)
         if response['ret'] is False:
@@ -506,7 +722,7 @@ class RedfishUtils(object):
 
         # Get a list of all storage controllers and build respective URIs
         storage_uri = data['Storage']["@odata.id"]
-        response = self.get_request(self.root_uri + storage_uri)
+        response = self.get_collection_request(self.root_uri + storage_uri, [key])
         if response['ret'] is False:
             return response
         result['ret'] = True
@@ -515,9 +731,7 @@ class RedfishUtils(object):
         # Loop through Members and their StorageControllers
         # and gather properties from each StorageController
         if data[u'Members']:
-            for storage_member in data[u'Members']:
-                storage_member_uri = storage_member[u'@odata.id']
-                response = self.get_request(self.root_uri + storage_member_uri)
+            for response in self.get_member_requests(data[u'Members']):
                 data = response['data']
 
                 if key in data:
@@ -538,7 +752,6 @@ class RedfishUtils(object):
 
     def get_disk_inventory(self, systems_uri):
         result = {'entries': []}
-        controller_list = []
         # Get these entries, but does not fail if not found
         properties = ['BlockSizeBytes', 'CapableSpeedGbs', 'CapacityBytes',
                       'EncryptionAbility', 'EncryptionStatus',
@@ -560,18 +773,15 @@ class RedfishUtils(object):
         if 'Storage' in data:
             # Get a list of all storage controllers and build respective URIs
             storage_uri = data[u'Storage'][u'@odata.id']
-            response = self.get_request(self.root_uri + storage_uri)
+            response = self.get_collection_request(self.root_uri + storage_uri,
+                                                   ['StorageControllers', 'Drives'])
             if response['ret'] is False:
                 return response
             result['ret'] = True
             data = response['data']
 
             if data[u'Members']:
-                for controller in data[u'Members']:
-                    controller_list.append(controller[u'@odata.id'])
-                for c in controller_list:
-                    uri = self.root_uri + c
-                    response = self.get_request(uri)
+                for response in self.get_member_requests(data[u'Members']):
                     if response['ret'] is False:
                         return response
                     data = response['data']
@@ -586,9 +796,8 @@ class RedfishUtils(object):
                                 controller_name = 'Controller %s' % sc_id
                     drive_results = []
                     if 'Drives' in data:
-                        for device in data[u'Drives']:
-                            disk_uri = self.root_uri + device[u'@odata.id']
-                            response = self.get_request(disk_uri)
+                        disk_uris = [self.root_uri + device[u'@odata.id'] for device in data[u'Drives']]
+                        for response in self.get_requests(disk_uris):
                             data = response['data']
 
                             drive_result = {}
@@ -604,18 +813,14 @@ class RedfishUtils(object):
         if 'SimpleStorage' in data:
             # Get a list of all storage controllers and build respective URIs
             storage_uri = data["SimpleStorage"]["@odata.id"]
-            response = self.get_request(self.root_uri + storage_uri)
+            response = self.get_collection_request(self.root_uri + storage_uri,
+                                                   ['Name', 'Id', 'Devices'])
             if response['ret'] is False:
                 return response
             result['ret'] = True
             data = response['data']
 
-            for controller in data[u'Members']:
-                controller_list.append(controller[u'@odata.id'])
-
-            for c in controller_list:
-                uri = self.root_uri + c
-                response = self.get_request(uri)
+            for response in self.get_member_requests(data[u'Members']):
                 if response['ret'] is False:
                     return response
                 data = response['data']
@@ -642,8 +847,6 @@ class RedfishUtils(object):
 
     def get_volume_inventory(self, systems_uri):
         result = {'entries': []}
-        controller_list = []
-        volume_list = []
         # Get these entries, but does not fail if not found
         properties = ['Id', 'Name', 'RAIDType', 'VolumeType', 'BlockSizeBytes',
                       'Capacity', 'CapacityBytes', 'CapacitySources',
@@ -664,18 +867,15 @@ class RedfishUtils(object):
         if 'Storage' in data:
             # Get a list of all storage controllers and build respective URIs
             storage_uri = data[u'Storage'][u'@odata.id']
-            response = self.get_request(self.root_uri + storage_uri)
+            response = self.get_collection_request(self.root_uri + storage_uri,
+                                                   ['StorageControllers', 'Volumes'])
             if response['ret'] is False:
                 return response
             result['ret'] = True
             data = response['data']
 
             if data.get('Members'):
-                for controller in data[u'Members']:
-                    controller_list.append(controller[u'@odata.id'])
-                for c in controller_list:
-                    uri = self.root_uri + c
-                    response = self.get_request(uri)
+                for response in self.get_member_requests(data[u'Members']):
                     if response['ret'] is False:
                         return response
                     data = response['data']
@@ -692,15 +892,12 @@ class RedfishUtils(object):
                     if 'Volumes' in data:
                         # Get a list of all volumes and build respective URIs
                         volumes_uri = data[u'Volumes'][u'@odata.id']
-                        response = self.get_request(self.root_uri + volumes_uri)
+                        response = self.get_collection_request(self.root_uri + volumes_uri,
+                                                               properties + ['Links'])
                         data = response['data']
 
                         if data.get('Members'):
-                            for volume in data[u'Members']:
-                                volume_list.append(volume[u'@odata.id'])
-                            for v in volume_list:
-                                uri = self.root_uri + v
-                                response = self.get_request(uri)
+                            for response in self.get_member_requests(data[u'Members']):
                                 if response['ret'] is False:
                                     return response
                                 data = response['data']
@@ -1928,7 +2125,6 @@ class RedfishUtils(object):
 
     def get_cpu_inventory(self, systems_uri):
         result = {}
-        cpu_list = []
         cpu_results = []
         key = "Processors"
         # Get these entries, but does not fail if not found
@@ -1948,19 +2144,14 @@ class RedfishUtils(object):
         processors_uri = data[key]["@odata.id"]
 
         # Get a list of all CPUs and build respective URIs
-        response = self.get_request(self.root_uri + processors_uri)
+        response = self.get_collection_request(self.root_uri + processors_uri, properties)
         if response['ret'] is False:
             return response
         result['ret'] = True
         data = response['data']
 
-        for cpu in data[u'Members']:
-            cpu_list.append(cpu[u'@odata.id'])
-
-        for c in cpu_list:
+        for response in self.get_member_requests(data[u'Members']):
             cpu = {}
-            uri = self.root_uri + c
-            response = self.get_request(uri)
             if response['ret'] is False:
                 return response
             data = response['data']
@@ -1978,7 +2169,6 @@ class RedfishUtils(object):
 
     def get_memory_inventory(self, systems_uri):
         result = {}
-        memory_list = []
         memory_results = []
         key = "Memory"
         # Get these entries, but does not fail if not found
@@ -1998,19 +2188,14 @@ class RedfishUtils(object):
         memory_uri = data[key]["@odata.id"]
 
         # Get a list of all DIMMs and build respective URIs
-        response = self.get_request(self.root_uri + memory_uri)
+        response = self.get_collection_request(self.root_uri + memory_uri, properties)
         if response['ret'] is False:
             return response
         result['ret'] = True
         data = response['data']
 
-        for dimm in data[u'Members']:
-            memory_list.append(dimm[u'@odata.id'])
-
-        for m in memory_list:
+        for response in self.get_member_requests(data[u'Members']):
             dimm = {}
-            uri = self.root_uri + m
-            response = self.get_request(uri)
             if response['ret'] is False:
                 return response
             data = response['data']
@@ -2033,16 +2218,17 @@ class RedfishUtils(object):
     def get_multi_memory_inventory(self):
         return self.aggregate_systems(self.get_memory_inventory)
 
-    def get_nic(self, resource_uri):
+    def get_nic(self, resource_uri, data=None):
         result = {}
         properties = ['Name', 'Id', 'Description', 'FQDN', 'IPv4Addresses', 'IPv6Addresses',
                       'NameServers', 'MACAddress', 'PermanentMACAddress',
                       'SpeedMbps', 'MTUSize', 'AutoNeg', 'Status']
-        response = self.get_request(self.root_uri + resource_uri)
-        if response['ret'] is False:
-            return response
+        if data is None:
+            response = self.get_request(self.root_uri + resource_uri)
+            if response['ret'] is False:
+                return response
+            data = response['data']
         result['ret'] = True
-        data = response['data']
         nic = {}
         for property in properties:
             if property in data:
@@ -2052,7 +2238,6 @@ class RedfishUtils(object):
 
     def get_nic_inventory(self, resource_uri):
         result = {}
-        nic_list = []
         nic_results = []
         key = "EthernetInterfaces"
 
@@ -2068,17 +2253,16 @@ class RedfishUtils(object):
         ethernetinterfaces_uri = data[key]["@odata.id"]
 
         # Get a list of all network controllers and build respective URIs
-        response = self.get_request(self.root_uri + ethernetinterfaces_uri)
+        response = self.get_collection_request(self.root_uri + ethernetinterfaces_uri)
         if response['ret'] is False:
             return response
         result['ret'] = True
         data = response['data']
 
-        for nic in data[u'Members']:
-            nic_list.append(nic[u'@odata.id'])
-
-        for n in nic_list:
-            nic = self.get_nic(n)
+        for response in self.get_member_requests(data[u'Members']):
+            if response['ret'] is False:
+                continue
+            nic = self.get_nic(None, response['data'])
             if nic['ret']:
                 nic_results.append(nic['entries'])
         result["entries"] = nic_results
@@ -2603,9 +2787,9 @@ class RedfishUtils(object):
                 return
 
         if 'Members' in d:  # collections case
-            for m in d.get('Members'):
-                u = m.get('@odata.id')
-                r = self.get_request(self.root_uri + u)
+            members = [m.get('@odata.id') for m in d.get('Members')]
+            responses = self.get_requests([self.root_uri + u for u in members])
+            for u, r in zip(members, responses):
                 if r.get('ret'):
                     p = r.get('data')
                     if p:
@@ -2635,9 +2819,8 @@ class RedfishUtils(object):
                     uri = sub.get('@odata.id')
                     self.get_health_resource(subsystem, uri, health, None)
         elif 'Members' in data:
-            for m in data.get('Members'):
-                u = m.get('@odata.id')
-                r = self.get_request(self.root_uri + u)
+            members = [self.root_uri + m.get('@odata.id') for m in data.get('Members')]
+            for r in self.get_requests(members):
                 if r.get('ret'):
                     d = r.get('data')
                     self.get_health_subsystem(subsystem, d, health)
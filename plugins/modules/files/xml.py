@@ -134,6 +134,64 @@ options:
       - This parameter requires C(xpath) to be set.
     type: bool
     default: no
+  operations:
+    description:
+      - A list of operations that are applied in order to the same document, which is parsed and written only once.
+      - Every operation selects the item(s) with its own I(xpath) and sets a value or attribute,
+        adds or sets children, ensures the item(s) exist or removes them, like the options of the same name.
+      - The diff and the C(changed) state cover the result of all operations together.
+      - Mutually exclusive with I(xpath), I(value), I(add_children), I(set_children), I(content), I(count) and I(print_match).
+      - I(state), I(attribute), I(input_type), I(insertbefore) and I(insertafter) cannot be set together with this option,
+        set them on the operations instead.
+    type: list
+    elements: dict
+    suboptions:
+      xpath:
+        description:
+          - A valid XPath expression describing the item(s) to manipulate.
+        type: str
+        required: true
+      state:
+        description:
+          - Set or remove the I(xpath) selection.
+        type: str
+        choices: [ absent, present ]
+        default: present
+      attribute:
+        description:
+          - The attribute to select when using I(value).
+        type: raw
+      value:
+        description:
+          - Desired state of the selected element or attribute, see the I(value) option.
+        type: raw
+      add_children:
+        description:
+          - Child element(s) to add to the selected element, see the I(add_children) option.
+        type: list
+        elements: raw
+      set_children:
+        description:
+          - Child element(s) to set on the selected element, see the I(set_children) option.
+        type: list
+        elements: raw
+      input_type:
+        description:
+          - Type of input for I(add_children) and I(set_children).
+        type: str
+        choices: [ xml, yaml ]
+        default: yaml
+      insertbefore:
+        description:
+          - Add the I(add_children) before the first selected element.
+        type: bool
+        default: no
+      insertafter:
+        description:
+          - Add the I(add_children) after the last selected element.
+        type: bool
+        default: no
+    version_added: 4.4.0
 requirements:
 - lxml >= 2.3.0
 notes:
@@ -318,11 +376,28 @@ EXAMPLES = r'''
     path: bar.xml
     xpath: /config/element[@name='test1']
     state: absent
+
+- name: Apply several changes to the 'business' document at once
+  community.general.xml:
+    path: /foo/bar.xml
+    operations:
+      - xpath: /business/rating
+        value: '11'
+      - xpath: /business/rating/@subjective
+        state: absent
+      - xpath: /business/beers
+        add_children:
+          - beer: Old Rasputin
+      - xpath: /business/website/validxhtml
+        attribute: validatedon
+        value: '1976-08-05'
 '''
 
 RETURN = r'''
 actions:
-    description: A dictionary with the original xpath, namespaces and state.
+    description:
+    - A dictionary with the original xpath, namespaces and state.
+    - With I(operations), a dictionary with the namespaces and the list of the xpath and state of the operations.
     type: dict
     returned: success
     sample: {xpath: xpath, namespaces: [namespace1, namespace2], state=present}
@@ -387,6 +462,21 @@ _RE_SPLITSUBLAST = re.compile("^(.*)/(" + _NSIDENT + ")\\[(.*)\\]$")
 _RE_SPLITONLYEQVALUE = re.compile("^(.*)/text\\(\\)=" + _XPSTR + "$")
 
 
+_XPATH_CACHE = {}
+
+
+def compile_xpath(xpath, namespaces):
+    """ Return the precompiled XPath expression, every expression is compiled once per module run """
+    key = (xpath, tuple(sorted(iteritems(namespaces or {}))))
+    if key not in _XPATH_CACHE:
+        _XPATH_CACHE[key] = etree.XPath(xpath, namespaces=namespaces)
+    return _XPATH_CACHE[key]
+
+
+def evaluate_xpath(tree, xpath, namespaces):
+    return compile_xpath(xpath, namespaces)(tree)
+
+
 def has_changed(doc):
     orig_obj = etree.tostring(objectify.fromstring(etree.tostring(orig_doc)))
     obj = etree.tostring(objectify.fromstring(etree.tostring(doc)))
@@ -394,7 +484,7 @@ def has_changed(doc):
 
 
 def do_print_match(module, tree, xpath, namespaces):
-    match = tree.xpath(xpath, namespaces=namespaces)
+    match = evaluate_xpath(tree, xpath, namespaces)
     match_xpaths = []
     for m in match:
         match_xpaths.append(tree.getpath(m))
@@ -405,7 +495,7 @@ def do_print_match(module, tree, xpath, namespaces):
 
 def count_nodes(module, tree, xpath, namespaces):
     """ Return the count of nodes matching the xpath """
-    hits = tree.xpath("count(/%s)" % xpath, namespaces=namespaces)
+    hits = evaluate_xpath(tree, "count(/%s)" % xpath, namespaces)
     msg = "found %d nodes" % hits
     finish(module, tree, xpath, namespaces, changed=False, msg=msg, hitcount=int(hits))
 
@@ -416,7 +506,7 @@ def is_node(tree, xpath, namespaces):
     For now we just assume you're only searching for one specific thing."""
     if xpath_matches(tree, xpath, namespaces):
         # OK, it found something
-        match = tree.xpath(xpath, namespaces=namespaces)
+        match = evaluate_xpath(tree, xpath, namespaces)
         if isinstance(match[0], etree._Element):
             return True
 
@@ -428,7 +518,7 @@ def is_attribute(tree, xpath, namespaces):
 
     An xpath attribute search will only match one item"""
     if xpath_matches(tree, xpath, namespaces):
-        match = tree.xpath(xpath, namespaces=namespaces)
+        match = evaluate_xpath(tree, xpath, namespaces)
         if isinstance(match[0], etree._ElementStringResult):
             return True
         elif isinstance(match[0], etree._ElementUnicodeResult):
@@ -438,16 +528,16 @@ def is_attribute(tree, xpath, namespaces):
 
 def xpath_matches(tree, xpath, namespaces):
     """ Test if a node exists """
-    if tree.xpath(xpath, namespaces=namespaces):
+    if evaluate_xpath(tree, xpath, namespaces):
         return True
     return False
 
 
-def delete_xpath_target(module, tree, xpath, namespaces):
+def delete_xpath_target_inner(module, tree, xpath, namespaces):
     """ Delete an attribute or element from a tree """
     changed = False
     try:
-        for result in tree.xpath(xpath, namespaces=namespaces):
+        for result in evaluate_xpath(tree, xpath, namespaces):
             changed = True
             # Get the xpath for this result
             if is_attribute(tree, xpath, namespaces):
@@ -464,8 +554,12 @@ def delete_xpath_target(module, tree, xpath, namespaces):
                 raise Exception("Impossible error")
     except Exception as e:
         module.fail_json(msg="Couldn't delete xpath target: %s (%s)" % (xpath, e))
-    else:
-        finish(module, tree, xpath, namespaces, changed=changed)
+    return changed
+
+
+def delete_xpath_target(module, tree, xpath, namespaces):
+    changed = delete_xpath_target_inner(module, tree, xpath, namespaces)
+    finish(module, tree, xpath, namespaces, changed=changed)
 
 
 def replace_children_of(children, match):
@@ -475,7 +569,7 @@ def replace_children_of(children, match):
 
 
 def set_target_children_inner(module, tree, xpath, namespaces, children, in_type):
-    matches = tree.xpath(xpath, namespaces=namespaces)
+    matches = evaluate_xpath(tree, xpath, namespaces)
 
     # Create a list of our new children
     children = children_to_nodes(module, children, in_type)
@@ -505,17 +599,21 @@ def set_target_children(module, tree, xpath, namespaces, children, in_type):
     finish(module, tree, xpath, namespaces, changed=changed)
 
 
-def add_target_children(module, tree, xpath, namespaces, children, in_type, insertbefore, insertafter):
+def add_target_children_inner(module, tree, xpath, namespaces, children, in_type, insertbefore, insertafter):
     if is_node(tree, xpath, namespaces):
         new_kids = children_to_nodes(module, children, in_type)
         if insertbefore or insertafter:
             insert_target_children(tree, xpath, namespaces, new_kids, insertbefore, insertafter)
         else:
-            for node in tree.xpath(xpath, namespaces=namespaces):
+            for node in evaluate_xpath(tree, xpath, namespaces):
                 node.extend(new_kids)
-        finish(module, tree, xpath, namespaces, changed=True)
-    else:
-        finish(module, tree, xpath, namespaces)
+        return True
+    return False
+
+
+def add_target_children(module, tree, xpath, namespaces, children, in_type, insertbefore, insertafter):
+    changed = add_target_children_inner(module, tree, xpath, namespaces, children, in_type, insertbefore, insertafter)
+    finish(module, tree, xpath, namespaces, changed=changed)
 
 
 def insert_target_children(tree, xpath, namespaces, children, insertbefore, insertafter):
@@ -523,7 +621,7 @@ def insert_target_children(tree, xpath, namespaces, children, insertbefore, inse
     Insert the given children before or after the given xpath. If insertbefore is True, it is inserted before the
     first xpath hit, with insertafter, it is inserted after the last xpath hit.
     """
-    insert_target = tree.xpath(xpath, namespaces=namespaces)
+    insert_target = evaluate_xpath(tree, xpath, namespaces)
     loc_index = 0 if insertbefore else -1
     index_in_parent = insert_target[loc_index].getparent().index(insert_target[loc_index])
     parent = insert_target[0].getparent()
@@ -603,14 +701,14 @@ def check_or_make_target(module, tree, xpath, namespaces):
                     for nk in new_kids:
                         nk.text = eoa_value
 
-                for node in tree.xpath(inner_xpath, namespaces=namespaces):
+                for node in evaluate_xpath(tree, inner_xpath, namespaces):
                     node.extend(new_kids)
                     changed = True
                 # module.fail_json(msg="now tree=%s" % etree.tostring(tree, pretty_print=True))
             elif eoa and eoa[0] == '/':
                 element = eoa[1:]
                 new_kids = children_to_nodes(module, [nsnameToClark(element, namespaces)], "yaml")
-                for node in tree.xpath(inner_xpath, namespaces=namespaces):
+                for node in evaluate_xpath(tree, inner_xpath, namespaces):
                     node.extend(new_kids)
                     for nk in new_kids:
                         for subexpr in eoa_value:
@@ -621,7 +719,7 @@ def check_or_make_target(module, tree, xpath, namespaces):
 
                 # module.fail_json(msg="now tree=%s" % etree.tostring(tree, pretty_print=True))
             elif eoa == "":
-                for node in tree.xpath(inner_xpath, namespaces=namespaces):
+                for node in evaluate_xpath(tree, inner_xpath, namespaces):
                     if (node.text != eoa_value):
                         node.text = eoa_value
                         changed = True
@@ -629,7 +727,7 @@ def check_or_make_target(module, tree, xpath, namespaces):
             elif eoa and eoa[0] == '@':
                 attribute = nsnameToClark(eoa[1:], namespaces)
 
-                for element in tree.xpath(inner_xpath, namespaces=namespaces):
+                for element in evaluate_xpath(tree, inner_xpath, namespaces):
                     changing = (attribute not in element.attrib or element.attrib[attribute] != eoa_value)
 
                     if changing:
@@ -649,15 +747,40 @@ def check_or_make_target(module, tree, xpath, namespaces):
     return changed
 
 
-def ensure_xpath_exists(module, tree, xpath, namespaces):
+def ensure_xpath_exists_inner(module, tree, xpath, namespaces):
     changed = False
 
     if not is_node(tree, xpath, namespaces):
         changed = check_or_make_target(module, tree, xpath, namespaces)
 
+    return changed
+
+
+def ensure_xpath_exists(module, tree, xpath, namespaces):
+    changed = ensure_xpath_exists_inner(module, tree, xpath, namespaces)
     finish(module, tree, xpath, namespaces, changed)
 
 
+def apply_operations(module, tree, operations, namespaces):
+    """ Apply all operations to one tree, and write the result once """
+    changed = False
+    for operation in operations:
+        xpath = operation['xpath']
+        if operation['state'] == 'absent':
+            changed |= delete_xpath_target_inner(module, tree, xpath, namespaces)
+        elif operation['set_children']:
+            changed |= set_target_children_inner(module, tree, xpath, namespaces, operation['set_children'], operation['input_type'])
+        elif operation['add_children']:
+            changed |= add_target_children_inner(module, tree, xpath, namespaces, operation['add_children'], operation['input_type'],
+                                                 operation['insertbefore'], operation['insertafter'])
+        elif operation['value'] is not None:
+            changed |= set_target_inner(module, tree, xpath, namespaces, operation['attribute'], operation['value'])
+        else:
+            changed |= ensure_xpath_exists_inner(module, tree, xpath, namespaces)
+
+    finish(module, tree, None, namespaces, changed, operations=operations)
+
+
 def set_target_inner(module, tree, xpath, namespaces, attribute, value):
     changed = False
 
@@ -677,7 +800,7 @@ def set_target_inner(module, tree, xpath, namespaces, attribute, value):
         module.fail_json(msg="Xpath %s does not reference a node! tree is %s" %
                              (xpath, etree.tostring(tree, pretty_print=True)))
 
-    for element in tree.xpath(xpath, namespaces=namespaces):
+    for element in evaluate_xpath(tree, xpath, namespaces):
         if not attribute:
             changed = changed or (element.text != value)
             if element.text != value:
@@ -704,7 +827,7 @@ def get_element_text(module, tree, xpath, namespaces):
         module.fail_json(msg="Xpath %s does not reference a node!" % xpath)
 
     elements = []
-    for element in tree.xpath(xpath, namespaces=namespaces):
+    for element in evaluate_xpath(tree, xpath, namespaces):
         elements.append({element.tag: element.text})
 
     finish(module, tree, xpath, namespaces, changed=False, msg=len(elements), hitcount=len(elements), matches=elements)
@@ -715,7 +838,7 @@ def get_element_attr(module, tree, xpath, namespaces):
         module.fail_json(msg="Xpath %s does not reference a node!" % xpath)
 
     elements = []
-    for element in tree.xpath(xpath, namespaces=namespaces):
+    for element in evaluate_xpath(tree, xpath, namespaces):
         child = {}
         for key in element.keys():
             value = element.get(key)
@@ -797,7 +920,7 @@ def make_pretty(module, tree):
     module.exit_json(**result)
 
 
-def finish(module, tree, xpath, namespaces, changed=False, msg='', hitcount=0, matches=tuple()):
+def finish(module, tree, xpath, namespaces, changed=False, msg='', hitcount=0, matches=tuple(), operations=None):
 
     result = dict(
         actions=dict(
@@ -808,6 +931,12 @@ def finish(module, tree, xpath, namespaces, changed=False, msg='', hitcount=0, m
         changed=has_changed(tree),
     )
 
+    if operations is not None:
+        result['actions'] = dict(
+            operations=[dict(xpath=operation['xpath'], state=operation['state']) for operation in operations],
+            namespaces=namespaces,
+        )
+
     if module.params['count'] or hitcount:
         result['count'] = hitcount
 
@@ -856,6 +985,28 @@ def main():
             strip_cdata_tags=dict(type='bool', default=False),
             insertbefore=dict(type='bool', default=False),
             insertafter=dict(type='bool', default=False),
+            operations=dict(
+                type='list',
+                elements='dict',
+                options=dict(
+                    xpath=dict(type='str', required=True),
+                    state=dict(type='str', default='present', choices=['absent', 'present']),
+                    attribute=dict(type='raw'),
+                    value=dict(type='raw'),
+                    add_children=dict(type='list', elements='raw'),
+                    set_children=dict(type='list', elements='raw'),
+                    input_type=dict(type='str', default='yaml', choices=['xml', 'yaml']),
+                    insertbefore=dict(type='bool', default=False),
+                    insertafter=dict(type='bool', default=False),
+                ),
+                required_by=dict(
+                    attribute=['value'],
+                ),
+                mutually_exclusive=[
+                    ['add_children', 'set_children', 'value'],
+                    ['insertbefore', 'insertafter'],
+                ],
+            ),
         ),
         supports_check_mode=True,
         required_by=dict(
@@ -873,10 +1024,11 @@ def main():
         ],
         required_one_of=[
             ['path', 'xmlstring'],
-            ['add_children', 'content', 'count', 'pretty_print', 'print_match', 'set_children', 'value'],
+            ['add_children', 'content', 'count', 'operations', 'pretty_print', 'print_match', 'set_children', 'value'],
         ],
         mutually_exclusive=[
-            ['add_children', 'content', 'count', 'print_match', 'set_children', 'value'],
+            ['add_children', 'content', 'count', 'print_match', 'set_children', 'value', 'operations'],
+            ['xpath', 'operations'],
             ['path', 'xmlstring'],
             ['insertbefore', 'insertafter'],
         ],
@@ -900,6 +1052,13 @@ def main():
     strip_cdata_tags = module.params['strip_cdata_tags']
     insertbefore = module.params['insertbefore']
     insertafter = module.params['insertafter']
+    operations = json_dict_bytes_to_unicode(module.params['operations'])
+
+    # these options have defaults, so mutually_exclusive does not catch them
+    if operations:
+        for name, default in (('state', 'present'), ('attribute', None), ('input_type', 'yaml'), ('insertbefore', False), ('insertafter', False)):
+            if module.params[name] != default:
+                module.fail_json(msg="Parameter '%s' cannot be used with 'operations', set it on the operations instead." % name)
 
     # Check if we have lxml 2.3.0 or newer installed
     if not HAS_LXML:
@@ -918,13 +1077,16 @@ def main():
         module.fail_json(msg="The target XML source '%s' does not exist." % xml_file)
 
     # Parse and evaluate xpath expression
-    if xpath is not None:
+    xpaths = [xpath] if xpath is not None else []
+    if operations:
+        xpaths.extend(operation['xpath'] for operation in operations)
+    for expression in xpaths:
         try:
-            etree.XPath(xpath)
+            compile_xpath(expression, namespaces)
         except etree.XPathSyntaxError as e:
-            module.fail_json(msg="Syntax error in xpath expression: %s (%s)" % (xpath, e))
+            module.fail_json(msg="Syntax error in xpath expression: %s (%s)" % (expression, e))
         except etree.XPathEvalError as e:
-            module.fail_json(msg="Evaluation error in xpath expression: %s (%s)" % (xpath, e))
+            module.fail_json(msg="Evaluation error in xpath expression: %s (%s)" % (expression, e))
 
     # Try to parse in the target XML file
     try:
@@ -937,6 +1099,9 @@ def main():
     global orig_doc
     orig_doc = copy.deepcopy(doc)
 
+    if operations:
+        apply_operations(module, doc, operations, namespaces)
+
     if print_match:
         do_print_match(module, doc, xpath, namespaces)
 
@@ -139,10 +139,9 @@ class IdracRedfishUtils(RedfishUtils):
         # Manager attributes are supported as part of iDRAC OEM extension
         # Attributes are supported only on iDRAC9
         try:
-            for members in data[u'Links'][u'Oem'][u'Dell'][u'DellAttributes']:
-                attributes_uri = members[u'@odata.id']
-
-                response = self.get_request(self.root_uri + attributes_uri)
+            attributes_uris = [self.root_uri + members[u'@odata.id']
+                               for members in data[u'Links'][u'Oem'][u'Dell'][u'DellAttributes']]
+            for response in self.get_requests(attributes_uris):
                 if response['ret'] is False:
                     return response
                 data = response['data']
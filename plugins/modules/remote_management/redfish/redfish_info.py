@@ -486,6 +486,8 @@ def main():
                 elif command == "GetHostInterfaces":
                     result["host_interfaces"] = rf_utils.get_hostinterfaces()
 
+    rf_utils.close()
+
     # Return data back
     module.exit_json(redfish_facts=result)
 
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import zlib
+
+from ansible.errors import AnsibleError
+from ansible.module_utils.common.text.converters import to_bytes, to_text
+from ansible.parsing.ajson import AnsibleJSONEncoder, AnsibleJSONDecoder
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+try:
+    import lz4.frame
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
+
+SERIALIZERS = ('json', 'compact_json', 'msgpack')
+COMPRESSIONS = ('none', 'zlib', 'lz4')
+
+# Tagged payloads look like b'\x00<serializer>/<compression>\x00<data>'.
+# Plain JSON never starts with a NUL byte, so untagged entries are read as
+# the historical indented JSON format.
+_TAG_MARK = b'\x00'
+
+
+class CacheSerializer(object):
+    """
+    Encode and decode cache values in a self-describing binary format.
+
+    The 'json' serializer without compression writes untagged, indented JSON
+    so that entries stay readable by older versions of the cache plugins.
+    Every other combination is prefixed with a tag naming the serializer and
+    compression, so entries written with different settings can always be read.
+    """
+
+    def __init__(self, serializer='json', compression='none'):
+        compression = compression or 'none'
+        if serializer not in SERIALIZERS:
+            raise AnsibleError("Unknown cache serializer '%s', expected one of %s" % (serializer, ', '.join(SERIALIZERS)))
+        if compression not in COMPRESSIONS:
+            raise AnsibleError("Unknown cache compression '%s', expected one of %s" % (compression, ', '.join(COMPRESSIONS)))
+        self._check_available(serializer, compression)
+        self.serializer = serializer
+        self.compression = compression
+
+    @staticmethod
+    def _check_available(serializer, compression):
+        if serializer == 'msgpack' and not HAS_MSGPACK:
+            raise AnsibleError("The 'msgpack' python module is required for the msgpack cache serializer, 'pip install msgpack'")
+        if compression == 'lz4' and not HAS_LZ4:
+            raise AnsibleError("The 'lz4' python module is required for lz4 cache compression, 'pip install lz4'")
+
+    @property
+    def is_legacy(self):
+        return self.serializer == 'json' and self.compression == 'none'
+
+    def dumps(self, value):
+        if self.is_legacy:
+            return to_bytes(json.dumps(value, cls=AnsibleJSONEncoder, sort_keys=True, indent=4))
+
+        data = self._serialize(self.serializer, value)
+        if self.compression == 'zlib':
+            data = zlib.compress(data)
+        elif self.compression == 'lz4':
+            data = lz4.frame.compress(data)
+        return b''.join([_TAG_MARK, to_bytes('%s/%s' % (self.serializer, self.compression)), _TAG_MARK, data])
+
+    def loads(self, data):
+        data = to_bytes(data)
+        if not data.startswith(_TAG_MARK):
+            return json.loads(to_text(data), cls=AnsibleJSONDecoder)
+
+        try:
+            tag, data = data[1:].split(_TAG_MARK, 1)
+            serializer, compression = to_text(tag).split('/', 1)
+        except ValueError:
+            raise AnsibleError('Invalid cache entry header')
+        if serializer not in SERIALIZERS or compression not in COMPRESSIONS:
+            raise AnsibleError("Cache entry uses unknown format '%s'" % to_text(tag))
+        self._check_available(serializer, compression)
+
+        if compression == 'zlib':
+            data = zlib.decompress(data)
+        elif compression == 'lz4':
+            data = lz4.frame.decompress(data)
+        return self._deserialize(serializer, data)
+
+    @staticmethod
+    def _serialize(serializer, value):
+        if serializer == 'msgpack':
+            return msgpack.packb(value, use_bin_type=True, default=AnsibleJSONEncoder().default)
+        if serializer == 'compact_json':
+            return to_bytes(json.dumps(value, cls=AnsibleJSONEncoder, separators=(',', ':')))
+        return to_bytes(json.dumps(value, cls=AnsibleJSONEncoder, sort_keys=True, indent=4))
+
+    @staticmethod
+    def _deserialize(serializer, data):
+        if serializer == 'msgpack':
+            return msgpack.unpackb(data, raw=False, object_hook=AnsibleJSONDecoder().object_hook)
+        return json.loads(to_text(data), cls=AnsibleJSONDecoder)
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import threading
+import time
+
+from ansible.module_utils.common.text.converters import to_bytes, to_native, to_text
+from ansible.module_utils.six.moves import queue
+
+
+_STOP = object()
+
+
+class PartialSendError(Exception):
+    """ Raised by ``send`` when only some events were delivered, ``unsent`` holds the others. """
+
+    def __init__(self, message, unsent):
+        super(PartialSendError, self).__init__(message)
+        self.unsent = unsent
+
+
+class _Flush(object):
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class EventSpool(object):
+    """
+    Append-only file of events that could not be delivered.
+
+    Events are stored as JSON lines, so they must be strings or plain
+    JSON types. Once the file reaches ``max_size`` bytes, further events are
+    refused. ``take`` moves the current file aside so new events can be
+    spooled while the old ones are replayed.
+    """
+
+    def __init__(self, path, max_size=10485760):
+        self.path = os.path.expanduser(os.path.expandvars(path))
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+    @property
+    def _replay_path(self):
+        return self.path + '.replay'
+
+    def __len__(self):
+        size = 0
+        for path in (self.path, self._replay_path):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def append(self, events):
+        """ Spool events, return how many of them fit. """
+        lines = [to_bytes(json.dumps(event) + '\n') for event in events]
+        with self._lock:
+            free = self.max_size - len(self)
+            count = 0
+            for line in lines:
+                if len(line) > free:
+                    break
+                free -= len(line)
+                count += 1
+            if count:
+                with open(self.path, 'ab') as f:
+                    f.write(b''.join(lines[:count]))
+        return count
+
+    def take(self):
+        """ Return the spooled events. They are removed from the spool by ``done``. """
+        with self._lock:
+            if not os.path.exists(self._replay_path):
+                try:
+                    os.rename(self.path, self._replay_path)
+                except OSError:
+                    return []
+        events = []
+        with open(self._replay_path, 'rb') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(to_text(line)))
+                except ValueError:
+                    # a torn line from an interrupted write
+                    pass
+        return events
+
+    def done(self):
+        try:
+            os.unlink(self._replay_path)
+        except OSError:
+            pass
+
+
+class EventSender(object):
+    """
+    Ship callback events to a collector from a background thread.
+
+    Events are put on a bounded queue and handed to ``send`` in lists of at
+    most ``flush_size`` events, or whatever has been queued after
+    ``flush_interval`` seconds. A failing ``send`` is retried ``retries``
+    times, doubling ``backoff`` between attempts. ``send`` can raise
+    ``PartialSendError`` so that only the events it did not deliver are
+    retried. When the queue is full new events are dropped instead of
+    blocking the play.
+
+    With a ``spool``, events that cannot be queued or sent are written to it
+    instead of being dropped. While the collector is failing, batches go
+    straight to the spool and delivery is only attempted again every
+    ``retry_interval`` seconds. Spooled events are replayed from the
+    background thread when it starts and once the collector accepts a request
+    again.
+
+    The ``queued``, ``sent``, ``dropped``, ``failed`` and ``spooled``
+    attributes count events over the lifetime of the sender.
+    """
+
+    def __init__(self, send, queue_size=10000, flush_size=100, flush_interval=5.0, retries=3, backoff=1.0, display=None,
+                 spool=None, retry_interval=30.0):
+        self._send = send
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._flush_size = max(1, flush_size)
+        self._flush_interval = max(0.01, flush_interval)
+        self._retries = max(0, retries)
+        self._backoff = backoff
+        self._display = display
+        self._spool = spool
+        self._retry_interval = retry_interval
+        self._down_until = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.spooled = 0
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def summary(self):
+        return 'queued %d, sent %d, dropped %d, failed %d, spooled %d' % (self.queued, self.sent, self.dropped, self.failed, self.spooled)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def start(self):
+        """ Start the background thread, this replays what is left in the spool. """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='event-sender')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def put(self, event):
+        """ Queue an event, return False if it had to be dropped. """
+        self.start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            if self._spool_events([event]):
+                return True
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def flush(self, timeout=None):
+        """ Wait until every event queued so far has been handed to ``send``. """
+        if self._thread is None:
+            return True
+        marker = _Flush()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout=None):
+        """ Send what is left in the queue and stop the background thread. """
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def report(self, display, name):
+        """ Display the counters, and warn about events that did not reach ``name``. """
+        display.vv('%s events: %s' % (name, self.summary()))
+        if self.dropped or self.failed:
+            display.warning('%s did not receive all events: %s' % (name, self.summary()))
+        if self.spooled:
+            display.warning('%d events for %s were spooled to %s and will be sent later' % (self.spooled, name, self._spool.path))
+
+    def _run(self):
+        self._replay()
+        batch = []
+        deadline = time.time() + self._flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0, deadline - time.time()))
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._deliver(batch)
+                return
+            elif isinstance(item, _Flush):
+                self._deliver(batch)
+                batch = []
+                item.done.set()
+            elif item is not None:
+                batch.append(item)
+
+            if len(batch) >= self._flush_size or time.time() >= deadline:
+                self._deliver(batch)
+                batch = []
+                deadline = time.time() + self._flush_interval
+
+    def _spool_events(self, events):
+        if self._spool is None:
+            return False
+        count = self._spool.append(events)
+        self._count('spooled', count)
+        self._count('dropped', len(events) - count)
+        return True
+
+    def _deliver(self, batch):
+        if not batch:
+            return
+        if time.time() < self._down_until and self._spool_events(batch):
+            return
+        delay = self._backoff
+        for attempt in range(self._retries + 1):
+            try:
+                self._send(batch)
+            except Exception as e:
+                if isinstance(e, PartialSendError):
+                    self._count('sent', len(batch) - len(e.unsent))
+                    batch = e.unsent
+                if attempt < self._retries:
+                    time.sleep(delay)
+                    delay *= 2
+                    continue
+                if self._spool_events(batch):
+                    self._down_until = time.time() + self._retry_interval
+                else:
+                    self._count('failed', len(batch))
+                if self._display:
+                    self._display.warning('Could not send %d events after %d attempts: %s' % (len(batch), attempt + 1, to_native(e)))
+            else:
+                self._count('sent', len(batch))
+                if self._down_until:
+                    self._down_until = 0
+                    self._replay()
+            return
+
+    def _replay(self):
+        """ Send spooled events, putting back whatever cannot be sent. """
+        if self._spool is None or not len(self._spool):
+            return
+        events = self._spool.take()
+        for i in range(0, len(events), self._flush_size):
+            batch = events[i:i + self._flush_size]
+            try:
+                self._send(batch)
+            except Exception as e:
+                unsent = events[i:]
+                if isinstance(e, PartialSendError):
+                    self._count('sent', len(batch) - len(e.unsent))
+                    unsent = e.unsent + events[i + len(batch):]
+                self._spool.done()
+                self._count('dropped', len(unsent) - self._spool.append(unsent))
+                self._down_until = time.time() + self._retry_interval
+                if self._display:
+                    self._display.vvv('Could not replay spooled events: %s' % to_native(e))
+                return
+            self._count('sent', len(batch))
+        self._spool.done()
+
+
+def sender_from_options(plugin, send, display):
+    """
+    Return an ``EventSender`` set up from the ``threaded``, ``queue_size``,
+    ``flush_size``, ``flush_interval``, ``retries``, ``spool_path`` and
+    ``spool_max_size`` options of a callback plugin, or None when events are
+    sent from the callback itself.
+    """
+    if not plugin.get_option('threaded') and not plugin.get_option('spool_path'):
+        return None
+    spool = None
+    if plugin.get_option('spool_path'):
+        spool = EventSpool(plugin.get_option('spool_path'), plugin.get_option('spool_max_size'))
+    sender = EventSender(
+        send,
+        queue_size=plugin.get_option('queue_size'),
+        flush_size=plugin.get_option('flush_size'),
+        flush_interval=plugin.get_option('flush_interval'),
+        retries=plugin.get_option('retries'),
+        display=display,
+        spool=spool,
+    )
+    if spool is not None:
+        # replay events left over from earlier runs
+        sender.start()
+    return sender
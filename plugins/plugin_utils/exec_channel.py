@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import struct
+import subprocess
+import tempfile
+
+from ansible.errors import AnsibleConnectionFailure
+from ansible.module_utils.common.text.converters import to_bytes, to_native, to_text
+from ansible.module_utils.six.moves import shlex_quote
+
+
+# frames are a type byte and the length of the payload followed by the payload
+FRAME = struct.Struct('!cI')
+
+CHUNK_SIZE = 1 << 20
+
+# runs inside the jail or zone, it must work with python 2.6 and later
+HELPER = r"""
+import struct, subprocess, sys
+FRAME = struct.Struct("!cI")
+i = getattr(sys.stdin, "buffer", sys.stdin)
+o = getattr(sys.stdout, "buffer", sys.stdout)
+def read(size):
+    data = b""
+    while len(data) < size:
+        chunk = i.read(size - len(data))
+        if not chunk:
+            sys.exit(0)
+        data += chunk
+    return data
+def recv():
+    kind, size = FRAME.unpack(read(FRAME.size))
+    return kind, read(size)
+def send(kind, data=b""):
+    o.write(FRAME.pack(kind, len(data)))
+    o.write(data)
+def chunks():
+    while True:
+        kind, data = recv()
+        if kind == b"E":
+            return
+        yield data
+def error(e):
+    return str(e).encode("utf-8", "replace")
+send(b"C", b"0")
+o.flush()
+while True:
+    kind, data = recv()
+    if kind == b"X":
+        stdin = b"".join(chunks())
+        try:
+            p = subprocess.Popen(data.split(b"\0"), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
+            out, err = p.communicate(stdin)
+            rc = p.returncode
+        except Exception as e:
+            out, err, rc = b"", error(e), 127
+        send(b"O", out)
+        send(b"R", err)
+        send(b"C", str(rc).encode("ascii"))
+    elif kind == b"P":
+        f = err = None
+        try:
+            f = open(data, "wb")
+        except Exception as e:
+            err = e
+        for chunk in chunks():
+            if f is not None and err is None:
+                try:
+                    f.write(chunk)
+                except Exception as e:
+                    err = e
+        if f is not None:
+            try:
+                f.close()
+            except Exception as e:
+                err = err or e
+        if err is None:
+            send(b"C", b"0")
+        else:
+            send(b"F", error(err))
+    elif kind == b"G":
+        try:
+            f = open(data, "rb")
+        except Exception as e:
+            send(b"F", error(e))
+        else:
+            try:
+                while True:
+                    chunk = f.read(%d)
+                    if not chunk:
+                        break
+                    send(b"D", chunk)
+            finally:
+                f.close()
+            send(b"E")
+    o.flush()
+""" % CHUNK_SIZE
+
+INTERPRETERS = ('python3', 'python', '/usr/local/bin/python3', '/usr/bin/python3', '/usr/bin/python', '/usr/libexec/platform-python')
+
+
+def helper_command():
+    """ shell command that starts the helper with the first python found """
+    return ('for p in %s; do command -v "$p" >/dev/null 2>&1 && exec "$p" -c %s; done; exit 127'
+            % (' '.join(INTERPRETERS), shlex_quote(HELPER)))
+
+
+class ExecChannelError(AnsibleConnectionFailure):
+    pass
+
+
+class ExecChannel(object):
+    """
+    Run commands and transfer files through one helper process.
+
+    ``argv`` starts a shell inside the jail or zone which is given the command
+    from ``helper_command``. The helper reads requests from its stdin and
+    writes the results to its stdout, both framed by ``FRAME``, so commands
+    and file transfers do not need a new process outside of the jail or zone.
+    The connection plugins are closed after every task, so a helper only
+    serves the actions of one task.
+    """
+
+    def __init__(self, argv):
+        # nothing reads the stderr of the helper while it runs, a pipe could fill up and block it
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen([to_bytes(arg, errors='surrogate_or_strict') for arg in argv],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._stderr)
+        try:
+            self._expect(b'C')
+        except ExecChannelError:
+            self._stop()
+            self._stderr.seek(0)
+            error = self._stderr.read().strip()
+            self._stderr.close()
+            raise ExecChannelError('helper process did not start: %s' % to_native(error))
+
+    def _read(self, size):
+        data = self._process.stdout.read(size)
+        if len(data) != size:
+            raise ExecChannelError('helper process exited unexpectedly')
+        return data
+
+    def _recv(self):
+        kind, size = FRAME.unpack(self._read(FRAME.size))
+        return kind, self._read(size)
+
+    def _expect(self, kind):
+        received, data = self._recv()
+        if received != kind:
+            raise ExecChannelError('unexpected %r frame from helper process' % received)
+        return data
+
+    def _send(self, kind, data=b''):
+        try:
+            self._process.stdin.write(FRAME.pack(kind, len(data)))
+            self._process.stdin.write(data)
+        except (IOError, OSError) as e:
+            raise ExecChannelError('cannot write to helper process: %s' % to_native(e))
+
+    def _flush(self):
+        try:
+            self._process.stdin.flush()
+        except (IOError, OSError) as e:
+            raise ExecChannelError('cannot write to helper process: %s' % to_native(e))
+
+    def exec_command(self, argv, in_data=None):
+        """ run argv, return the return code, stdout and stderr """
+        self._send(b'X', b'\0'.join(to_bytes(arg, errors='surrogate_or_strict') for arg in argv))
+        if in_data:
+            self._send(b'D', to_bytes(in_data, errors='surrogate_or_strict'))
+        self._send(b'E')
+        self._flush()
+        stdout = self._expect(b'O')
+        stderr = self._expect(b'R')
+        return int(self._expect(b'C')), stdout, stderr
+
+    def put_file(self, in_file, path):
+        """ write the content of the file object in_file to path, return an error message or None """
+        self._send(b'P', to_bytes(path, errors='surrogate_or_strict'))
+        while True:
+            chunk = in_file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            self._send(b'D', chunk)
+        self._send(b'E')
+        self._flush()
+        kind, data = self._recv()
+        if kind == b'F':
+            return to_text(data)
+        return None
+
+    def fetch_file(self, path, out_file):
+        """ write the content of path to the file object out_file, return an error message or None """
+        self._send(b'G', to_bytes(path, errors='surrogate_or_strict'))
+        self._flush()
+        while True:
+            kind, data = self._recv()
+            if kind == b'F':
+                return to_text(data)
+            if kind == b'E':
+                return None
+            out_file.write(data)
+
+    def _stop(self):
+        # the helper exits when its stdin is closed
+        if self._process.poll() is None:
+            try:
+                self._process.stdin.close()
+            except (IOError, OSError):
+                pass
+        self._process.wait()
+
+    def close(self):
+        """ stop the helper process """
+        self._stop()
+        self._stderr.close()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import time
+
+import pytest
+
+pytest.importorskip('lmdb')
+
+from ansible.plugins.loader import cache_loader
+from ansible_collections.community.general.plugins.cache.lmdb import CacheModule as LmdbCache
+
+
+def _cache(tmp_path, **kwargs):
+    kwargs.setdefault('_uri', str(tmp_path / 'facts.mdb'))
+    kwargs.setdefault('_map_size', 10485760)
+    return cache_loader.get('community.general.lmdb', **kwargs)
+
+
+def test_lmdb_cachemodule(tmp_path):
+    assert isinstance(_cache(tmp_path), LmdbCache)
+
+
+def test_lmdb_batched_writes(tmp_path):
+    cache = _cache(tmp_path, _write_batch=10)
+    for i in range(15):
+        cache.set('host%d' % i, {'i': i})
+    # the first ten writes were committed together, the rest are pending
+    assert len(cache._pending) == 5
+    assert cache.contains('host14')
+
+    reader = _cache(tmp_path)
+    assert len(reader.keys()) == 10
+    assert sorted(cache.keys()) == sorted('host%d' % i for i in range(15))
+    assert _cache(tmp_path).copy() == dict(('host%d' % i, {'i': i}) for i in range(15))
+
+
+def test_lmdb_overwrite_and_delete(tmp_path):
+    cache = _cache(tmp_path, _write_batch=1)
+    cache.set('host1', {'a': 1})
+    cache.set('host1', {'a': 2})
+    cache.set('host2', {})
+    cache.delete('host2')
+
+    reader = _cache(tmp_path)
+    assert reader.keys() == ['host1']
+    assert reader.get('host1') == {'a': 2}
+    with pytest.raises(KeyError):
+        reader.get('host2')
+
+
+def test_lmdb_expiry(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, _timeout=60, _write_batch=1)
+    cache.set('old', {})
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    cache.set('new', {})
+
+    assert cache.keys() == ['new']
+    assert not cache.contains('old')
+    with cache._open().begin() as txn:
+        assert txn.stat(cache._expiry_db)['entries'] == 1
+
+
+def test_lmdb_flush(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set('host1', {})
+    cache.flush()
+    assert _cache(tmp_path).keys() == []
@@ -29,3 +29,17 @@ from ansible_collections.community.general.plugins.cache.memcached import CacheM
 
 def test_memcached_cachemodule():
     assert isinstance(cache_loader.get('community.general.memcached'), MemcachedCache)
+
+
+def test_memcached_serializer():
+    cache = cache_loader.get('community.general.memcached', _serializer='compact_json', _compression='zlib')
+    stored = {}
+    cache._db = type('FakeClient', (object, ), {
+        'set': lambda self, key, value, **kwargs: stored.__setitem__(key, value),
+        'get': lambda self, key: stored.get(key),
+    })()
+    cache._keys._cache = cache._db
+    cache.set('host1', {'a': 1})
+    assert stored[cache._make_key('host1')].startswith(b'\x00compact_json/zlib\x00')
+    cache._cache.clear()
+    assert cache.get('host1') == {'a': 1}
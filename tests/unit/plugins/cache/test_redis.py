@@ -43,3 +43,123 @@ def test_redis_cachemodule():
     if ansible_version.startswith('2.9.'):
         C.CACHE_PLUGIN_CONNECTION = connection
     assert isinstance(cache_loader.get('community.general.redis', **{'_uri': connection}), RedisCache)
+
+
+class FakePipeline(object):
+    def __init__(self, db):
+        self._db = db
+        self._commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self._commands.append((name, args))
+            return self
+        return queue
+
+    def execute(self):
+        self._db.round_trips += 1
+        return [getattr(self._db, '_' + name)(*args) for name, args in self._commands]
+
+
+class FakeRedis(object):
+    """In-memory stand-in for StrictRedis counting network round trips."""
+
+    def __init__(self):
+        self.round_trips = 0
+        self.data = {}
+        self.zset = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def __getattr__(self, name):
+        handler = getattr(self, '_' + name)
+
+        def call(*args):
+            self.round_trips += 1
+            return handler(*args)
+        return call
+
+    def _get(self, key):
+        return self.data.get(key)
+
+    def _mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    def _set(self, key, value):
+        self.data[key] = value
+
+    def _setex(self, key, timeout, value):
+        self.data[key] = value
+
+    def _delete(self, key):
+        self.data.pop(key, None)
+
+    def _zadd(self, name, mapping):
+        self.zset.update(mapping)
+
+    def _zrem(self, name, key):
+        self.zset.pop(key, None)
+
+    def _zrange(self, name, start, end):
+        return [k.encode() for k in sorted(self.zset, key=self.zset.get)]
+
+    def _zrank(self, name, key):
+        return 0 if key in self.zset else None
+
+    def _zremrangebyscore(self, name, low, high):
+        for key in [k for k, score in self.zset.items() if low <= score <= high]:
+            del self.zset[key]
+
+
+def _fake_cache(**kwargs):
+    kwargs['_uri'] = '127.0.0.1:6379:1'
+    cache = cache_loader.get('community.general.redis', **kwargs)
+    cache._db = FakeRedis()
+    return cache
+
+
+def test_redis_round_trips_per_host():
+    hosts = ['host%d' % i for i in range(50)]
+    cache = _fake_cache()
+    for host in hosts:
+        cache.set(host, {'ansible_hostname': host})
+    # SETEX and ZADD are sent together
+    assert cache._db.round_trips == len(hosts)
+
+    reader = _fake_cache()
+    reader._db = cache._db
+    cache._db.round_trips = 0
+    assert reader.copy() == dict((h, {'ansible_hostname': h}) for h in hosts)
+    # one ZREMRANGEBYSCORE, one ZRANGE and a single MGET for all hosts
+    assert cache._db.round_trips == 3
+
+
+def test_redis_copy_drops_stale_keys():
+    cache = _fake_cache()
+    cache.set('alive', {'a': 1})
+    cache.set('gone', {'b': 2})
+    del cache._db.data[cache._make_key('gone')]
+    cache._cache.clear()
+    assert cache.copy() == {'alive': {'a': 1}}
+    assert 'gone' not in cache._db.zset
+
+
+def test_redis_expire_interval():
+    cache = _fake_cache(_expire_interval=60)
+    cache.set('host', {})
+    cache._db.round_trips = 0
+    for dummy in range(10):
+        assert cache.contains('host')
+    # expiry runs once, then only ZRANK is sent
+    assert cache._db.round_trips == 11
+
+
+def test_redis_serializer_reads_legacy_entries():
+    legacy = _fake_cache()
+    legacy.set('old', {'a': 1})
+    cache = _fake_cache(_serializer='compact_json', _compression='zlib')
+    cache._db = legacy._db
+    cache.set('new', {'b': 2})
+    assert cache._db.data[cache._make_key('new')].startswith(b'\x00compact_json/zlib\x00')
+    assert cache.copy() == {'old': {'a': 1}, 'new': {'b': 2}}
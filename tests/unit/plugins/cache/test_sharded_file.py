@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import time
+
+from ansible.plugins.loader import cache_loader
+from ansible_collections.community.general.plugins.cache.sharded_file import CacheModule as ShardedFileCache
+
+
+def _cache(tmp_path, **kwargs):
+    kwargs.setdefault('_uri', str(tmp_path))
+    kwargs.setdefault('_prefix', '')
+    return cache_loader.get('community.general.sharded_file', **kwargs)
+
+
+def test_sharded_file_cachemodule(tmp_path):
+    assert isinstance(_cache(tmp_path), ShardedFileCache)
+
+
+def test_sharded_file_round_trip(tmp_path):
+    cache = _cache(tmp_path, _shard_count=4)
+    hosts = dict(('host%d' % i, {'ansible_hostname': 'host%d' % i}) for i in range(20))
+    for host, facts in hosts.items():
+        cache.set(host, facts)
+    cache.delete('host0')
+    del hosts['host0']
+
+    shards = [d for d in os.listdir(str(tmp_path)) if not d.startswith('.')]
+    assert 1 < len(shards) <= 4
+
+    reader = _cache(tmp_path, _shard_count=4)
+    assert sorted(reader.keys()) == sorted(hosts)
+    assert reader.contains('host1')
+    assert not reader.contains('host0')
+    assert reader.copy() == hosts
+
+
+def test_sharded_file_expiry_uses_index(tmp_path):
+    cache = _cache(tmp_path, _timeout=60)
+    cache.set('old', {})
+    cache.set('new', {})
+    cache.index['old'] = time.time() - 120
+    cache._cache.clear()
+
+    assert cache.keys() == ['new']
+    assert not cache.contains('old')
+
+
+def test_sharded_file_rebuilds_index(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set('host1', {'a': 1})
+    os.remove(os.path.join(str(tmp_path), '.index'))
+
+    reader = _cache(tmp_path)
+    assert reader.keys() == ['host1']
+    assert reader.get('host1') == {'a': 1}
+
+
+def test_sharded_file_flush(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set('host1', {})
+    cache.flush()
+    assert _cache(tmp_path).keys() == []
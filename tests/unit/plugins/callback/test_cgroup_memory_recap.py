@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import random
+
+import pytest
+
+from ansible.plugins.loader import callback_loader
+from ansible_collections.community.general.plugins.callback.cgroup_memory_recap import CgroupFile, StreamStats
+
+
+def test_stream_stats_quantiles():
+    values = [random.uniform(10, 2000) for dummy in range(20000)]
+    stats = StreamStats()
+    for value in values:
+        stats.add(value)
+
+    values.sort()
+    assert stats.count == len(values)
+    assert stats.max == values[-1]
+    assert abs(stats.mean - sum(values) / len(values)) < 1e-6
+    for q in (0.5, 0.95, 0.99):
+        expected = values[int(q * (len(values) - 1))]
+        assert abs(stats.quantile(q) - expected) <= expected * 0.02
+
+
+def test_stream_stats_bounded_buckets():
+    stats = StreamStats(max_buckets=16)
+    for exponent in range(100):
+        stats.add(1.5 ** exponent)
+
+    assert len(stats._buckets) <= 16
+    assert stats.quantile(1) == stats.max
+
+
+def test_stream_stats_empty():
+    stats = StreamStats()
+    assert stats.mean is None
+    assert stats.quantile(0.5) is None
+
+
+def test_cgroup_file_reads_from_start(tmp_path):
+    path = tmp_path / 'memory.current'
+    path.write_text(u'1048576\n')
+    cgroup_file = CgroupFile(str(path))
+    try:
+        assert cgroup_file.read_int() == 1048576
+        assert cgroup_file.read_int() == 1048576
+    finally:
+        cgroup_file.close()
+
+
+def test_cgroup_file_stat_parsing(tmp_path):
+    cpu = tmp_path / 'cpu.stat'
+    cpu.write_text(u'usage_usec 2500000\nuser_usec 2000000\nsystem_usec 500000\nnr_periods 0\n')
+    io = tmp_path / 'io.stat'
+    io.write_text(u'8:0 rbytes=1024 wbytes=2048 rios=1 wios=2 dbytes=0 dios=0\n'
+                  u'8:16 rbytes=1024 wbytes=0 rios=1 wios=0 dbytes=0 dios=0\n')
+
+    cpu_file = CgroupFile(str(cpu))
+    io_file = CgroupFile(str(io))
+    try:
+        assert cpu_file.read_cpu_stat() == {'usage': 2.5, 'user': 2.0, 'system': 0.5}
+        assert io_file.read_io_stat() == {'rbytes': 2048, 'wbytes': 2048}
+    finally:
+        cpu_file.close()
+        io_file.close()
+
+
+def test_cgroup_files_closed_after_stats(tmp_path, mocker):
+    for name, content in (('memory.peak', u'0\n'), ('memory.current', u'1048576\n'),
+                          ('cpu.stat', u'usage_usec 0\n'), ('io.stat', u'')):
+        (tmp_path / name).write_text(content)
+    callback = callback_loader.get('community.general.cgroup_memory_recap')
+    callback._display = mocker.MagicMock()
+    callback.set_options(direct={
+        'max_mem_file': str(tmp_path / 'memory.peak'),
+        'cur_mem_file': str(tmp_path / 'memory.current'),
+        'cpu_stat_file': str(tmp_path / 'cpu.stat'),
+        'io_stat_file': str(tmp_path / 'io.stat'),
+    })
+    fds = [callback._current_file.fd, callback._cpu_file.fd, callback._io_file.fd]
+
+    callback.v2_playbook_on_stats(None)
+
+    for fd in fds:
+        with pytest.raises(OSError):
+            os.fstat(fd)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible.executor.task_result import TaskResult
+from ansible.inventory.host import Host
+from ansible.playbook.task import Task
+from ansible_collections.community.general.tests.unit.compat import unittest
+from ansible_collections.community.general.tests.unit.compat.mock import MagicMock, Mock
+from ansible_collections.community.general.plugins.callback.diy import CallbackModule
+
+
+class TestDIYVars(unittest.TestCase):
+    def setUp(self):
+        self.diy = CallbackModule()
+        self.playbook = Mock()
+        self.play = Mock()
+        self.play._uuid = 'play_uuid'
+        self.variable_manager = self.play.get_variable_manager.return_value
+        self.variable_manager.get_vars.side_effect = lambda **kwargs: {'omit': '__omit__', 'var': 'value'}
+        self.host = Host('myhost')
+        self.task = Task()
+        self.task._uuid = 'task_uuid'
+        self.task.get_name = MagicMock(return_value='mytask')
+
+    def _result(self, item):
+        return TaskResult(host=self.host, task=self.task, return_data={'item': item, 'changed': False})
+
+    def test_item_events_reuse_vars(self):
+        first = self.diy._get_vars(self.playbook, play=self.play, task=self.task, result=self._result(1), reuse_vars=True)
+        second = self.diy._get_vars(self.playbook, play=self.play, task=self.task, result=self._result(2), reuse_vars=True)
+
+        self.assertEqual(self.variable_manager.get_vars.call_count, 1)
+        self.assertEqual(first['item'], 1)
+        self.assertEqual(second['item'], 2)
+        self.assertEqual(second['var'], 'value')
+        self.assertEqual(second['ansible_callback_diy']['result']['output']['item'], 2)
+
+    def test_other_events_refresh_vars(self):
+        self.diy._get_vars(self.playbook, play=self.play, task=self.task, result=self._result(1), reuse_vars=True)
+        self.diy._get_vars(self.playbook, play=self.play, task=self.task, result=self._result(1))
+        self.diy._get_vars(self.playbook, play=self.play, task=self.task, result=self._result(2), reuse_vars=True)
+
+        self.assertEqual(self.variable_manager.get_vars.call_count, 3)
+
+    def test_task_name_is_read_for_every_event(self):
+        task = Task.load({'name': 'install {{ pkg }}', 'debug': {'msg': 'hi'}})
+        # the linear strategy templates the name only while it sends v2_playbook_on_task_start
+        task.name = 'install vim'
+        start = self.diy._get_vars(self.playbook, play=self.play, task=task)
+        task.name = 'install {{ pkg }}'
+        result = self.diy._get_vars(self.playbook, play=self.play, host=self.host, task=task)
+
+        self.assertEqual(start['ansible_callback_diy']['task']['name'], 'install vim')
+        self.assertEqual(result['ansible_callback_diy']['task']['name'], 'install {{ pkg }}')
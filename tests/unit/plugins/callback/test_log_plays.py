@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+
+from ansible.executor.task_result import TaskResult
+from ansible.inventory.host import Host
+from ansible.playbook.task import Task
+from ansible.plugins.loader import callback_loader
+from ansible_collections.community.general.plugins.callback.log_plays import FilePool
+
+
+def test_file_pool_closes_least_recently_used(tmp_path):
+    pool = FilePool(2)
+    for name in ('a', 'b', 'a', 'c'):
+        pool.write(str(tmp_path / name), name.encode())
+
+    assert list(pool._files) == [str(tmp_path / 'a'), str(tmp_path / 'c')]
+    pool.close()
+    assert (tmp_path / 'a').read_bytes() == b'aa'
+    assert (tmp_path / 'b').read_bytes() == b'b'
+    assert (tmp_path / 'c').read_bytes() == b'c'
+
+
+def test_file_pool_without_open_files(tmp_path):
+    pool = FilePool(0)
+    pool.write(str(tmp_path / 'a'), b'a')
+
+    assert not pool._files
+    assert (tmp_path / 'a').read_bytes() == b'a'
+
+
+def test_json_lines_file(tmp_path):
+    path = tmp_path / 'log' / 'results.jsonl'
+    callback = callback_loader.get('community.general.log_plays')
+    callback.set_options(direct={'json_lines_file': str(path)})
+    callback.playbook = 'site.yml'
+
+    task = Task()
+    task.name = 'mytask'
+    task.action = 'command'
+    for host in ('host1', 'host2'):
+        result = TaskResult(host=Host(host), task=task, return_data={'rc': 0, 'invocation': {'module_args': {}}})
+        callback.v2_runner_on_ok(result)
+    callback.v2_playbook_on_stats(None)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['host'] for record in records] == ['host1', 'host2']
+    assert records[0]['data'] == {'rc': 0}
+    assert records[0]['invocation'] == {'module_args': {}}
+    assert records[0]['category'] == 'OK'
+    assert records[0]['playbook'] == 'site.yml'
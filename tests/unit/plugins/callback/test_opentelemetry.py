@@ -8,7 +8,7 @@ from ansible.playbook.task import Task
 from ansible.executor.task_result import TaskResult
 from ansible_collections.community.general.tests.unit.compat import unittest
 from ansible_collections.community.general.tests.unit.compat.mock import patch, MagicMock, Mock
-from ansible_collections.community.general.plugins.callback.opentelemetry import OpenTelemetrySource, TaskData, CallbackModule
+from ansible_collections.community.general.plugins.callback.opentelemetry import OpenTelemetrySource, TaskData, TrimmedResult, CallbackModule
 from collections import OrderedDict
 import sys
 
@@ -92,6 +92,69 @@ class TestOpentelemetry(unittest.TestCase):
         self.assertEqual(host_data.name, 'include')
         self.assertEqual(host_data.status, 'ok')
 
+    def test_finish_task_streaming(self):
+        tasks_data = OrderedDict()
+        tasks_data['myuuid'] = self.my_task
+        self.opentelemetry.tracer = Mock()
+        self.opentelemetry.parent_span = Mock()
+        self.opentelemetry.update_span_data = Mock()
+
+        self.opentelemetry.finish_task(tasks_data, 'ok', self.my_task_result)
+        self.opentelemetry.finish_task(tasks_data, 'ok', self.my_task_result)
+
+        task_data = tasks_data['myuuid']
+        self.assertEqual(task_data.host_data, OrderedDict())
+        self.assertEqual(task_data.exported_hosts, set(['myhost_uuid']))
+        self.opentelemetry.tracer.start_span.assert_called_once()
+        self.assertEqual(self.opentelemetry.update_span_data.call_count, 1)
+        span_task_data, host_data, span = self.opentelemetry.update_span_data.call_args[0]
+        self.assertEqual(span_task_data, task_data)
+        self.assertEqual(host_data.status, 'ok')
+        self.assertEqual(span, self.opentelemetry.tracer.start_span.return_value)
+
+    def test_streaming_forgets_exported_tasks(self):
+        tasks_data = OrderedDict()
+        self.opentelemetry.tracer = Mock()
+        self.opentelemetry.parent_span = Mock()
+        self.opentelemetry.update_span_data = Mock()
+        other_host = Mock('MockHost')
+        other_host._uuid = 'otherhost_uuid'
+
+        self.opentelemetry.start_task(tasks_data, False, 'myplay', self.mock_task)
+        self.opentelemetry.start_host(tasks_data, False, 'myplay', self.mock_host, self.mock_task)
+        self.opentelemetry.start_host(tasks_data, False, 'myplay', other_host, self.mock_task)
+        self.opentelemetry.finish_task(tasks_data, 'ok', self.my_task_result)
+        self.assertEqual(tasks_data['myuuid'].running_hosts, set(['otherhost_uuid']))
+
+        next_task = Task()
+        next_task._uuid = 'nextuuid'
+        next_task.get_name = MagicMock(return_value='nexttask')
+        next_task.get_path = MagicMock(return_value='/mypath')
+        # the first task still runs on the other host
+        self.opentelemetry.start_task(tasks_data, False, 'myplay', next_task)
+        self.assertEqual(list(tasks_data), ['myuuid', 'nextuuid'])
+
+        self.opentelemetry.finish_host(tasks_data, TaskResult(host=other_host, task=self.mock_task, return_data={}, task_fields={}))
+        third_task = Task()
+        third_task._uuid = 'thirduuid'
+        third_task.get_name = MagicMock(return_value='thirdtask')
+        third_task.get_path = MagicMock(return_value='/mypath')
+        self.opentelemetry.start_task(tasks_data, False, 'myplay', third_task)
+        self.assertEqual(list(tasks_data), ['thirduuid'])
+
+        # a late result of a forgotten task is ignored
+        self.opentelemetry.finish_task(tasks_data, 'ok', self.my_task_result)
+        self.assertEqual(self.opentelemetry.update_span_data.call_count, 1)
+
+    def test_trimmed_result(self):
+        result = TaskResult(host=self.mock_host, task=self.mock_task, task_fields=self.task_fields, return_data={
+            'rc': 2, 'msg': 'boom', 'stdout': 'x' * 1000, 'ansible_facts': {'a': 1},
+            'results': [generate_test_data(msg='ok'), generate_test_data(msg='ko', failed=True)],
+        })
+
+        trimmed = TrimmedResult(result)
+        self.assertEqual(trimmed._result, {'rc': 2, 'msg': 'boom', 'results': [{'msg': 'ko', 'failed': True}]})
+
     def test_get_error_message(self):
         test_cases = (
             ('my-exception', 'my-msg', None, 'my-exception'),
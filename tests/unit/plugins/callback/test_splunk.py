@@ -72,3 +72,18 @@ class TestSplunkClient(unittest.TestCase):
         self.assertEqual(sent_data['event']['timestamp'], '2020-12-01 00:00:00 +0000')
         self.assertEqual(sent_data['event']['host'], 'my-host')
         self.assertEqual(sent_data['event']['ip_address'], '1.2.3.4')
+
+    @patch('ansible_collections.community.general.plugins.callback.splunk.open_url')
+    def test_post_events_batches(self, open_url_mock):
+        events = []
+        for dummy in range(3):
+            result = TaskResult(host=self.mock_host, task=self.mock_task, return_data={}, task_fields={'args': {}})
+            events.append(self.splunk.build_event(False, None, 'OK', result, 1))
+
+        self.splunk.post_events('endpoint', 'token', False, events)
+
+        args, kwargs = open_url_mock.call_args
+        self.assertEqual(open_url_mock.call_count, 1)
+        sent_events = [json.loads(line) for line in args[1].split('\n')]
+        self.assertEqual(len(sent_events), 3)
+        self.assertEqual(sent_events[0]['event']['ansible_host'], 'myhost')
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.community.general.plugins.callback import sumologic
+from ansible_collections.community.general.plugins.plugin_utils.event_sender import PartialSendError
+
+
+def test_post_events_reports_unposted_hosts(mocker):
+    posted = []
+
+    def open_url(url, data, headers, method):
+        if headers['X-Sumo-Host'] == 'host2':
+            raise IOError('collector down')
+        posted.append((headers['X-Sumo-Host'], data))
+
+    mocker.patch.object(sumologic, 'open_url', side_effect=open_url)
+    source = sumologic.SumologicHTTPCollectorSource()
+    events = [('host1', 'a'), ('host2', 'b'), ('host1', 'c'), ('host3', 'd')]
+
+    with pytest.raises(PartialSendError) as e:
+        source.post_events('https://collector', events)
+    assert posted == [('host1', 'a\nc')]
+    assert e.value.unsent == [('host2', 'b'), ('host3', 'd')]
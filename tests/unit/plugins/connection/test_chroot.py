@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+
+from io import StringIO
+
+import pytest
+
+from ansible.errors import AnsibleError
+from ansible.playbook.play_context import PlayContext
+from ansible.plugins.loader import connection_loader
+from ansible_collections.community.general.plugins.connection.chroot import CAN_RESOLVE, _copy_fd
+from ansible_collections.community.general.tests.unit.compat.mock import MagicMock, patch
+
+
+pytestmark = [
+    pytest.mark.skipif(not hasattr(os, 'geteuid') or os.geteuid() != 0, reason='chroot connection requires root'),
+    pytest.mark.skipif(not CAN_RESOLVE, reason='direct transfer requires dir_fd support'),
+]
+
+
+@pytest.fixture
+def connection(tmp_path):
+    root = tmp_path / 'root'
+    (root / 'bin').mkdir(parents=True)
+    (root / 'bin' / 'sh').write_bytes(b'')
+    (root / 'bin' / 'sh').chmod(0o755)
+    (root / 'tmp').mkdir()
+
+    play_context = PlayContext()
+    play_context.remote_addr = str(root)
+    conn = connection_loader.get('community.general.chroot', play_context, StringIO())
+    conn.set_options(direct={'direct_transfer': True, 'chroot_exe': '/usr/sbin/chroot'})
+    conn._connected = True
+    return conn
+
+
+def test_copy_fd(tmp_path):
+    data = os.urandom(3 * 65536 + 17)
+    (tmp_path / 'in').write_bytes(data)
+    in_fd = os.open(str(tmp_path / 'in'), os.O_RDONLY)
+    out_fd = os.open(str(tmp_path / 'out'), os.O_WRONLY | os.O_CREAT)
+    try:
+        _copy_fd(in_fd, out_fd)
+    finally:
+        os.close(in_fd)
+        os.close(out_fd)
+    assert (tmp_path / 'out').read_bytes() == data
+
+
+def test_direct_put_and_fetch(connection, tmp_path):
+    (tmp_path / 'module.py').write_bytes(b'print("hello")\n')
+    (tmp_path / 'root' / 'tmp' / 'old').write_bytes(b'a much longer previous content')
+
+    with patch.object(connection, '_buffered_exec_command') as dd:
+        connection.put_file(str(tmp_path / 'module.py'), 'tmp/old')
+        connection.fetch_file('/tmp/old', str(tmp_path / 'fetched'))
+
+    dd.assert_not_called()
+    assert (tmp_path / 'root' / 'tmp' / 'old').read_bytes() == b'print("hello")\n'
+    assert (tmp_path / 'fetched').read_bytes() == b'print("hello")\n'
+
+
+@pytest.mark.parametrize('out_path', ['/escape/file', '/tmp/link'])
+def test_symlinks_use_dd(connection, tmp_path, out_path):
+    outside = tmp_path / 'outside'
+    outside.mkdir()
+    (tmp_path / 'root' / 'escape').symlink_to(str(outside))
+    (tmp_path / 'root' / 'tmp' / 'link').symlink_to(str(outside / 'file'))
+    (tmp_path / 'module.py').write_bytes(b'data')
+
+    process = MagicMock(returncode=0)
+    process.communicate.return_value = (b'', b'')
+    with patch.object(connection, '_buffered_exec_command', return_value=process) as dd:
+        connection.put_file(str(tmp_path / 'module.py'), out_path)
+
+    assert dd.call_args[0][0].startswith('dd of=%s ' % out_path)
+    assert not (outside / 'file').exists()
+
+
+def test_missing_source(connection, tmp_path):
+    with pytest.raises(AnsibleError, match='does not exist'):
+        connection.put_file(str(tmp_path / 'missing'), '/tmp/file')
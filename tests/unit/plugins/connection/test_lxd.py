@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import socket
+import threading
+
+from io import StringIO
+
+import pytest
+
+from ansible.playbook.play_context import PlayContext
+from ansible.plugins.loader import connection_loader
+from ansible_collections.community.general.plugins.connection.lxd import WebSocket
+from ansible_collections.community.general.tests.unit.compat.mock import MagicMock, patch
+
+
+@pytest.fixture
+def websockets():
+    left, right = socket.socketpair()
+    yield WebSocket(left), WebSocket(right)
+    left.close()
+    right.close()
+
+
+@pytest.mark.parametrize('size', [0, 1, 125, 126, 65535, 65536, 200000])
+def test_websocket_roundtrip(websockets, size):
+    client, server = websockets
+    data = bytes(bytearray(i % 256 for i in range(size)))
+    sender = threading.Thread(target=client.send, args=(data,))
+    sender.start()
+    assert server.recv() == data
+    sender.join()
+
+
+def test_websocket_end_of_stream(websockets):
+    client, server = websockets
+    server.send(b'', WebSocket.OP_PING)
+    server.send(b'output')
+    server.send(b'', WebSocket.OP_TEXT)
+    assert client.recv() == b'output'
+    assert client.recv() is None
+    # the ping has been answered with a pong
+    assert server._read(2)[0:1] == b'\x8a'
+    server.close()
+    assert client.recv() is None
+
+
+def _fake_exec(stdin_data):
+    """Serve the websockets of an exec operation like LXD does."""
+    pairs = dict((fd, socket.socketpair()) for fd in ('0', '1', '2', 'control'))
+
+    def serve():
+        stdin = WebSocket(pairs['0'][1])
+        while True:
+            data = stdin.recv()
+            if data is None:
+                break
+            stdin_data.append(data)
+        stdout = WebSocket(pairs['1'][1])
+        stdout.send(b''.join(stdin_data).upper())
+        stdout.send(b'', WebSocket.OP_TEXT)
+        stderr = WebSocket(pairs['2'][1])
+        stderr.send(b'warning')
+        stderr.close()
+
+    server = threading.Thread(target=serve)
+    server.daemon = True
+    server.start()
+    secrets = dict((fd, 'secret-' + fd) for fd in pairs)
+    return pairs, secrets, server
+
+
+def test_api_exec_command():
+    connection = connection_loader.get('community.general.lxd', PlayContext(), StringIO())
+    connection.set_options(var_options={'ansible_lxd_use_api': True, 'ansible_lxd_project': 'myproject', 'ansible_host': 'c1'})
+
+    stdin_data = []
+    pairs, secrets, server = _fake_exec(stdin_data)
+    client = MagicMock()
+    client.connection.path = '/run/lxd.socket'
+    client.do.side_effect = [
+        {'type': 'async', 'operation': '/1.0/operations/1234', 'metadata': {'metadata': {'fds': secrets}}},
+        {'type': 'sync', 'metadata': {'status': 'Success', 'metadata': {'return': 3}}},
+    ]
+
+    def open_websocket(path, url):
+        fd = url.rsplit('secret-', 1)[1]
+        return WebSocket(pairs[fd][0])
+
+    with patch.object(connection, '_api_connect', return_value=client):
+        with patch.object(WebSocket, 'open', side_effect=open_websocket):
+            rc, stdout, stderr = connection.exec_command('cat', in_data=b'module source' * 10000)
+    server.join()
+
+    assert (rc, stdout, stderr) == (3, u'MODULE SOURCE' * 10000, u'warning')
+    method, url, body = client.do.call_args_list[0][0]
+    assert (method, url) == ('POST', '/1.0/instances/c1/exec?project=myproject')
+    assert body['command'] == ['/bin/sh', '-c', u'cat']
+    assert client.do.call_args_list[1][0] == ('GET', '/1.0/operations/1234/wait')
+
+
+def test_api_falls_back_to_cli_for_remotes():
+    connection = connection_loader.get('community.general.lxd', PlayContext(), StringIO())
+    connection.set_options(var_options={'ansible_lxd_use_api': True, 'ansible_lxd_remote': 'other'})
+    connection._lxc_cmd = '/usr/bin/lxc'
+    connection._connect()
+
+    assert connection._client is None
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+
+from io import StringIO
+
+import pytest
+
+from ansible.errors import AnsibleConnectionFailure
+from ansible.playbook.play_context import PlayContext
+from ansible.plugins.loader import connection_loader
+
+
+# runs the service command read from stdin, or the command given as last argument
+FAKE_QVM_RUN = '''#!/bin/sh
+for last; do :; done
+case "$*" in
+  *--service*) read -r cmd; exec /bin/sh -c "$cmd" ;;
+  *) exec /bin/sh -c "$last" ;;
+esac
+'''
+
+
+@pytest.fixture
+def connection(tmp_path, monkeypatch):
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    (bindir / 'qvm-run').write_text(FAKE_QVM_RUN)
+    (bindir / 'qvm-run').chmod(0o755)
+    monkeypatch.setenv('PATH', '%s%s%s' % (bindir, os.pathsep, os.environ['PATH']))
+
+    play_context = PlayContext()
+    play_context.remote_addr = 'vm'
+    conn = connection_loader.get('community.general.qubes', play_context, StringIO())
+    conn._connected = True
+    return conn
+
+
+def test_put_and_fetch_file(connection, tmp_path):
+    data = os.urandom(5 * 65536 + 3)
+    (tmp_path / 'source').write_bytes(data)
+
+    connection.put_file(str(tmp_path / 'source'), str(tmp_path / 'remote'))
+    assert (tmp_path / 'remote').read_bytes() == data
+
+    connection.fetch_file(str(tmp_path / 'remote'), str(tmp_path / 'fetched'))
+    assert (tmp_path / 'fetched').read_bytes() == data
+
+
+def test_checksum_mismatch(connection, tmp_path, monkeypatch):
+    (tmp_path / 'source').write_bytes(b'data')
+    monkeypatch.setattr(connection, '_qubes', lambda cmd, in_data=None, shell=None: (0, b'0' * 64 + b'  file\n', b''))
+
+    with pytest.raises(AnsibleConnectionFailure, match='Checksum mismatch'):
+        connection.put_file(str(tmp_path / 'source'), str(tmp_path / 'remote'))
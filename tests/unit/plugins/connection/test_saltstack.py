@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import base64
+import hashlib
+import os
+import subprocess
+
+from io import StringIO
+
+import pytest
+
+from ansible.errors import AnsibleError
+from ansible.playbook.play_context import PlayContext
+from ansible.plugins.loader import connection_loader
+from ansible_collections.community.general.plugins.connection import saltstack
+
+
+class FakeLocalClient(object):
+    """Run the execution module functions used for file transfers on the local filesystem."""
+
+    def __init__(self, corrupt=False):
+        self.calls = []
+        self.corrupt = corrupt
+
+    def cmd(self, host, function, args):
+        self.calls.append(function)
+        if function == 'hashutil.base64_decodefile':
+            with open(args[1], 'wb') as f:
+                f.write(base64.b64decode(args[0]))
+            result = True
+        elif function == 'cmd.exec_code_all':
+            p = subprocess.Popen([args[0], '-c', args[1]], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            stdout, stderr = p.communicate()
+            result = {'retcode': p.returncode, 'stdout': stdout, 'stderr': stderr}
+        elif function == 'file.get_hash':
+            if not os.path.exists(args[0]):
+                result = 'ERROR: %s does not exist' % args[0]
+            else:
+                with open(args[0], 'rb') as f:
+                    result = hashlib.sha256(f.read() + (b'x' if self.corrupt else b'')).hexdigest()
+        return {host: result}
+
+
+@pytest.fixture
+def connection():
+    play_context = PlayContext()
+    play_context.remote_addr = 'minion'
+    conn = connection_loader.get('community.general.saltstack', play_context, StringIO())
+    conn.client = FakeLocalClient()
+    conn._connected = True
+    return conn
+
+
+def test_put_and_fetch_file(connection, tmp_path, monkeypatch):
+    monkeypatch.setattr(saltstack, 'CHUNK_SIZE', 1000)
+    data = os.urandom(4500)
+    (tmp_path / 'source').write_bytes(data)
+
+    connection.put_file(str(tmp_path / 'source'), str(tmp_path / 'remote'))
+    assert (tmp_path / 'remote').read_bytes() == data
+    assert connection.client.calls.count('cmd.exec_code_all') == 5
+
+    del connection.client.calls[:]
+    connection.fetch_file(str(tmp_path / 'remote'), str(tmp_path / 'fetched'))
+    assert (tmp_path / 'fetched').read_bytes() == data
+    # the short read of the last chunk ends the transfer
+    assert connection.client.calls.count('cmd.exec_code_all') == 5
+
+
+def test_fetch_file_of_chunk_size(connection, tmp_path, monkeypatch):
+    monkeypatch.setattr(saltstack, 'CHUNK_SIZE', 1000)
+    data = os.urandom(2000)
+    (tmp_path / 'remote').write_bytes(data)
+
+    connection.fetch_file(str(tmp_path / 'remote'), str(tmp_path / 'fetched'))
+    assert (tmp_path / 'fetched').read_bytes() == data
+    assert connection.client.calls.count('cmd.exec_code_all') == 3
+
+
+def test_put_empty_file(connection, tmp_path):
+    (tmp_path / 'source').write_bytes(b'')
+    (tmp_path / 'remote').write_bytes(b'old content')
+
+    connection.put_file(str(tmp_path / 'source'), str(tmp_path / 'remote'))
+    assert (tmp_path / 'remote').read_bytes() == b''
+
+
+def test_put_checksum_mismatch(connection, tmp_path):
+    connection.client.corrupt = True
+    (tmp_path / 'source').write_bytes(b'data')
+
+    with pytest.raises(AnsibleError, match='checksum mismatch'):
+        connection.put_file(str(tmp_path / 'source'), str(tmp_path / 'remote'))
+
+
+def test_fetch_missing_file(connection, tmp_path):
+    with pytest.raises(AnsibleError, match='does not exist'):
+        connection.fetch_file(str(tmp_path / 'missing'), str(tmp_path / 'fetched'))
@@ -11,6 +11,7 @@ import os
 
 from ansible.errors import AnsibleError
 from ansible.inventory.data import InventoryData
+from ansible_collections.community.general.tests.unit.compat.mock import MagicMock
 from ansible_collections.community.general.plugins.inventory.lxd import InventoryModule
 
 
@@ -105,3 +106,34 @@ def test_build_inventory_groups_with_no_groupselection(inventory):
         if generated_data[key] != value:
             eq = False
     assert eq
+
+
+def test_get_instance_data_recursive(inventory):
+    """Store the instances returned by a single recursive request like the per instance requests."""
+    expected = inventory.data['instances']
+    metadata = []
+    for name, instance in expected.items():
+        full = dict(instance['instances']['metadata'])
+        full['state'] = instance['state']['metadata']
+        full['snapshots'] = None
+        metadata.append(full)
+
+    inventory.data = {}
+    inventory.socket = MagicMock()
+    inventory.socket.do.return_value = {'type': 'sync', 'metadata': metadata}
+
+    assert inventory.get_instance_data_recursive()
+    inventory.socket.do.assert_called_once_with('GET', '/1.0/instances?recursion=2')
+    for name, instance in expected.items():
+        assert inventory.data['instances'][name]['instances']['metadata'] == instance['instances']['metadata']
+        assert inventory.data['instances'][name]['state']['metadata'] == instance['state']['metadata']
+
+
+def test_get_instance_data_recursive_without_state(inventory):
+    """Older servers only return the instance urls, the data has to be requested per instance then."""
+    inventory.data = {}
+    inventory.socket = MagicMock()
+    inventory.socket.do.return_value = {'type': 'sync', 'metadata': ['/1.0/instances/vlantest']}
+
+    assert not inventory.get_instance_data_recursive()
+    assert inventory.data == {}
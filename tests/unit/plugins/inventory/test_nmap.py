@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import time
+
+import pytest
+
+from ansible.errors import AnsibleParserError
+from ansible.inventory.data import InventoryData
+from ansible.plugins.loader import inventory_loader
+
+
+# reports one host per target, named after the first address of the target
+FAKE_NMAP = '''#!/bin/sh
+for target; do :; done
+echo "$target" >> "$(dirname "$0")/targets"
+ip="${target%/*}"
+cat <<EOT
+<?xml version="1.0" encoding="UTF-8"?>
+<nmaprun scanner="nmap" args="nmap -oX - $target">
+<host><status state="down" reason="no-response"/><address addr="192.0.2.1" addrtype="ipv4"/></host>
+<host><status state="up" reason="echo-reply"/>
+<address addr="$ip" addrtype="ipv4"/><address addr="52:54:00:12:34:56" addrtype="mac"/>
+<hostnames><hostname name="host-$ip.example.com" type="PTR"/></hostnames>
+<ports><extraports state="closed" count="998"/>
+<port protocol="tcp" portid="22"><state state="open" reason="syn-ack"/><service name="ssh" method="table" conf="3"/></port>
+<port protocol="tcp" portid="8443"><state state="filtered" reason="no-response"/></port>
+</ports></host>
+<host><status state="up" reason="echo-reply"/><address addr="${ip%.*}.250" addrtype="ipv4"/>
+<hostnames><hostname name="250.2.0.192.in-addr.arpa" type="PTR"/></hostnames></host>
+</nmaprun>
+EOT
+'''
+
+
+@pytest.fixture
+def nmap(tmp_path):
+    path = tmp_path / 'nmap'
+    path.write_text(FAKE_NMAP)
+    path.chmod(0o755)
+    return path
+
+
+def run_inventory(nmap, mocker, tmp_path, **options):
+    inventory = inventory_loader.get('community.general.nmap')
+    mocker.patch.object(inventory, '_read_config_data')
+    mocker.patch('ansible_collections.community.general.plugins.inventory.nmap.get_bin_path', return_value=str(nmap))
+    options.setdefault('plugin', 'community.general.nmap')
+    inventory.set_options(direct=options)
+    inventory.parse(InventoryData(), None, str(tmp_path / 'nmap.yml'), cache=False)
+    return inventory
+
+
+def test_xml_parsing(nmap, mocker, tmp_path):
+    inventory = run_inventory(nmap, mocker, tmp_path, address='10.0.0.1')
+
+    hosts = inventory.inventory.hosts
+    assert sorted(hosts) == ['10.0.0.250', 'host-10.0.0.1.example.com']
+    host = hosts['host-10.0.0.1.example.com'].vars
+    assert host['ip'] == '10.0.0.1'
+    assert host['ports'] == [
+        {'port': '22', 'protocol': 'tcp', 'state': 'open', 'service': 'ssh'},
+        {'port': '8443', 'protocol': 'tcp', 'state': 'filtered', 'service': 'unknown'},
+    ]
+    assert 'ports' not in hosts['10.0.0.250'].vars
+
+
+def test_split_prefix(nmap, mocker, tmp_path):
+    inventory = run_inventory(nmap, mocker, tmp_path, address='10.1.0.0/22', split_prefix=24, scan_workers=3)
+
+    targets = (tmp_path / 'targets').read_text().splitlines()
+    assert sorted(targets) == ['10.1.0.0/24', '10.1.1.0/24', '10.1.2.0/24', '10.1.3.0/24']
+    assert len(inventory.inventory.hosts) == 8
+    assert inventory.inventory.hosts['host-10.1.3.0.example.com'].vars['ip'] == '10.1.3.0'
+
+
+def test_split_prefix_ignores_ranges(nmap, mocker, tmp_path):
+    run_inventory(nmap, mocker, tmp_path, address='10.2.0.1-20', split_prefix=24)
+
+    assert (tmp_path / 'targets').read_text().splitlines() == ['10.2.0.1-20']
+
+
+def test_nmap_failure(tmp_path, mocker):
+    nmap = tmp_path / 'nmap'
+    nmap.write_text('#!/bin/sh\necho "bad target" >&2\nexit 1\n')
+    nmap.chmod(0o755)
+
+    with pytest.raises(AnsibleParserError, match='Failed to run nmap, rc=1: bad target'):
+        run_inventory(nmap, mocker, tmp_path, address='10.3.0.0/23', split_prefix=24)
+
+
+# the scan of 10.4.3.0/24 fails once the other scans are running, these never end on their own
+FAKE_NMAP_FAILING = '''#!/bin/sh
+for target; do :; done
+dir="$(dirname "$0")"
+if [ "$target" = 10.4.3.0/24 ]; then
+  while [ "$(ls "$dir/pids" | wc -l)" -lt 3 ]; do sleep 0.05; done
+  echo "bad target" >&2
+  exit 1
+fi
+echo $$ > "$dir/pids/$$"
+exec sleep 60
+'''
+
+
+def test_split_prefix_failure_stops_scans(tmp_path, mocker):
+    nmap = tmp_path / 'nmap'
+    nmap.write_text(FAKE_NMAP_FAILING)
+    nmap.chmod(0o755)
+    (tmp_path / 'pids').mkdir()
+
+    start = time.time()
+    with pytest.raises(AnsibleParserError, match='bad target'):
+        run_inventory(nmap, mocker, tmp_path, address='10.4.0.0/22', split_prefix=24, scan_workers=4)
+    assert time.time() - start < 30
+
+    pids = [int(pid) for pid in os.listdir(str(tmp_path / 'pids'))]
+    assert len(pids) == 3
+    for pid in pids:
+        with pytest.raises(OSError):
+            os.kill(pid, 0)
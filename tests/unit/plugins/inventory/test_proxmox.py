@@ -606,3 +606,107 @@ def test_populate(inventory, mocker):
 
     # check that offline node is in inventory
     assert inventory.inventory.get_host('testnode2')
+
+
+def get_json_with_resources(url):
+    if url == "https://localhost:8006/api2/json/cluster/resources?type=vm":
+        return [{"id": "lxc/100", "type": "lxc", "vmid": 100, "node": "testnode", "status": "running"},
+                {"id": "qemu/101", "type": "qemu", "vmid": 101, "node": "testnode", "status": "running"},
+                {"id": "qemu/102", "type": "qemu", "vmid": 102, "node": "testnode", "status": "stopped"},
+                {"id": "qemu/103", "type": "qemu", "vmid": 103, "node": "testnode", "status": "running"},
+                {"id": "storage/testnode/local", "type": "storage", "node": "testnode", "status": "available"}]
+    if url.endswith('/snapshot'):
+        return get_vm_snapshots(None, None, None, None)
+    assert not url.endswith('/status/current')
+    return get_json(url)
+
+
+def test_populate_prefetch(mocker):
+    inventory = InventoryModule()
+    inventory.inventory = InventoryData()
+    inventory.proxmox_user = 'root@pam'
+    inventory.proxmox_password = 'password'
+    inventory.proxmox_url = 'https://localhost:8006'
+    inventory.credentials = {'ticket': 'ticket'}
+    inventory.cache_key = 'proxmox'
+    inventory.use_cache = False
+    inventory._cache = {}
+
+    requested = []
+
+    def session_get(url, headers):
+        requested.append(url)
+        response = mocker.MagicMock(status_code=200)
+        response.json.return_value = {'data': get_json_with_resources(url)}
+        return response
+
+    def prefetch_get_option(option):
+        if option == 'fetch_workers':
+            return 4
+        if option == 'use_cluster_resources':
+            return True
+        return get_option(option)
+
+    inventory._get_auth = mocker.MagicMock(side_effect=get_auth)
+    inventory._get_session = mocker.MagicMock(return_value=mocker.MagicMock(get=session_get))
+    inventory.get_option = mocker.MagicMock(side_effect=prefetch_get_option)
+    inventory._populate()
+
+    # every URL is only requested once, even though it is read again while populating
+    assert len(requested) == len(set(requested))
+    assert "https://localhost:8006/api2/json/nodes/testnode/qemu/103/agent/network-get-interfaces" in requested
+
+    # the status comes from the cluster resources
+    assert inventory.inventory.get_host('test-qemu-windows').get_vars()['proxmox_status'] == 'stopped'
+    assert 'eth0' in [d['name'] for d in inventory.inventory.get_host('test-qemu').get_vars()['proxmox_agent_interfaces']]
+
+
+def test_populate_incremental_refresh(mocker):
+    cache = {}
+    requested = []
+
+    def get_json_locked(url):
+        data = get_json_with_resources(url)
+        if url == "https://localhost:8006/api2/json/nodes/testnode/qemu":
+            data[0] = dict(data[0], lock='backup')
+        return data
+
+    def incremental_get_option(option):
+        if option == 'cache_timeout':
+            return 3600
+        return get_option(option)
+
+    def populate(get_json):
+        def session_get(url, headers):
+            requested.append(url)
+            response = mocker.MagicMock(status_code=200)
+            response.json.return_value = {'data': get_json(url)}
+            return response
+
+        inventory = InventoryModule()
+        inventory.inventory = InventoryData()
+        inventory.proxmox_url = 'https://localhost:8006'
+        inventory.credentials = {'ticket': 'ticket'}
+        inventory.cache_key = 'proxmox'
+        inventory.use_cache = True
+        inventory.incremental_refresh = True
+        inventory._cache = cache
+        inventory._get_auth = mocker.MagicMock(side_effect=get_auth)
+        inventory._get_session = mocker.MagicMock(return_value=mocker.MagicMock(get=session_get))
+        inventory._get_vm_status = mocker.MagicMock(side_effect=get_vm_status)
+        inventory.get_option = mocker.MagicMock(side_effect=incremental_get_option)
+        inventory._populate()
+        return inventory
+
+    populate(get_json_with_resources)
+    assert "https://localhost:8006/api2/json/nodes/testnode/qemu/102/config" in requested
+
+    # only the listings and the guest whose lock changed are requested again
+    del requested[:]
+    inventory = populate(get_json_locked)
+    guest_urls = [url for url in requested if inventory.GUEST_URL.match(url[len(inventory.proxmox_url):])]
+    assert guest_urls
+    assert all('/qemu/101/' in url for url in guest_urls)
+    assert "https://localhost:8006/api2/json/nodes/testnode/qemu" in requested
+    assert 'eth0' in [d['name'] for d in inventory.inventory.get_host('test-qemu').get_vars()['proxmox_agent_interfaces']]
+    assert inventory.inventory.get_host('test-qemu-windows').get_vars()['proxmox_ostype'] == 'win8'
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+
+import pytest
+
+from ansible.inventory.data import InventoryData
+from ansible.parsing.dataloader import DataLoader
+from ansible.plugins.loader import inventory_loader
+
+
+LIST_VMS = b'''Name:            vm1
+Groups:          /
+State:           running (since 2022-01-10T08:00:00.000000000)
+Name:            vm2
+Groups:          /web
+State:           running (since 2022-01-10T09:00:00.000000000)
+Name:            vm3
+Groups:          /
+State:           powered off (since 2022-01-09T08:00:00.000000000)
+'''.splitlines()
+
+# vm1 reports VirtualBox 6 output, vm2 VirtualBox 7 output, vm3 has no properties
+FAKE_VBOXMANAGE = '''#!/bin/sh
+echo "$*" >> "$(dirname "$0")/calls"
+if [ "$1" = list ]; then
+  cat "$(dirname "$0")/vms"
+  exit 0
+fi
+case "$3" in
+  vm1)
+    echo "Name: /VirtualBox/GuestInfo/Net/0/V4/IP, value: 10.0.0.1, timestamp: 1641801600000000000, flags: "
+    echo "Name: /VirtualBox/GuestInfo/OS/LoggedInUsersList, value: alice, bob, timestamp: 1641801600000000000, flags: TRANSIENT"
+    ;;
+  vm2)
+    echo "/VirtualBox/GuestInfo/Net/0/V4/IP = '10.0.0.2' @ 2022-01-10T09:00:00.000000000Z"
+    echo "/VirtualBox/GuestInfo/OS/LoggedInUsersList = 'carol' @ 2022-01-10T09:00:00.000000000Z [TRANSIENT]"
+    ;;
+esac
+'''
+
+
+@pytest.fixture
+def vboxmanage(tmp_path):
+    path = tmp_path / 'VBoxManage'
+    path.write_text(FAKE_VBOXMANAGE)
+    path.chmod(0o755)
+    return path
+
+
+def make_inventory(vboxmanage, cache):
+    inventory = inventory_loader.get('community.general.virtualbox')
+    inventory.inventory = InventoryData()
+    inventory._vbox_path = str(vboxmanage)
+    inventory._cache = cache
+    inventory._properties_cache_key = 'vbox_properties'
+    inventory.set_options(direct={
+        'plugin': 'community.general.virtualbox',
+        'enumerate_properties': True,
+        'enumerate_workers': 2,
+        'query': {'users': '/VirtualBox/GuestInfo/OS/LoggedInUsersList'},
+    })
+    return inventory
+
+
+def test_enumerate_properties(vboxmanage):
+    cache = {}
+    inventory = make_inventory(vboxmanage, cache)
+    inventory._populate_from_source(LIST_VMS)
+
+    calls = (vboxmanage.parent / 'calls').read_text().splitlines()
+    assert sorted(calls) == ['guestproperty enumerate vm1', 'guestproperty enumerate vm2', 'guestproperty enumerate vm3']
+    vm1 = inventory.inventory.get_host('vm1').vars
+    vm2 = inventory.inventory.get_host('vm2').vars
+    assert (vm1['ansible_host'], vm1['users']) == ('10.0.0.1', 'alice, bob')
+    assert (vm2['ansible_host'], vm2['users']) == ('10.0.0.2', 'carol')
+    assert inventory.inventory.get_host('vm3').vars['users'] is None
+    assert set(cache['vbox_properties']) == set(['vm1', 'vm2', 'vm3'])
+
+
+def test_refresh_reuses_cached_properties(vboxmanage, tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(vboxmanage.parent), prepend=os.pathsep)
+    vms = vboxmanage.parent / 'vms'
+    vms.write_bytes(b'\n'.join(LIST_VMS))
+    config = tmp_path / 'vbox.yml'
+    config.write_text(
+        'plugin: community.general.virtualbox\n'
+        'enumerate_properties: true\n'
+        'cache: true\n'
+        'cache_plugin: ansible.builtin.jsonfile\n'
+        'cache_connection: %s\n' % (tmp_path / 'cache')
+    )
+
+    def parse(cache):
+        inventory = inventory_loader.get('community.general.virtualbox')
+        inventory.parse(InventoryData(), DataLoader(), str(config), cache=cache)
+        inventory._cache.update_cache_if_changed()
+        return inventory
+
+    parse(cache=True)
+    calls = vboxmanage.parent / 'calls'
+    assert len([c for c in calls.read_text().splitlines() if c.startswith('guestproperty')]) == 3
+
+    # vm2 has been restarted, the refresh must only enumerate its properties again
+    calls.write_text('')
+    vms.write_bytes(b'\n'.join(LIST_VMS).replace(b'09:00:00', b'10:00:00'))
+    inventory = parse(cache=False)
+
+    assert calls.read_text().splitlines() == ['list -l vms', 'guestproperty enumerate vm2']
+    assert inventory.inventory.get_host('vm1').vars['ansible_host'] == '10.0.0.1'
+    assert inventory.inventory.get_host('vm2').vars['ansible_host'] == '10.0.0.2'
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+
+import pytest
+
+from ansible.parsing.dataloader import DataLoader
+from ansible.plugins.loader import lookup_loader
+from ansible_collections.community.general.plugins.lookup.filetree import iter_filetree, walk_tree
+
+
+@pytest.fixture
+def trees(tmp_path):
+    first = tmp_path / 'first'
+    (first / 'a' / 'b').mkdir(parents=True)
+    (first / 'a' / 'b' / 'c.txt').write_text(u'c')
+    (first / 'a' / 'd.txt').write_text(u'd')
+    (first / 'e.txt').write_text(u'e')
+    (first / 'link').symlink_to(str(first / 'a'))
+    second = tmp_path / 'second'
+    (second / 'a').mkdir(parents=True)
+    (second / 'a' / 'd.txt').write_text(u'other d')
+    (second / 'f.txt').write_text(u'f')
+    return str(first), str(second)
+
+
+def test_walk_tree_matches_os_walk(trees):
+    for path in trees:
+        expected = []
+        for root, dirs, files in os.walk(path, topdown=True):
+            for entry in dirs + files:
+                expected.append(os.path.relpath(os.path.join(root, entry), path))
+        assert list(walk_tree(path)) == expected
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_iter_filetree(trees, workers):
+    results = list(iter_filetree(trees, workers))
+
+    paths = [(os.path.basename(props['root']), props['path']) for props in results]
+    assert sorted(paths) == sorted([
+        ('first', 'a'), ('first', 'a/b'), ('first', 'a/b/c.txt'), ('first', 'a/d.txt'),
+        ('first', 'e.txt'), ('first', 'link'), ('second', 'f.txt'),
+    ])
+    assert [path for root, path in paths] == [path for path in walk_tree(trees[0])] + ['f.txt']
+    link = [props for props in results if props['path'] == 'link'][0]
+    assert link['state'] == 'link'
+    assert link['src'] == os.path.join(trees[0], 'a')
+    assert all(props['uid'] == os.getuid() for props in results)
+
+
+def test_iter_filetree_is_lazy(trees):
+    walk = iter_filetree(trees)
+    assert next(walk)['path'] == next(walk_tree(trees[0]))
+    walk.close()
+
+
+def test_lookup(trees):
+    lookup = lookup_loader.get('community.general.filetree', loader=DataLoader())
+    results = lookup.run([trees[0] + '/'], {}, workers=2)
+
+    assert [props['path'] for props in results] == list(walk_tree(trees[0]))
+    mode = os.stat(os.path.join(trees[0], 'e.txt')).st_mode & 0o7777
+    assert [props['mode'] for props in results if props['path'] == 'e.txt'] == ['0%03o' % mode]
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible.module_utils.six import StringIO
+from ansible.module_utils.six.moves.urllib.parse import parse_qs, urlparse
+from ansible_collections.community.general.plugins.module_utils.identity.keycloak import keycloak
+from ansible_collections.community.general.plugins.module_utils.identity.keycloak.keycloak import KeycloakAPI
+from ansible_collections.community.general.tests.unit.compat.mock import MagicMock
+
+BASE_URL = 'http://keycloak.url/auth'
+GROUPS_URL = BASE_URL + '/admin/realms/master/groups'
+CLIENTSCOPES_URL = BASE_URL + '/admin/realms/master/client-scopes'
+
+GROUPS = [{'id': 'id-%d' % i, 'name': 'group%d' % i, 'subGroups': []} for i in range(250)]
+GROUPS[3]['subGroups'] = [{'id': 'sub', 'name': 'group42'}]
+
+
+@pytest.fixture
+def requests(mocker):
+    requests = []
+
+    def _open_url(url, method=None, **kwargs):
+        requests.append((method, url))
+        parsed = urlparse(url)
+        path = BASE_URL + parsed.path[len('/auth'):]
+        query = parse_qs(parsed.query)
+        if method != 'GET':
+            return StringIO('')
+        if path == GROUPS_URL:
+            groups = GROUPS
+            if 'search' in query:
+                search = query['search'][0]
+                groups = [g for g in groups if search in g['name'] or any(search in s['name'] for s in g['subGroups'])]
+            if 'first' in query:
+                first = int(query['first'][0])
+                groups = groups[first:first + int(query['max'][0])]
+            return StringIO(json.dumps(groups))
+        if path.startswith(GROUPS_URL + '/'):
+            return StringIO(json.dumps({'id': path.rsplit('/', 1)[1]}))
+        if path == CLIENTSCOPES_URL:
+            return StringIO(json.dumps([{'id': 'cs-1', 'name': 'email'}, {'id': 'cs-2', 'name': 'profile'}]))
+        if path.startswith(CLIENTSCOPES_URL + '/'):
+            return StringIO(json.dumps({'id': path.rsplit('/', 1)[1]}))
+        raise AssertionError('unexpected request %s' % url)
+
+    mocker.patch.object(keycloak, 'open_url', side_effect=_open_url)
+    return requests
+
+
+@pytest.fixture
+def api():
+    module = MagicMock()
+    module.params = {'auth_keycloak_url': BASE_URL, 'validate_certs': True}
+    module.fail_json.side_effect = AssertionError
+    return KeycloakAPI(module, {})
+
+
+def test_group_by_name_searches(api, requests):
+    assert api.get_group_by_name('group42') == {'id': 'id-42'}
+    # group3 has a subgroup named group42, it is skipped
+    assert [url for method, url in requests] == [
+        GROUPS_URL + '?search=group42&first=0&max=100',
+        GROUPS_URL + '/id-42',
+    ]
+
+    assert api.get_group_by_name('group42') == {'id': 'id-42'}
+    assert len(requests) == 3
+    assert api.get_group_by_name('missing') is None
+
+
+def test_group_search_pages(api, requests, mocker):
+    mocker.patch.object(keycloak, 'GROUP_SEARCH_PAGE_SIZE', 1)
+    assert api.get_group_by_name('group42') == {'id': 'id-42'}
+    assert [url for method, url in requests] == [
+        GROUPS_URL + '?search=group42&first=0&max=1',
+        GROUPS_URL + '?search=group42&first=1&max=1',
+        GROUPS_URL + '/id-42',
+    ]
+
+
+def test_group_listing_cache(api, requests):
+    assert len(api.get_groups()) == 250
+    assert api.get_group_by_name('group7') == {'id': 'id-7'}
+    # the index of the listing is used, no search request
+    assert [url for method, url in requests] == [GROUPS_URL, GROUPS_URL + '/id-7']
+
+    api.create_group({'name': 'new'})
+    api.get_groups()
+    assert requests[-2:] == [('POST', GROUPS_URL), ('GET', GROUPS_URL)]
+
+
+def test_clientscope_listing_cache(api, requests):
+    assert api.get_clientscope_by_name('profile') == {'id': 'cs-2'}
+    assert api.get_clientscope_by_name('email') == {'id': 'cs-1'}
+    assert api.get_clientscope_by_name('missing') is None
+    assert [url for method, url in requests].count(CLIENTSCOPES_URL) == 1
+
+    api.delete_clientscope(name='email')
+    assert requests[-1] == ('DELETE', CLIENTSCOPES_URL + '/cs-1')
+    api.get_clientscopes()
+    assert requests[-1] == ('GET', CLIENTSCOPES_URL)
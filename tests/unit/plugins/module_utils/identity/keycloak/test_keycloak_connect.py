@@ -1,6 +1,7 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import json
 import pytest
 from itertools import count
 
@@ -10,6 +11,7 @@ from ansible_collections.community.general.plugins.module_utils.identity.keycloa
 )
 from ansible.module_utils.six import StringIO
 from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.parse import parse_qsl
 
 module_params_creds = {
     'auth_keycloak_url': 'http://keycloak.url/auth',
@@ -159,3 +161,54 @@ def test_json_without_token_returned(mock_json_without_token_returned):
         'Could not obtain access token from http://keycloak.url'
         '/auth/realms/master/protocol/openid-connect/token'
     )
+
+
+@pytest.fixture()
+def mock_token_grants(mocker):
+    def _token(*args, **kwargs):
+        payload = dict(parse_qsl(kwargs['data']))
+        grants.append(payload['grant_type'])
+        return StringIO(json.dumps({
+            'access_token': 'token%d' % len(grants),
+            'expires_in': 60,
+            'refresh_token': 'refresh%d' % len(grants),
+            'refresh_expires_in': 1800,
+        }))
+    grants = []
+    mocker.patch(
+        'ansible_collections.community.general.plugins.module_utils.identity.keycloak.keycloak.open_url',
+        side_effect=_token,
+    )
+    return grants
+
+
+def test_token_cache(mock_token_grants, mocker, tmp_path):
+    params = dict(module_params_creds, auth_token_cache=str(tmp_path / 'cache'))
+    time = mocker.patch('ansible_collections.community.general.plugins.module_utils.identity.keycloak.keycloak.time.time')
+
+    time.return_value = 1000
+    assert get_token(params)['Authorization'] == 'Bearer token1'
+    assert get_token(params)['Authorization'] == 'Bearer token1'
+    cache_files = list((tmp_path / 'cache').iterdir())
+    assert len(cache_files) == 1
+    assert cache_files[0].stat().st_mode & 0o777 == 0o600
+
+    # close to expiry, the refresh token is used
+    time.return_value = 1040
+    assert get_token(params)['Authorization'] == 'Bearer token2'
+    # another user does not share the cache
+    assert get_token(dict(params, auth_username='other'))['Authorization'] == 'Bearer token3'
+    # the refresh token expired as well
+    time.return_value = 5000
+    assert get_token(params)['Authorization'] == 'Bearer token4'
+    assert mock_token_grants == ['password', 'refresh_token', 'password', 'password']
+
+
+def test_token_cache_not_private(mock_token_grants, tmp_path):
+    params = dict(module_params_creds, auth_token_cache=str(tmp_path))
+    get_token(params)
+    cache_file = list(tmp_path.iterdir())[0]
+    cache_file.chmod(0o644)
+
+    assert get_token(params)['Authorization'] == 'Bearer token2'
+    assert mock_token_grants == ['password', 'password']
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import threading
+
+import pytest
+
+from ansible.module_utils.six.moves import BaseHTTPServer, socketserver
+from ansible.module_utils.six.moves.urllib.parse import parse_qs, urlparse
+from ansible_collections.community.general.plugins.module_utils.redfish_utils import RedfishUtils
+from ansible_collections.community.general.tests.unit.compat.mock import MagicMock
+
+
+RESOURCES = {
+    '/redfish/v1/': {'ProtocolFeaturesSupported': {}},
+    '/redfish/v1/Systems/1': {'Memory': {'@odata.id': '/redfish/v1/Systems/1/Memory'}},
+    '/redfish/v1/Systems/1/Memory': {'Members': [{'@odata.id': '/redfish/v1/Systems/1/Memory/%d' % i} for i in range(6)]},
+}
+for i in range(6):
+    RESOURCES['/redfish/v1/Systems/1/Memory/%d' % i] = {
+        'Id': str(i), 'Name': 'DIMM %d' % i, 'CapacityMiB': 16384,
+        'Status': {'State': 'Absent' if i == 5 else 'Enabled', 'Health': 'OK'},
+    }
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append(('GET', self.path, self.headers.get('Authorization')))
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/redfish/v1/' and self.server.expand:
+            self._reply(200, {'ProtocolFeaturesSupported': {
+                'ExpandQuery': {'ExpandAll': True, 'Levels': True, 'MaxLevels': 3, 'NoLinks': True},
+                'SelectQuery': True}})
+        elif '$expand' in query and self.server.expand:
+            assert query['$expand'] == ['.($levels=1)']
+            data = dict(RESOURCES[url.path])
+            members = [RESOURCES[m['@odata.id']] for m in data['Members']]
+            if '$select' in query:
+                select = query['$select'][0].split(',')
+                members = [dict((k, v) for k, v in m.items() if k in select) for m in members]
+            data['Members'] = [dict(m, **{'@odata.id': link['@odata.id']}) for m, link in zip(members, data['Members'])]
+            self._reply(200, data)
+        elif url.path in RESOURCES and not query:
+            self._reply(200, RESOURCES[url.path])
+        else:
+            self._reply(404, {'error': {'@Message.ExtendedInfo': [{'Message': 'no such resource'}]}})
+
+    def do_PATCH(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests.append(('PATCH', self.path, self.headers.get('Authorization')))
+        self._reply(200, {})
+
+
+class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.requests = []
+        self.connections = 0
+        self.expand = False
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        socketserver.ThreadingMixIn.process_request(self, request, client_address)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    for name in ('http_proxy', 'HTTP_PROXY', 'all_proxy', 'ALL_PROXY'):
+        monkeypatch.delenv(name, raising=False)
+    server = Server()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def rf_utils(server):
+    root_uri = 'http://127.0.0.1:%d' % server.server_address[1]
+    return RedfishUtils({'user': 'admin', 'pswd': 'secret'}, root_uri, 10, MagicMock())
+
+
+def test_memory_inventory(rf_utils, server):
+    result = rf_utils.get_memory_inventory('/redfish/v1/Systems/1')
+
+    assert result['ret'] is True
+    assert [dimm['Id'] for dimm in result['entries']] == ['0', '1', '2', '3', '4']
+    # the system, the service root, the collection and its six members
+    assert len(server.requests) == 9
+    assert all(auth == 'Basic YWRtaW46c2VjcmV0' for method, path, auth in server.requests)
+    # one connection per worker thread, plus the one of the main thread
+    assert server.connections <= rf_utils.workers + 1
+    # only the connection of the main thread is left open
+    assert len(rf_utils._http_session._connections) == 1
+
+    rf_utils.close()
+    assert rf_utils._http_session._connections == []
+    assert rf_utils.get_request(rf_utils.root_uri + '/redfish/v1/Systems/1', use_cache=False)['ret'] is True
+    assert len(rf_utils._http_session._connections) == 1
+
+
+def test_cache(rf_utils, server):
+    rf_utils.get_memory_inventory('/redfish/v1/Systems/1')
+    response = rf_utils.get_request(rf_utils.root_uri + '/redfish/v1/Systems/1')
+    response['data']['Memory'] = None
+    rf_utils.get_memory_inventory('/redfish/v1/Systems/1')
+    assert len(server.requests) == 9
+
+    rf_utils.patch_request(rf_utils.root_uri + '/redfish/v1/Systems/1', {'AssetTag': 'tag'})
+    assert server.requests[-2:] == [('GET', '/redfish/v1/Systems/1', 'Basic YWRtaW46c2VjcmV0'),
+                                    ('PATCH', '/redfish/v1/Systems/1', 'Basic YWRtaW46c2VjcmV0')]
+    rf_utils.get_request(rf_utils.root_uri + '/redfish/v1/Systems/1')
+    assert len(server.requests) == 12
+
+
+def test_memory_inventory_expanded(rf_utils, server):
+    server.expand = True
+    result = rf_utils.get_memory_inventory('/redfish/v1/Systems/1')
+
+    assert [dimm['Id'] for dimm in result['entries']] == ['0', '1', '2', '3', '4']
+    assert result['entries'][0] == {'Id': '0', 'Name': 'DIMM 0', 'CapacityMiB': 16384, 'Status': {'State': 'Enabled', 'Health': 'OK'}}
+    paths = [path for method, path, auth in server.requests]
+    assert len(paths) == 3
+    assert paths[2].startswith('/redfish/v1/Systems/1/Memory?$expand=.($levels=1)&$select=Id,SerialNumber,')
+
+
+def test_http_error(rf_utils, server):
+    response = rf_utils.get_request(rf_utils.root_uri + '/redfish/v1/Missing')
+
+    assert response['ret'] is False
+    assert response['status'] == 404
+    assert "extended message: 'no such resource'" in response['msg']
+    response = rf_utils.get_request(rf_utils.root_uri + '/redfish/v1/Missing')
+    assert len(server.requests) == 2
+    assert server.connections == 1
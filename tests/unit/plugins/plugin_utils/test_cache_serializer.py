@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible.errors import AnsibleError
+from ansible_collections.community.general.plugins.plugin_utils import cache_serializer
+from ansible_collections.community.general.plugins.plugin_utils.cache_serializer import CacheSerializer
+
+
+FACTS = {
+    'ansible_hostname': u'host1',
+    'ansible_interfaces': [u'lo', u'eth0'],
+    'ansible_memtotal_mb': 2048,
+    'ansible_selinux': {'status': u'disabled'},
+}
+
+FORMATS = [
+    ('json', 'none'),
+    ('compact_json', 'none'),
+    ('compact_json', 'zlib'),
+    ('json', 'zlib'),
+    pytest.param('msgpack', 'none', marks=pytest.mark.skipif(not cache_serializer.HAS_MSGPACK, reason='msgpack missing')),
+    pytest.param('msgpack', 'zlib', marks=pytest.mark.skipif(not cache_serializer.HAS_MSGPACK, reason='msgpack missing')),
+    pytest.param('compact_json', 'lz4', marks=pytest.mark.skipif(not cache_serializer.HAS_LZ4, reason='lz4 missing')),
+]
+
+
+@pytest.mark.parametrize('serializer, compression', FORMATS)
+def test_round_trip(serializer, compression):
+    writer = CacheSerializer(serializer, compression)
+    data = writer.dumps(FACTS)
+    # entries are self-describing, any reader can load them
+    assert CacheSerializer().loads(data) == FACTS
+
+
+def test_legacy_json_is_untagged():
+    data = CacheSerializer().dumps(FACTS)
+    assert data == json.dumps(FACTS, sort_keys=True, indent=4).encode('utf-8')
+    assert CacheSerializer('compact_json', 'zlib').loads(data) == FACTS
+
+
+def test_compact_is_smaller():
+    assert len(CacheSerializer('compact_json').dumps(FACTS)) < len(CacheSerializer().dumps(FACTS))
+
+
+@pytest.mark.parametrize('data', [b'\x00json', b'\x00yaml/none\x00{}'])
+def test_invalid_header(data):
+    with pytest.raises(AnsibleError):
+        CacheSerializer().loads(data)
+
+
+def test_unknown_serializer():
+    with pytest.raises(AnsibleError):
+        CacheSerializer('yaml')
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import threading
+
+from ansible_collections.community.general.tests.unit.compat.mock import MagicMock
+from ansible_collections.community.general.plugins.plugin_utils.event_sender import EventSender, EventSpool, PartialSendError, sender_from_options
+
+
+def test_batches_by_size():
+    batches = []
+    sender = EventSender(batches.append, flush_size=3, flush_interval=60)
+    for i in range(7):
+        assert sender.put(i)
+    sender.close()
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert (sender.queued, sender.sent, sender.dropped, sender.failed) == (7, 7, 0, 0)
+
+
+def test_flush_waits_for_delivery():
+    batches = []
+    sender = EventSender(batches.append, flush_interval=60)
+    sender.put('a')
+    assert sender.flush(timeout=5)
+    assert batches == [['a']]
+    sender.close()
+
+
+def test_drops_when_queue_is_full():
+    release = threading.Event()
+    batches = []
+
+    def send(batch):
+        release.wait(5)
+        batches.append(batch)
+
+    sender = EventSender(send, queue_size=2, flush_size=1, flush_interval=60)
+    sender.put(0)
+    # wait for the sender thread to pick up the first event and block
+    while sender.pending:
+        pass
+    assert sender.put(1)
+    assert sender.put(2)
+    assert not sender.put(3)
+    release.set()
+    sender.close()
+    assert batches == [[0], [1], [2]]
+    assert sender.dropped == 1
+
+
+def test_retries_with_backoff():
+    attempts = []
+
+    def send(batch):
+        attempts.append(batch)
+        if len(attempts) < 3:
+            raise IOError('collector down')
+
+    sender = EventSender(send, retries=2, backoff=0.01, flush_interval=60)
+    sender.put('a')
+    sender.close()
+    assert len(attempts) == 3
+    assert sender.sent == 1 and sender.failed == 0
+
+
+def test_counts_failed_events():
+    def send(batch):
+        raise IOError('collector down')
+
+    sender = EventSender(send, retries=1, backoff=0.01, flush_interval=60)
+    sender.put('a')
+    sender.put('b')
+    sender.close()
+    assert sender.failed == 2 and sender.sent == 0
+
+
+def test_spool_is_capped(tmp_path):
+    spool = EventSpool(str(tmp_path / 'spool'), max_size=20)
+    assert spool.append(['aaaa', 'bbbb', 'cccc']) == 2
+    assert spool.take() == ['aaaa', 'bbbb']
+    spool.done()
+    assert len(spool) == 0
+
+
+def test_spools_while_collector_is_down(tmp_path):
+    spool = EventSpool(str(tmp_path / 'spool'))
+    down = [True]
+    batches = []
+
+    def send(batch):
+        if down[0]:
+            raise IOError('collector down')
+        batches.append(batch)
+
+    sender = EventSender(send, retries=0, flush_interval=60, spool=spool, retry_interval=3600)
+    sender.put(['host1', 'a'])
+    sender.flush()
+    # the collector is marked down, the next batch is spooled without trying to send it
+    down[0] = False
+    sender.put(['host2', 'b'])
+    sender.close()
+    assert batches == []
+    assert sender.spooled == 2 and sender.failed == 0
+
+    # the next run replays the spool when it starts
+    replayed = EventSender(send, flush_interval=60, spool=spool)
+    replayed.start()
+    replayed.close()
+    assert batches == [[['host1', 'a'], ['host2', 'b']]]
+    assert len(spool) == 0
+
+
+def test_replay_after_recovery(tmp_path):
+    spool = EventSpool(str(tmp_path / 'spool'))
+    down = [True]
+    batches = []
+
+    def send(batch):
+        if down[0]:
+            raise IOError('collector down')
+        batches.append(batch)
+
+    sender = EventSender(send, retries=0, flush_interval=60, spool=spool, retry_interval=0)
+    sender.put('a')
+    sender.flush()
+    down[0] = False
+    sender.put('b')
+    sender.close()
+    assert batches == [['b'], ['a']]
+    assert len(spool) == 0
+
+
+def test_retries_only_unsent_events():
+    attempts = []
+
+    def send(batch):
+        attempts.append(batch)
+        if len(attempts) == 1:
+            raise PartialSendError('collector down', batch[1:])
+
+    sender = EventSender(send, retries=1, backoff=0.01, flush_interval=60)
+    sender.put('a')
+    sender.put('b')
+    sender.close()
+    assert attempts == [['a', 'b'], ['b']]
+    assert sender.sent == 2 and sender.failed == 0
+
+
+def test_counts_events_dropped_on_replay(tmp_path):
+    spool = EventSpool(str(tmp_path / 'spool'))
+    assert spool.append(['aaaa', 'bbbb', 'cccc']) == 3
+    # only two of the events fit when they are put back
+    spool.max_size = 14
+
+    def send(batch):
+        raise IOError('collector down')
+
+    sender = EventSender(send, flush_interval=60, spool=spool)
+    sender.start()
+    sender.close()
+    assert spool.take() == ['aaaa', 'bbbb']
+    assert sender.dropped == 1
+
+
+class FakePlugin(object):
+    def __init__(self, **options):
+        self.options = dict(threaded=False, queue_size=10, flush_size=5, flush_interval=60, retries=0,
+                            spool_path=None, spool_max_size=1024)
+        self.options.update(options)
+
+    def get_option(self, name):
+        return self.options[name]
+
+
+def test_sender_from_options(tmp_path):
+    assert sender_from_options(FakePlugin(), None, None) is None
+
+    def send(batch):
+        raise IOError('collector down')
+
+    display = MagicMock()
+    sender = sender_from_options(FakePlugin(spool_path=str(tmp_path / 'spool')), send, display)
+    sender.put('a')
+    sender.close()
+    sender.report(display, 'Collector')
+    display.vv.assert_called_once_with('Collector events: %s' % sender.summary())
+    display.warning.assert_called_with('1 events for Collector were spooled to %s and will be sent later' % (tmp_path / 'spool'))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# (c) 2022, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import io
+import os
+
+import pytest
+
+from ansible_collections.community.general.plugins.plugin_utils.exec_channel import ExecChannel, ExecChannelError, helper_command
+
+
+@pytest.fixture
+def channel():
+    channel = ExecChannel(['/bin/sh', '-c', helper_command()])
+    yield channel
+    channel.close()
+
+
+def test_exec_command(channel):
+    in_data = os.urandom(300000)
+    rc, stdout, stderr = channel.exec_command(['/bin/sh', '-c', 'cat; echo error >&2; exit 3'], in_data)
+    assert (rc, stdout, stderr) == (3, in_data, b'error\n')
+
+    # the same helper runs the next command
+    assert channel.exec_command(['/bin/sh', '-c', 'echo $0'])[:2] == (0, b'/bin/sh\n')
+
+
+def test_exec_missing_command(channel):
+    rc, stdout, stderr = channel.exec_command(['/nonexistent'])
+    assert rc == 127
+    assert stderr
+
+
+def test_put_and_fetch_file(channel, tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 5)
+    assert channel.put_file(io.BytesIO(data), str(tmp_path / 'file')) is None
+    assert (tmp_path / 'file').read_bytes() == data
+
+    out_file = io.BytesIO()
+    assert channel.fetch_file(str(tmp_path / 'file'), out_file) is None
+    assert out_file.getvalue() == data
+
+
+def test_file_errors(channel, tmp_path):
+    assert 'No such file' in channel.put_file(io.BytesIO(b'data'), str(tmp_path / 'missing' / 'file'))
+    assert 'No such file' in channel.fetch_file(str(tmp_path / 'missing'), io.BytesIO())
+    # the channel is still usable after errors
+    assert channel.exec_command(['true'])[0] == 0
+
+
+def test_helper_does_not_start():
+    with pytest.raises(ExecChannelError, match='did not start'):
+        ExecChannel(['/bin/sh', '-c', 'echo no python >&2; exit 127'])
+
+
+def test_helper_with_much_stderr():
+    # more output than a pipe buffer holds must not block the helper
+    channel = ExecChannel(['/bin/sh', '-c', 'head -c 200000 /dev/zero >&2; ' + helper_command()])
+    try:
+        assert channel.exec_command(['/bin/sh', '-c', 'echo ok'])[:2] == (0, b'ok\n')
+    finally:
+        channel.close()